@@ -1,7 +1,6 @@
 from models import get_db, Product, ProductCategory, Platform
 from sqlalchemy.orm import Session
 from datetime import datetime
-import json
 
 # 获取数据库会话
 db = next(get_db())
@@ -36,7 +35,7 @@ products = [
         sales_count=1500, 
         image_url='https://m.media-amazon.com/images/I/61jLiCovxVL._AC_SL1500_.jpg', 
         description='Apple iPhone 13 Pro with A15 Bionic chip', 
-        specifications=json.dumps({'color': 'Graphite', 'storage': '128GB'}), 
+        specifications={'color': 'Graphite', 'storage': '128GB'}, 
         category_id=categories[0].id, 
         platform_id=platforms[0].id, 
         created_at=datetime.now(), 
@@ -50,7 +49,7 @@ products = [
         sales_count=1200, 
         image_url='https://m.media-amazon.com/images/I/61jLiCovxVL._AC_SL1500_.jpg', 
         description='Samsung Galaxy S21 5G smartphone', 
-        specifications=json.dumps({'color': 'Phantom Gray', 'storage': '256GB'}), 
+        specifications={'color': 'Phantom Gray', 'storage': '256GB'}, 
         category_id=categories[0].id, 
         platform_id=platforms[0].id, 
         created_at=datetime.now(), 
@@ -64,7 +63,7 @@ products = [
         sales_count=2000, 
         image_url='https://m.media-amazon.com/images/I/71o8Q5XJS5L._AC_SL1500_.jpg', 
         description='Sony Noise Cancelling Headphones', 
-        specifications=json.dumps({'color': 'Black', 'battery': '30 hours'}), 
+        specifications={'color': 'Black', 'battery': '30 hours'}, 
         category_id=categories[0].id, 
         platform_id=platforms[0].id, 
         created_at=datetime.now(), 
@@ -78,7 +77,7 @@ products = [
         sales_count=3000, 
         image_url='https://m.media-amazon.com/images/I/614w3LuZTYL._AC_SL1500_.jpg', 
         description='Advanced Wireless Mouse for Mac and PC', 
-        specifications=json.dumps({'color': 'Graphite', 'connectivity': 'Bluetooth'}), 
+        specifications={'color': 'Graphite', 'connectivity': 'Bluetooth'}, 
         category_id=categories[0].id, 
         platform_id=platforms[0].id, 
         created_at=datetime.now(), 
@@ -92,7 +91,7 @@ products = [
         sales_count=800, 
         image_url='https://m.media-amazon.com/images/I/71RK6+rx-xL._AC_SL1500_.jpg', 
         description='Dell XPS 13 9310 Laptop', 
-        specifications=json.dumps({'processor': 'Intel i7', 'ram': '16GB', 'storage': '512GB SSD'}), 
+        specifications={'processor': 'Intel i7', 'ram': '16GB', 'storage': '512GB SSD'}, 
         category_id=categories[0].id, 
         platform_id=platforms[0].id, 
         created_at=datetime.now(), 
@@ -0,0 +1,35 @@
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config import API_PREFIX, DB_POOL_MAX_WAITING, DB_POOL_RETRY_AFTER_SECONDS
+from metrics import DB_POOL_REJECTIONS
+from models import engine
+
+def overloaded_response():
+    return JSONResponse(
+        {"detail": "服务繁忙，请稍后重试"},
+        status_code=503,
+        headers={"Retry-After": str(DB_POOL_RETRY_AFTER_SECONDS)}
+    )
+
+# 连接池满载保护：主库连接池没有可用连接且等待连接的请求已达上限时，接口请求直接返回503，
+# 不再进入处理流程排队等待（等待连接的是线程池中的同步接口或阻塞事件循环的异步接口，可能有多个；
+# API配置档的上限为0，即连接池满载时直接拒绝。后台线程使用单独的连接池，不影响这里的判断）
+class AdmissionMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"].startswith(API_PREFIX):
+            pool = engine.pool
+            if pool.saturated() and pool.waiting >= DB_POOL_MAX_WAITING:
+                DB_POOL_REJECTIONS.inc(reason="saturated")
+                await overloaded_response()(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+# 已进入处理流程但在 pool_timeout 内没有等到连接的请求同样返回503
+async def pool_timeout_handler(request, exc):
+    DB_POOL_REJECTIONS.inc(reason="timeout")
+    return overloaded_response()
@@ -0,0 +1,89 @@
+from sqlalchemy.orm import Session
+from datetime import datetime
+
+from models import PriceWatch
+from notifier import insert_notifications
+
+# 计算销量增速时的最短观测间隔（秒），避免短时间内重复抓取导致增速失真
+MIN_OBSERVATION_SECONDS = 3600
+
+# 商品的一次价格/销量变化，需在新抓取数据覆盖商品之前创建
+class ProductChange:
+    def __init__(self, product, new_price, new_sales_count, observed_at=None):
+        observed_at = observed_at or datetime.now()
+        last_observed_at = product.updated_at or product.created_at or observed_at
+        elapsed_seconds = max((observed_at - last_observed_at).total_seconds(), MIN_OBSERVATION_SECONDS)
+        
+        self.product_id = product.id
+        self.product_name = product.name
+        self.currency = product.currency
+        self.old_price = product.price
+        self.new_price = new_price
+        self.old_sales_count = product.sales_count or 0
+        self.new_sales_count = new_sales_count or 0
+        self.elapsed_days = elapsed_seconds / 86400
+    
+    @property
+    def price_drop(self):
+        return self.old_price - self.new_price
+    
+    @property
+    def price_drop_percent(self):
+        if not self.old_price or self.old_price <= 0:
+            return 0.0
+        return self.price_drop / self.old_price * 100
+    
+    # 销量增速（件/天）
+    @property
+    def sales_velocity(self):
+        return (self.new_sales_count - self.old_sales_count) / self.elapsed_days
+
+# 检查提醒是否触发，返回触发原因列表（未触发时为空）
+def match_watch(watch: PriceWatch, change: ProductChange):
+    reasons = []
+    
+    price_triggered = change.price_drop > 0 and (
+        (watch.price_drop_amount is not None and change.price_drop >= watch.price_drop_amount)
+        or (watch.price_drop_percent is not None and change.price_drop_percent >= watch.price_drop_percent)
+    )
+    if price_triggered:
+        reasons.append(
+            f"价格从 {change.old_price:.2f} 降至 {change.new_price:.2f} {change.currency}"
+            f"（-{change.price_drop_percent:.1f}%）"
+        )
+    
+    if watch.sales_velocity is not None and change.sales_velocity >= watch.sales_velocity > 0:
+        reasons.append(f"销量增速 {change.sales_velocity:.1f} 件/天（销量 {change.old_sales_count} → {change.new_sales_count}）")
+    
+    return reasons
+
+# 按发生变化的商品增量检查价格提醒，触发的提醒批量写入通知，返回收到通知的用户id；调用方负责提交
+def evaluate_product_changes(db: Session, changes):
+    changes = {
+        change.product_id: change for change in changes
+        if change.price_drop > 0 or change.new_sales_count > change.old_sales_count
+    }
+    if not changes:
+        return []
+    
+    watches = db.query(PriceWatch).filter(
+        PriceWatch.product_id.in_(list(changes)),
+        PriceWatch.is_active == True
+    ).all()
+    
+    now = datetime.now()
+    rows = []
+    for watch in watches:
+        change = changes[watch.product_id]
+        reasons = match_watch(watch, change)
+        if not reasons:
+            continue
+        watch.last_triggered_at = now
+        rows.append({
+            "title": f"价格提醒：{change.product_name}"[:100],
+            "content": "；".join(reasons),
+            "user_id": watch.user_id,
+        })
+    
+    insert_notifications(db, rows)
+    return [row["user_id"] for row in rows]
@@ -10,18 +10,17 @@ import os
 import random
 import string
 from io import BytesIO
-from captcha.image import ImageCaptcha
-from PIL import Image, ImageDraw, ImageFont
 import base64
 
 from models import SysUser, CaptchaRecord, get_db
-from config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, CAPTCHA_EXPIRE_SECONDS
+from config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, STREAM_TOKEN_EXPIRE_SECONDS, CAPTCHA_EXPIRE_SECONDS
 
 # 密码哈希工具
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # OAuth2 密码流认证
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
 
 # 令牌模型
 class Token(BaseModel):
@@ -60,8 +59,18 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-# 获取当前用户
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+# 通知事件流令牌的用途标记，带该标记的令牌只能用于订阅事件流
+STREAM_TOKEN_SCOPE = "notification_stream"
+
+# 生成通知事件流令牌：EventSource 无法设置请求头，令牌只能放在URL中，使用有效期很短、只能订阅事件流的令牌
+def create_stream_token(username: str):
+    return create_access_token(
+        data={"sub": username, "scope": STREAM_TOKEN_SCOPE},
+        expires_delta=timedelta(seconds=STREAM_TOKEN_EXPIRE_SECONDS)
+    )
+
+# 校验令牌并返回对应的用户，scope 为令牌应有的用途（普通访问令牌为None）
+def get_token_user(token: str, db: Session, scope: Optional[str] = None):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="无效的认证凭据",
@@ -70,7 +79,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
+        if username is None or payload.get("scope") != scope:
             raise credentials_exception
         token_data = TokenData(username=username)
     except JWTError:
@@ -80,18 +89,44 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         raise credentials_exception
     return user
 
+# 获取当前用户
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    return get_token_user(token, db)
+
 # 获取当前活跃用户
 async def get_current_active_user(current_user: SysUser = Depends(get_current_user)):
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="用户已被禁用")
     return current_user
 
+# 获取事件流的当前用户：EventSource 无法设置请求头，通过 token 查询参数传递事件流令牌（见 create_stream_token）
+async def get_stream_user(
+    token: Optional[str] = None,
+    header_token: Optional[str] = Depends(oauth2_scheme_optional),
+    db: Session = Depends(get_db)
+):
+    if header_token:
+        current_user = get_token_user(header_token, db)
+    elif token:
+        current_user = get_token_user(token, db, scope=STREAM_TOKEN_SCOPE)
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="无效的认证凭据",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await get_current_active_user(current_user)
+
 # 生成随机验证码
 def generate_captcha_code(length=4):
     return ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
 
 # 生成验证码图片
 def generate_captcha_image(captcha_text):
+    # captcha 和 PIL 在首次生成验证码时才导入，不拖慢工作进程启动
+    from captcha.image import ImageCaptcha
+    from PIL import Image
+    
     # 使用captcha库生成验证码图片
     image = ImageCaptcha(width=160, height=60)
     data = image.generate(captcha_text)
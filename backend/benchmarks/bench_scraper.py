@@ -0,0 +1,106 @@
+import sys
+import os
+import time
+import resource
+import tracemalloc
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# 基准脚本放在 backend/benchmarks 下，需要把 backend 目录加入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scraper
+import parse_pool
+from scraper import RequestScraper
+from replay_server import ReplayServer, load_manifest, load_fixture
+
+# 可用的 BeautifulSoup 解析器，未安装的自动跳过
+def available_parsers():
+    parsers = ["html.parser"]
+    for name, module in (("lxml", "lxml"), ("html5lib", "html5lib")):
+        try:
+            __import__(module)
+            parsers.append(name)
+        except ImportError:
+            pass
+    return parsers
+
+# 解析阶段：每个爬虫类、每种解析器在当前进程重复解析录制页面
+def bench_parse(manifest, iterations):
+    print(f"{'页面':<12}{'爬虫':<20}{'解析器':<14}{'页/秒':>8}{'耗时(ms)':>10}{'CPU(ms)':>10}{'峰值内存(KB)':>14}")
+    for fixture_name, fixture in manifest.items():
+        html = load_fixture(fixture["file"])
+        scraper_class = getattr(scraper, fixture["scraper"])
+        for parser_name in available_parsers():
+            scraper.HTML_PARSER = parser_name
+            instance = scraper_class()
+
+            wall_start = time.perf_counter()
+            cpu_start = time.process_time()
+            for _ in range(iterations):
+                instance.parse_product(html, fixture["url"])
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+
+            # tracemalloc 会明显拖慢解析，内存单独解析一次测量
+            tracemalloc.start()
+            instance.parse_product(html, fixture["url"])
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            print(f"{fixture_name:<12}{fixture['scraper']:<20}{parser_name:<14}"
+                  f"{iterations / wall:>8.1f}{wall / iterations * 1000:>10.2f}"
+                  f"{cpu / iterations * 1000:>10.2f}{peak / 1024:>14.0f}")
+    scraper.HTML_PARSER = "html.parser"
+
+# 完整流程：从回放服务器并发获取页面（I/O线程）后解析，对比当前进程解析与进程池解析
+def bench_pipeline(manifest, pages, concurrency):
+    print(f"\n{'解析方式':<16}{'页数':>6}{'并发':>6}{'页/秒':>10}{'主进程CPU(s)':>14}{'最大RSS(MB)':>12}")
+    with ReplayServer() as replay:
+        jobs = [
+            (getattr(scraper, fixture["scraper"]), replay.url_for(fixture["file"]))
+            for fixture in manifest.values()
+        ]
+        jobs = [jobs[i % len(jobs)] for i in range(pages)]
+
+        def run(job):
+            scraper_class, url = job
+            html = RequestScraper().fetch_page(url)
+            return parse_pool.parse_in_pool(scraper_class(), "parse_product", html, url)
+
+        for label, workers in (("当前进程", 0), (f"进程池x{os.cpu_count()}", os.cpu_count())):
+            parse_pool.SCRAPE_PARSE_WORKERS = workers
+            if workers:
+                # 预热进程池，避免把启动进程的时间计入
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    list(executor.map(run, jobs[:workers]))
+
+            wall_start = time.perf_counter()
+            cpu_start = time.process_time()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                results = list(executor.map(run, jobs))
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+            failed = sum(1 for product in results if not product or not product.name)
+            print(f"{label:<16}{pages:>6}{concurrency:>6}{pages / wall:>10.1f}{cpu:>14.2f}{max_rss:>12.0f}"
+                  + (f"  失败 {failed}" if failed else ""))
+            parse_pool.shutdown_parse_pool()
+
+def main():
+    parser = argparse.ArgumentParser(description="爬虫解析性能基准（使用录制页面，无需联网）")
+    parser.add_argument("--iterations", type=int, default=20, help="解析阶段每个页面的重复次数")
+    parser.add_argument("--pages", type=int, default=200, help="完整流程抓取的页面数")
+    parser.add_argument("--concurrency", type=int, default=8, help="完整流程的并发获取线程数")
+    parser.add_argument("--only", choices=["parse", "pipeline"], help="只运行其中一项")
+    args = parser.parse_args()
+
+    manifest = load_manifest()
+    if args.only != "pipeline":
+        bench_parse(manifest, args.iterations)
+    if args.only != "parse":
+        bench_pipeline(manifest, args.pages, args.concurrency)
+
+if __name__ == "__main__":
+    main()
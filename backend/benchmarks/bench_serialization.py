@@ -0,0 +1,78 @@
+import sys
+import os
+import json
+import gzip
+import time
+from datetime import datetime
+
+# 基准脚本放在 backend/benchmarks 下，需要把 backend 目录加入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from routers.products import ProductListItem, ProductListResponse
+from compression import brotli
+
+# 列表页使用的精简字段
+LIST_FIELDS = ["id", "name", "url", "price", "currency", "sales_count", "image_url",
+               "category_name", "platform_name", "updated_at"]
+
+# 构造与数据库查询结果结构一致的商品数据
+def make_rows(count):
+    now = datetime.now()
+    return [
+        {
+            "id": i,
+            "name": f"Wireless Noise Cancelling Headphones Model {i}",
+            "url": f"https://www.amazon.com/dp/B0{i:08d}",
+            "price": 99.0 + i % 500,
+            "currency": "USD",
+            "sales_count": i * 7 % 10000,
+            "image_url": f"https://m.media-amazon.com/images/I/{i:010d}._AC_SL1500_.jpg",
+            "description": "Industry leading noise cancellation with dual noise sensor technology. " * 5,
+            "specifications": {"color": "Black", "battery": "30 hours", "connectivity": "Bluetooth 5.0"},
+            "category_id": 1 + i % 6,
+            "platform_id": 1 + i % 3,
+            "category_name": "电子产品",
+            "platform_name": "Amazon",
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(count)
+    ]
+
+# 原有路径：逐行构建 Pydantic 模型 -> jsonable_encoder -> 标准库 json
+def serialize_pydantic(rows):
+    response = ProductListResponse(total=len(rows), items=[ProductListItem(**row) for row in rows])
+    content = jsonable_encoder(response)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+# 新路径：字典直接交给 orjson
+def serialize_orjson(rows):
+    return orjson.dumps({"total": len(rows), "items": rows})
+
+def timeit(func, rows, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = func(rows)
+    return (time.perf_counter() - start) / repeat * 1000, body
+
+def main():
+    print(f"{'场景':<28}{'条数':>6}{'耗时(ms)':>10}{'原始字节':>10}{'gzip':>10}{'br':>10}")
+    for count in (100, 1000):
+        rows = make_rows(count)
+        list_rows = [{field: row[field] for field in LIST_FIELDS} for row in rows]
+        repeat = 200 if count <= 100 else 20
+        for label, func, data in (
+            ("Pydantic+json 全字段", serialize_pydantic, rows),
+            ("orjson 全字段", serialize_orjson, rows),
+            ("orjson 列表字段(fields=)", serialize_orjson, list_rows),
+        ):
+            elapsed, body = timeit(func, data, repeat)
+            gzip_size = len(gzip.compress(body, compresslevel=6))
+            br_size = len(brotli.compress(body, quality=4)) if brotli else 0
+            print(f"{label:<28}{count:>6}{elapsed:>10.2f}{len(body):>10}{gzip_size:>10}{br_size:>10}")
+
+if __name__ == "__main__":
+    main()
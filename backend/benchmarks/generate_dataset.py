@@ -0,0 +1,206 @@
+import sys
+import os
+import math
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+# 基准脚本放在 backend/benchmarks 下，需要把 backend 目录加入路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, update, select, func, text
+
+from models import engine, create_tables, Product, ProductSpec, ProductCategory, Platform, SysUser, TableVersion
+from migrations import upgrade
+from init_db import create_database, init_admin_user, init_categories, init_platforms, pwd_context
+
+# 压测账号统一使用的密码
+LOAD_TEST_PASSWORD = "LoadTest@123"
+
+# 各分类的商品占比、价格分布（对数正态，中位数和离散度）、名称用词和规格参数
+CATEGORY_PROFILES = {
+    "电子产品": {
+        "weight": 0.30, "median_price": 45, "sigma": 1.1,
+        "nouns": ["Headphones", "Earbuds", "Smart Watch", "Power Bank", "Phone Case", "Charger", "Keyboard", "Mouse", "Speaker", "Webcam"],
+        "specs": {"color": ["Black", "White", "Silver", "Blue"], "connectivity": ["Bluetooth 5.0", "Bluetooth 5.3", "USB-C", "Wired"], "battery": ["10 hours", "20 hours", "30 hours", "40 hours"]},
+    },
+    "服装鞋帽": {
+        "weight": 0.25, "median_price": 22, "sigma": 0.8,
+        "nouns": ["T-Shirt", "Hoodie", "Sneakers", "Jeans", "Dress", "Jacket", "Cap", "Socks", "Boots", "Shorts"],
+        "specs": {"size": ["S", "M", "L", "XL", "XXL"], "color": ["Black", "White", "Grey", "Navy", "Red"], "material": ["Cotton", "Polyester", "Wool", "Denim"]},
+    },
+    "家居用品": {
+        "weight": 0.15, "median_price": 30, "sigma": 1.0,
+        "nouns": ["Storage Box", "Lamp", "Pillow", "Curtain", "Organizer", "Vase", "Blanket", "Shelf", "Rug", "Candle"],
+        "specs": {"material": ["Plastic", "Wood", "Metal", "Fabric", "Glass"], "color": ["White", "Beige", "Grey", "Black"]},
+    },
+    "美妆护肤": {
+        "weight": 0.12, "median_price": 15, "sigma": 0.7,
+        "nouns": ["Lipstick", "Serum", "Moisturizer", "Sunscreen", "Mascara", "Cleanser", "Face Mask", "Perfume"],
+        "specs": {"volume": ["15ml", "30ml", "50ml", "100ml"], "skin_type": ["All", "Dry", "Oily", "Sensitive"]},
+    },
+    "食品饮料": {
+        "weight": 0.08, "median_price": 12, "sigma": 0.6,
+        "nouns": ["Coffee Beans", "Green Tea", "Protein Powder", "Dark Chocolate", "Mixed Nuts", "Vitamin C", "Snack Box"],
+        "specs": {"weight": ["100g", "250g", "500g", "1kg"], "flavor": ["Original", "Vanilla", "Chocolate", "Matcha"]},
+    },
+    "其他": {
+        "weight": 0.10, "median_price": 18, "sigma": 1.2,
+        "nouns": ["Gift Set", "Toy", "Sticker Pack", "Notebook", "Keychain", "Pet Bowl", "Car Mount"],
+        "specs": {"color": ["Multi", "Black", "Pink", "Green"]},
+    },
+}
+
+# 各平台的商品占比
+PLATFORM_WEIGHTS = {"Amazon": 0.35, "AliExpress": 0.25, "eBay": 0.20, "Shopee": 0.10, "Wish": 0.05, "Lazada": 0.05}
+PLATFORM_URLS = {
+    "Amazon": "https://www.amazon.com/dp/B{:09d}",
+    "AliExpress": "https://www.aliexpress.com/item/100500{:010d}.html",
+    "eBay": "https://www.ebay.com/itm/3{:011d}",
+    "Shopee": "https://shopee.com/product/{:d}",
+    "Wish": "https://www.wish.com/product/{:024x}",
+    "Lazada": "https://www.lazada.com/products/i{:d}.html",
+}
+
+BRANDS = ["Anker", "Baseus", "Ugreen", "Xiaomi", "Soundcore", "Nike", "Adidas", "Uniqlo", "IKEA", "Muji",
+          "L'Oreal", "Maybelline", "Nestle", "Lipton", "Generic", "Lenovo", "Logitech", "JBL", "Puma", "Zara"]
+ADJECTIVES = ["Wireless", "Portable", "Premium", "Classic", "Lightweight", "Waterproof", "Mini", "Pro", "Ultra",
+              "Vintage", "Organic", "Smart", "Slim", "Heavy Duty", "Soft", "Fast Charging"]
+DESCRIPTION = "High quality product with fast shipping and reliable after-sales service. "
+
+# 销量呈长尾分布：约两成商品没有销量，少数爆款销量很高
+def random_sales(rng):
+    if rng.random() < 0.2:
+        return 0
+    return min(int(rng.paretovariate(1.1) * 5), 1_000_000)
+
+def make_product(rng, product_id, category, platform, now):
+    profile = CATEGORY_PROFILES[category.name]
+    noun = rng.choice(profile["nouns"])
+    name = f"{rng.choice(BRANDS)} {rng.choice(ADJECTIVES)} {noun} {rng.randint(1, 999)}"
+    price = round(math.exp(math.log(profile["median_price"]) + rng.gauss(0, profile["sigma"])), 2)
+    specifications = {key: rng.choice(values) for key, values in profile["specs"].items()}
+    created_at = now - timedelta(seconds=rng.randint(0, 180 * 86400))
+    updated_at = created_at + timedelta(seconds=rng.randint(0, int((now - created_at).total_seconds())))
+    product = {
+        "id": product_id,
+        "name": name,
+        "url": PLATFORM_URLS.get(platform.name, "https://example.com/p/{:d}").format(product_id),
+        "price": max(price, 0.5),
+        "currency": "USD",
+        "sales_count": random_sales(rng),
+        "image_url": f"https://images.example.com/{product_id % 1000}/{product_id}.jpg",
+        "description": f"{name}. {DESCRIPTION}",
+        "specifications": specifications,
+        "category_id": category.id,
+        "platform_id": platform.id,
+        "created_at": created_at,
+        "updated_at": updated_at,
+    }
+    specs = [
+        {"product_id": product_id, "spec_key": key, "spec_value": value}
+        for key, value in specifications.items()
+    ]
+    return product, specs
+
+# 批量导入期间关闭逐行的约束检查和同步写盘
+def prepare_bulk_load(conn):
+    if conn.dialect.name == "sqlite":
+        conn.execute(text("PRAGMA synchronous = OFF"))
+        conn.execute(text("PRAGMA journal_mode = WAL"))
+    elif conn.dialect.name == "mysql":
+        conn.execute(text("SET unique_checks = 0"))
+        conn.execute(text("SET foreign_key_checks = 0"))
+
+def finish_bulk_load(conn):
+    if conn.dialect.name == "sqlite":
+        conn.execute(text("ANALYZE"))
+    elif conn.dialect.name == "mysql":
+        conn.execute(text("SET unique_checks = 1"))
+        conn.execute(text("SET foreign_key_checks = 1"))
+        conn.execute(text("ANALYZE TABLE product, product_spec"))
+
+# 创建压测用户，所有用户共用同一个密码哈希，避免逐个计算bcrypt
+def create_load_test_users(conn, count):
+    existing = conn.execute(
+        select(func.count(SysUser.id)).where(SysUser.username.like("loadtest_%"))
+    ).scalar()
+    if existing >= count:
+        return 0
+    password = pwd_context.hash(LOAD_TEST_PASSWORD)
+    rows = [
+        {"username": f"loadtest_{i}", "password": password, "email": f"loadtest_{i}@example.com",
+         "full_name": f"压测用户{i}", "is_active": True, "is_admin": False, "unread_notification_count": 0}
+        for i in range(existing, count)
+    ]
+    conn.execute(insert(SysUser.__table__), rows)
+    conn.commit()
+    return len(rows)
+
+def generate(product_count, batch_size, user_count, seed):
+    if engine.dialect.name == "mysql":
+        create_database()
+    create_tables()
+    upgrade()
+    init_admin_user()
+    init_categories()
+    init_platforms()
+
+    rng = random.Random(seed)
+    now = datetime.now()
+    with engine.connect() as conn:
+        categories = {row.name: row for row in conn.execute(select(ProductCategory.id, ProductCategory.name))}
+        platforms = {row.name: row for row in conn.execute(select(Platform.id, Platform.name))}
+        category_choices = [categories[name] for name in CATEGORY_PROFILES if name in categories]
+        category_weights = [CATEGORY_PROFILES[category.name]["weight"] for category in category_choices]
+        platform_choices = [platforms[name] for name in PLATFORM_WEIGHTS if name in platforms]
+        platform_weights = [PLATFORM_WEIGHTS[platform.name] for platform in platform_choices]
+
+        prepare_bulk_load(conn)
+        conn.commit()
+        print(f"创建压测用户 {create_load_test_users(conn, user_count)} 个，密码 {LOAD_TEST_PASSWORD}")
+
+        next_id = (conn.execute(select(func.max(Product.id))).scalar() or 0) + 1
+        start = time.perf_counter()
+        for batch_start in range(0, product_count, batch_size):
+            size = min(batch_size, product_count - batch_start)
+            category_batch = rng.choices(category_choices, category_weights, k=size)
+            platform_batch = rng.choices(platform_choices, platform_weights, k=size)
+            products, specs = [], []
+            for offset in range(size):
+                product, product_specs = make_product(
+                    rng, next_id + offset, category_batch[offset], platform_batch[offset], now
+                )
+                products.append(product)
+                specs.extend(product_specs)
+            next_id += size
+
+            # 每批一个事务，多行INSERT写入商品和规格键值
+            conn.execute(insert(Product.__table__), products)
+            conn.execute(insert(ProductSpec.__table__), specs)
+            conn.commit()
+
+            done = batch_start + size
+            elapsed = time.perf_counter() - start
+            print(f"\r已导入 {done}/{product_count} 个商品，{done / elapsed:.0f} 个/秒", end="", flush=True)
+        print()
+
+        # 绕过了ORM，手动递增表版本号使缓存和ETag失效
+        conn.execute(update(TableVersion).where(
+            TableVersion.table_name.in_(["product", "product_spec", "sys_user"])
+        ).values(version=TableVersion.version + 1))
+        conn.commit()
+        finish_bulk_load(conn)
+        conn.commit()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成压测用的合成商品数据")
+    parser.add_argument("--products", type=int, default=1_000_000, help="生成的商品数")
+    parser.add_argument("--batch-size", type=int, default=5000, help="每批写入的商品数")
+    parser.add_argument("--users", type=int, default=100, help="压测用户数")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"目标数据库: {engine.url.render_as_string(hide_password=True)}")
+    generate(args.products, args.batch_size, args.users, args.seed)
@@ -0,0 +1,237 @@
+import sys
+import os
+import time
+import math
+import random
+import argparse
+import threading
+import subprocess
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+# 基准脚本放在 backend/benchmarks 下，需要把 backend 目录加入路径
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+import requests
+from sqlalchemy import select, func
+
+from models import engine, CaptchaRecord, Product, ProductCategory, Platform
+from generate_dataset import LOAD_TEST_PASSWORD, CATEGORY_PROFILES, BRANDS
+
+# 各场景的请求占比
+SCENARIO_WEIGHTS = {
+    "list": 30,
+    "filter": 20,
+    "search": 15,
+    "detail": 20,
+    "stats": 5,
+    "bulk_create": 5,
+    "login": 5,
+}
+# 批量创建场景每次提交的商品数
+BULK_CREATE_SIZE = 20
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = max(math.ceil(p / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[index]
+
+# 登录需要验证码：压测进程直接从数据库读取验证码的值
+def login(session, base_url, username):
+    captcha = session.get(f"{base_url}/api/auth/captcha")
+    captcha.raise_for_status()
+    captcha_key = captcha.json()["captcha_key"]
+    with engine.connect() as conn:
+        captcha_value = conn.execute(
+            select(CaptchaRecord.captcha_value).where(CaptchaRecord.captcha_key == captcha_key)
+        ).scalar()
+    response = session.post(f"{base_url}/api/auth/login", json={
+        "username": username,
+        "password": LOAD_TEST_PASSWORD,
+        "captcha_key": captcha_key,
+        "captcha_value": captcha_value,
+    })
+    response.raise_for_status()
+    session.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+    return response
+
+# 一个虚拟用户：登录后按场景占比循环发送请求
+class VirtualUser:
+    def __init__(self, base_url, username, dataset, results, lock):
+        self.base_url = base_url
+        self.username = username
+        self.dataset = dataset
+        self.results = results
+        self.lock = lock
+        self.rng = random.Random(username)
+        self.session = requests.Session()
+        self.session.headers["Accept-Encoding"] = "gzip, br"
+
+    def record(self, scenario, elapsed, ok):
+        with self.lock:
+            self.results[scenario]["latencies"].append(elapsed)
+            if not ok:
+                self.results[scenario]["errors"] += 1
+
+    def timed(self, scenario, func):
+        start = time.perf_counter()
+        try:
+            response = func()
+            ok = response.status_code < 400
+        except Exception:
+            ok = False
+        self.record(scenario, time.perf_counter() - start, ok)
+
+    def run(self, deadline):
+        self.timed("login", lambda: login(self.session, self.base_url, self.username))
+        scenarios = list(SCENARIO_WEIGHTS)
+        weights = list(SCENARIO_WEIGHTS.values())
+        while time.monotonic() < deadline:
+            scenario = self.rng.choices(scenarios, weights)[0]
+            self.timed(scenario, getattr(self, f"do_{scenario}"))
+
+    def get(self, path, params=None):
+        return self.session.get(f"{self.base_url}/api{path}", params=params)
+
+    def do_list(self):
+        return self.get("/products", {"skip": self.rng.randint(0, 50) * 20, "limit": 20})
+
+    def do_filter(self):
+        low = self.rng.choice([0, 10, 50, 100])
+        return self.get("/products", {
+            "category_id": self.rng.choice(self.dataset["category_ids"]),
+            "platform_id": self.rng.choice(self.dataset["platform_ids"]),
+            "min_price": low,
+            "max_price": low * 5 + 20,
+            "sort_field": self.rng.choice(["price", "sales", "updated_at"]),
+            "sort_order": self.rng.choice(["ascend", "descend"]),
+            "limit": 20,
+        })
+
+    def do_search(self):
+        return self.get("/products", {"name": self.rng.choice(self.dataset["search_terms"]), "limit": 20})
+
+    def do_detail(self):
+        return self.get(f"/products/{self.rng.randint(self.dataset['min_id'], self.dataset['max_id'])}")
+
+    def do_stats(self):
+        return self.get("/system-stats")
+
+    def do_bulk_create(self):
+        products = [
+            {
+                "name": f"Load Test Product {self.rng.randint(1, 10**9)}",
+                "url": f"https://example.com/load-test/{self.rng.randint(1, 10**12)}",
+                "price": round(self.rng.uniform(1, 200), 2),
+                "currency": "USD",
+                "sales_count": self.rng.randint(0, 1000),
+                "description": "load test",
+                "specifications": {"color": "Black"},
+                "category_id": self.rng.choice(self.dataset["category_ids"]),
+                "platform_id": self.rng.choice(self.dataset["platform_ids"]),
+            }
+            for _ in range(BULK_CREATE_SIZE)
+        ]
+        return self.session.post(f"{self.base_url}/api/products/bulk", json={"products": products})
+
+    def do_login(self):
+        return login(requests.Session(), self.base_url, self.username)
+
+# 读取数据集的id范围和分类、平台，用于构造请求参数
+def load_dataset_info():
+    with engine.connect() as conn:
+        min_id, max_id = conn.execute(select(func.min(Product.id), func.max(Product.id))).one()
+        category_ids = [row[0] for row in conn.execute(select(ProductCategory.id))]
+        platform_ids = [row[0] for row in conn.execute(select(Platform.id))]
+    if not max_id:
+        raise SystemExit("数据库中没有商品，请先运行 generate_dataset.py")
+    search_terms = [noun for profile in CATEGORY_PROFILES.values() for noun in profile["nouns"]] + BRANDS
+    return {
+        "min_id": min_id,
+        "max_id": max_id,
+        "category_ids": category_ids,
+        "platform_ids": platform_ids,
+        "search_terms": search_terms,
+    }
+
+# 启动被测服务（uvicorn 多进程），与压测进程使用同一个 DATABASE_URL
+def start_server(port, workers):
+    # 多个进程需要相同的JWT密钥，否则令牌在其他进程校验失败
+    env = dict(os.environ)
+    env.setdefault("SECRET_KEY", os.urandom(32).hex())
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            if requests.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return process, base_url
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("被测服务启动失败")
+
+def report(results, duration):
+    total = sum(len(result["latencies"]) for result in results.values())
+    print(f"\n{'场景':<14}{'请求数':>8}{'错误':>6}{'RPS':>9}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}")
+    for scenario in list(SCENARIO_WEIGHTS):
+        result = results.get(scenario)
+        if not result or not result["latencies"]:
+            continue
+        latencies = sorted(result["latencies"])
+        print(f"{scenario:<14}{len(latencies):>8}{result['errors']:>6}{len(latencies) / duration:>9.1f}"
+              f"{percentile(latencies, 50) * 1000:>10.1f}{percentile(latencies, 95) * 1000:>10.1f}"
+              f"{percentile(latencies, 99) * 1000:>10.1f}")
+    all_latencies = sorted(latency for result in results.values() for latency in result["latencies"])
+    errors = sum(result["errors"] for result in results.values())
+    print(f"{'总计':<14}{total:>8}{errors:>6}{total / duration:>9.1f}"
+          f"{percentile(all_latencies, 50) * 1000:>10.1f}{percentile(all_latencies, 95) * 1000:>10.1f}"
+          f"{percentile(all_latencies, 99) * 1000:>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="API压测：登录、列表、筛选、搜索、详情、批量创建、统计")
+    parser.add_argument("--base-url", help="被测服务地址，不指定时使用 --serve 自动启动")
+    parser.add_argument("--serve", action="store_true", help="自动启动被测服务")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--workers", type=int, default=2, help="自动启动时的 uvicorn 进程数")
+    parser.add_argument("--users", type=int, default=20, help="并发虚拟用户数（需不多于生成的压测用户数）")
+    parser.add_argument("--duration", type=float, default=30, help="压测时长（秒）")
+    args = parser.parse_args()
+
+    if not args.base_url and not args.serve:
+        parser.error("请指定 --base-url 或 --serve")
+
+    dataset = load_dataset_info()
+    server = None
+    base_url = args.base_url
+    if args.serve:
+        server, base_url = start_server(args.port, args.workers)
+
+    results = defaultdict(lambda: {"latencies": [], "errors": 0})
+    lock = threading.Lock()
+    print(f"压测 {base_url}，{args.users} 个虚拟用户，{args.duration:.0f} 秒，商品id {dataset['min_id']}-{dataset['max_id']}")
+    try:
+        start = time.monotonic()
+        deadline = start + args.duration
+        virtual_users = [
+            VirtualUser(base_url, f"loadtest_{i}", dataset, results, lock)
+            for i in range(args.users)
+        ]
+        with ThreadPoolExecutor(max_workers=args.users) as executor:
+            for future in [executor.submit(user.run, deadline) for user in virtual_users]:
+                future.result()
+        report(results, time.monotonic() - start)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+if __name__ == "__main__":
+    main()
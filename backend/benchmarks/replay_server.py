@@ -0,0 +1,77 @@
+import os
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 录制的商品页面放在 fixtures 目录，manifest.json 记录每个页面对应的爬虫和期望解析结果
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def load_manifest():
+    with open(os.path.join(FIXTURE_DIR, "manifest.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+def load_fixture(file_name, base_url=""):
+    with open(os.path.join(FIXTURE_DIR, file_name), encoding="utf-8") as f:
+        # 页面中引用其他录制页面的地址（如eBay描述iframe）指向回放服务器
+        return f.read().replace("{{REPLAY_BASE}}", base_url)
+
+# 回放录制页面的本地HTTP服务器，路径为 /<文件名>
+class ReplayServer:
+    def __init__(self, host="127.0.0.1", port=0):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = server.pages.get(self.path.lstrip("/"))
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.base_url = f"http://{host}:{self.httpd.server_address[1]}"
+        # 启动时读入全部页面，回放过程中不读磁盘
+        self.pages = {
+            file_name: load_fixture(file_name, self.base_url).encode("utf-8")
+            for file_name in os.listdir(FIXTURE_DIR) if file_name.endswith(".html")
+        }
+        self._thread = None
+
+    def url_for(self, file_name):
+        return f"{self.base_url}/{file_name}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+# 单独运行时作为回放服务器，便于手动调试爬虫
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="回放录制的商品页面")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    replay = ReplayServer(port=args.port)
+    print(f"回放服务器已启动: {replay.base_url}")
+    for file_name in sorted(replay.pages):
+        print(f"  {replay.url_for(file_name)}")
+    replay.httpd.serve_forever()
@@ -0,0 +1,225 @@
+from collections import OrderedDict
+import asyncio
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from config import (
+    RESPONSE_CACHE_BACKEND, RESPONSE_CACHE_PATH, RESPONSE_CACHE_MAXSIZE, RESPONSE_CACHE_TTL_SECONDS,
+    RESPONSE_CACHE_LOCK_SECONDS
+)
+from metrics import registry
+
+RESPONSE_CACHE_REQUESTS = registry.counter("response_cache_requests_total", "响应缓存查询次数", ("cache", "result"))
+
+# 进程内LRU缓存，超过容量时淘汰最久未使用的条目；设置了 ttl 的条目过期后视为不存在
+class LRUCache:
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # 键 -> (过期时间或None, 值)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl if ttl else None, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    # 键不存在（或已过期）时写入并返回 True，用于单飞锁
+    def add(self, key, value, ttl=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and (item[0] is None or item[0] > time.monotonic()):
+                return False
+            self._data[key] = (time.monotonic() + ttl if ttl else None, value)
+            self._data.move_to_end(key)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+# 本机共享的键值缓存：数据存放在SQLite文件中，同一台机器上的多个工作进程共用
+# 只作缓存使用，关闭同步写盘；每个线程使用自己的连接
+class SQLiteCache:
+    # 每写入多少次清理一次过期和超出容量的条目
+    PRUNE_EVERY = 200
+
+    def __init__(self, path, maxsize=10000):
+        self.path = path
+        self.maxsize = maxsize
+        self._local = threading.local()
+        self._writes = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entry "
+                "(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, default=None):
+        row = self._connect().execute(
+            "SELECT value FROM cache_entry WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return pickle.loads(row[0]) if row else default
+
+    def set(self, key, value, ttl=RESPONSE_CACHE_TTL_SECONDS):
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entry (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), time.time() + ttl)
+        )
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def add(self, key, value, ttl=RESPONSE_CACHE_TTL_SECONDS):
+        conn = self._connect()
+        conn.execute("DELETE FROM cache_entry WHERE key = ? AND expires_at <= ?", (key, time.time()))
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO cache_entry (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), time.time() + ttl)
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key):
+        self._connect().execute("DELETE FROM cache_entry WHERE key = ?", (key,))
+
+    def clear(self):
+        self._connect().execute("DELETE FROM cache_entry")
+
+    # 删除过期条目，超出容量时删除最早过期的条目
+    def prune(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM cache_entry WHERE expires_at <= ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM cache_entry WHERE key IN "
+            "(SELECT key FROM cache_entry ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.maxsize,)
+        )
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM cache_entry").fetchone()[0]
+
+def create_cache_backend(backend=RESPONSE_CACHE_BACKEND):
+    if backend == "sqlite":
+        return SQLiteCache(RESPONSE_CACHE_PATH, maxsize=RESPONSE_CACHE_MAXSIZE)
+    if backend == "memory":
+        return LRUCache(maxsize=RESPONSE_CACHE_MAXSIZE)
+    raise ValueError(f"未知的缓存后端 RESPONSE_CACHE_BACKEND={backend}，可选: memory, sqlite")
+
+# 读接口的响应缓存：按 名称 + 请求参数 缓存计算结果，条目记录计算时所依赖表（标签）的版本号
+# 表写入时版本号在同一事务内递增（见 models.TableVersion），之后读取时版本号不一致即视为失效，多个工作进程、
+# 抓取工作进程的写入都能正确失效；同一个键的结果在进程内和进程间都只计算一次，其他请求等待计算结果
+class ResponseCache:
+    # 等待其他进程计算结果时的轮询间隔
+    WAIT_INTERVAL = 0.05
+
+    def __init__(self, backend=None, ttl=RESPONSE_CACHE_TTL_SECONDS, lock_seconds=RESPONSE_CACHE_LOCK_SECONDS):
+        self.backend = backend if backend is not None else create_cache_backend()
+        self.ttl = ttl
+        self.lock_seconds = lock_seconds
+        self._inflight = {}
+
+    @staticmethod
+    def make_key(name, params):
+        digest = hashlib.blake2b(repr(params).encode("utf-8"), digest_size=16).hexdigest()
+        return f"{name}:{digest}"
+
+    def lookup(self, key, versions):
+        entry = self.backend.get(key)
+        if entry is not None and entry[0] == versions:
+            return True, entry[1]
+        return False, None
+
+    # versions 为 get_table_versions 读取的标签版本号；compute 为同步函数，返回值需可序列化
+    # before_wait 在等待其他请求的计算结果之前调用，一般传入 db.close 归还数据库连接，等待期间不占用连接池
+    # （会话关闭后仍可使用，等待超时自行计算时重新获取连接）
+    async def get_or_compute(self, name, params, versions, compute, before_wait=None):
+        key = self.make_key(name, params)
+        found, value = self.lookup(key, versions)
+        if found:
+            RESPONSE_CACHE_REQUESTS.inc(cache=name, result="hit")
+            return value
+
+        # 进程内已有同一个键在计算，等待其结果
+        inflight = self._inflight.get(key)
+        if inflight is not None and inflight[0] == versions:
+            RESPONSE_CACHE_REQUESTS.inc(cache=name, result="wait")
+            if before_wait is not None:
+                before_wait()
+            return await asyncio.shield(inflight[1])
+
+        future = asyncio.get_running_loop().create_future()
+        # 没有其他请求等待时，异常不需要被读取
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = (versions, future)
+        try:
+            value = await self._compute_once(name, key, versions, compute, before_wait)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            if self._inflight.get(key, (None, None))[1] is future:
+                del self._inflight[key]
+
+    # 其他进程正在计算同一个键时等待其结果，超过锁的有效期仍未得到结果时自行计算
+    async def _compute_once(self, name, key, versions, compute, before_wait=None):
+        lock_key = f"{key}:{self.make_key('lock', versions)}"
+        locked = self.backend.add(lock_key, os.getpid(), ttl=self.lock_seconds)
+        if not locked:
+            if before_wait is not None:
+                before_wait()
+            deadline = time.monotonic() + self.lock_seconds
+            while time.monotonic() < deadline:
+                await asyncio.sleep(self.WAIT_INTERVAL)
+                found, value = self.lookup(key, versions)
+                if found:
+                    RESPONSE_CACHE_REQUESTS.inc(cache=name, result="wait")
+                    return value
+        RESPONSE_CACHE_REQUESTS.inc(cache=name, result="miss")
+        try:
+            value = compute()
+            self.backend.set(key, (versions, value), ttl=self.ttl)
+            return value
+        finally:
+            if locked:
+                self.backend.delete(lock_key)
+
+response_cache = ResponseCache()
@@ -0,0 +1,146 @@
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# brotli 为可选依赖，未安装时只使用 gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 需要压缩的响应类型，图片等已压缩的内容和SSE事件流不压缩
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/csv",
+    "text/xml",
+)
+
+# 根据 Accept-Encoding 选择压缩算法，优先 brotli，其次 gzip
+def select_encoding(accept_encoding):
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+# 压缩器的统一封装：compress 处理中间数据块，finish 输出剩余数据
+class GzipCompressor:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data=b""):
+        return self._compressor.compress(data) + self._compressor.flush()
+
+class BrotliCompressor:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data=b""):
+        return self._compressor.process(data) + self._compressor.finish()
+
+# 响应压缩中间件：按客户端支持协商 br/gzip，小于 minimum_size 的响应不压缩
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            encoding = select_encoding(Headers(scope=scope).get("Accept-Encoding", ""))
+            if encoding is not None:
+                if encoding == "br":
+                    compressor = BrotliCompressor(self.brotli_quality)
+                else:
+                    compressor = GzipCompressor(self.gzip_level)
+                responder = CompressionResponder(self.app, encoding, compressor, self.minimum_size)
+                await responder(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+class CompressionResponder:
+    def __init__(self, app: ASGIApp, encoding: str, compressor, minimum_size: int) -> None:
+        self.app = app
+        self.encoding = encoding
+        self.compressor = compressor
+        self.minimum_size = minimum_size
+        self.send = None
+        self.initial_message: Message = {}
+        self.started = False
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_with_compression)
+
+    async def send_with_compression(self, message: Message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            # 先缓存响应头，确定是否压缩后再发送
+            self.initial_message = message
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            self.passthrough = (
+                "content-encoding" in headers
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            )
+        elif message_type == "http.response.body" and self.passthrough:
+            if not self.started:
+                self.started = True
+                await self.send(self.initial_message)
+            await self.send(message)
+        elif message_type == "http.response.body" and not self.started:
+            self.started = True
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+            if len(body) < self.minimum_size and not more_body:
+                # 小响应压缩收益有限，直接发送
+                await self.send(self.initial_message)
+                await self.send(message)
+                return
+
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body:
+                message["body"] = self.compressor.finish(body)
+                headers["Content-Length"] = str(len(message["body"]))
+            else:
+                # 流式响应逐块压缩
+                del headers["Content-Length"]
+                message["body"] = self.compressor.compress(body)
+
+            await self.send(self.initial_message)
+            await self.send(message)
+        elif message_type == "http.response.body":
+            body = message.get("body", b"")
+            if message.get("more_body", False):
+                message["body"] = self.compressor.compress(body)
+            else:
+                message["body"] = self.compressor.finish(body)
+            await self.send(message)
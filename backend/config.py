@@ -11,13 +11,45 @@ DB_CONFIG = {
     "database": os.environ.get("DB_NAME", "merchant_stat")
 }
 
-# 数据库连接URL
-DATABASE_URL = f"mysql+pymysql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
+# 数据库连接URL，可通过环境变量 DATABASE_URL 整体覆盖（例如压测时使用 sqlite:///./loadtest.db）
+DATABASE_URL = os.environ.get("DATABASE_URL") or f"mysql+pymysql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
+
+# 数据库连接池配置档，按进程角色通过 DB_POOL_PROFILE 选择，各项也可用环境变量单独覆盖
+# max_waiting：连接池无空闲连接时允许等待的请求数，超过后API直接返回503，不再排队
+# 等待连接的可能是线程池中的同步接口（如清理、群发通知），也可能是阻塞在事件循环中的异步接口，同一进程可以有多个；
+# API进程取0：所有连接都被处理中的请求占用时新请求直接返回503，不为排队的请求再占用工作线程。
+# API进程内的后台线程（通知轮询、图片镜像）使用单独的后台连接池，不占用也不计入接口连接池
+DB_POOL_PROFILES = {
+    # API工作进程：请求短，等不到连接时尽快失败
+    "api": {"pool_size": 10, "max_overflow": 10, "pool_timeout": 3, "max_waiting": 0},
+    # 抓取工作进程、图片镜像等后台进程：并发低，可以等待
+    "worker": {"pool_size": 4, "max_overflow": 4, "pool_timeout": 30, "max_waiting": 100},
+    # 数据库规格较大、单进程并发较高的部署
+    "large": {"pool_size": 30, "max_overflow": 20, "pool_timeout": 3, "max_waiting": 0},
+}
+DB_POOL_PROFILE = os.environ.get("DB_POOL_PROFILE", "api")
+if DB_POOL_PROFILE not in DB_POOL_PROFILES:
+    raise ValueError(f"未知的连接池配置档 DB_POOL_PROFILE={DB_POOL_PROFILE}，可选: {', '.join(DB_POOL_PROFILES)}")
+_pool_profile = DB_POOL_PROFILES[DB_POOL_PROFILE]
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", _pool_profile["pool_size"]))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", _pool_profile["max_overflow"]))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", _pool_profile["pool_timeout"]))  # 等待连接的最长秒数
+DB_POOL_MAX_WAITING = int(os.environ.get("DB_POOL_MAX_WAITING", _pool_profile["max_waiting"]))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))  # 连接重建周期，应小于数据库的 wait_timeout
+DB_POOL_PING_IDLE_SECONDS = float(os.environ.get("DB_POOL_PING_IDLE_SECONDS", 60))  # 空闲超过该时间的连接借出前检测存活，0表示每次都检测
+DB_BACKGROUND_POOL_SIZE = int(os.environ.get("DB_BACKGROUND_POOL_SIZE", 2))  # API进程内后台线程使用的连接池大小
+DB_POOL_RETRY_AFTER_SECONDS = int(os.environ.get("DB_POOL_RETRY_AFTER_SECONDS", 2))  # 连接池满载时503响应的 Retry-After
+
+# 只读副本：逗号分隔的连接URL，配置后只读接口的查询发往副本，未配置时读写都走主库
+DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get("REPLICA_MAX_LAG_SECONDS", 5))  # 副本落后超过该时间时改读主库
+REPLICA_LAG_CHECK_SECONDS = float(os.environ.get("REPLICA_LAG_CHECK_SECONDS", 2))  # 副本延迟的检查间隔
 
 # JWT配置
-SECRET_KEY = secrets.token_hex(32)  # 生成随机安全密钥
+SECRET_KEY = os.environ.get("SECRET_KEY") or secrets.token_hex(32)  # 未配置时生成随机安全密钥（多进程部署需配置为相同的值）
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24小时
+STREAM_TOKEN_EXPIRE_SECONDS = 60  # 通知事件流令牌的有效期，只用于建立连接，放在URL中需尽量短
 
 # 验证码配置
 CAPTCHA_EXPIRE_SECONDS = 300  # 验证码有效期5分钟
@@ -26,6 +58,22 @@ CAPTCHA_EXPIRE_SECONDS = 300  # 验证码有效期5分钟
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
 REQUEST_TIMEOUT = 60  # 增加请求超时时间（秒）
 
+# 抓取流水线：页面在调用方的线程中获取，解析在常驻的进程池中执行（设为0时在当前进程解析）
+SCRAPE_PARSE_WORKERS = int(os.environ.get("SCRAPE_PARSE_WORKERS", os.cpu_count() or 1))
+SCRAPE_PARSE_FILE_THRESHOLD = 256 * 1024  # 超过该字节数的页面通过临时文件传给解析进程
+# BeautifulSoup 解析器，安装 lxml 后可设为 "lxml"
+HTML_PARSER = os.environ.get("SCRAPE_HTML_PARSER", "html.parser")
+
+# 独立抓取工作进程（scrape_worker.py）：从 scrape_job 表认领任务执行，API只负责写入任务
+SCRAPE_WORKER_CONCURRENCY = int(os.environ.get("SCRAPE_WORKER_CONCURRENCY", 2))  # 同时执行的抓取任务数，也是浏览器池大小
+SCRAPE_WORKER_POLL_SECONDS = float(os.environ.get("SCRAPE_WORKER_POLL_SECONDS", 1))  # 队列为空时的轮询间隔
+SCRAPE_JOB_MAX_ATTEMPTS = 3  # 失败后最多重试次数（含第一次）
+SCRAPE_JOB_LEASE_SECONDS = 300  # 执行超时，超时后任务可被其他工作进程重新认领
+SCRAPE_BROWSER_MAX_USES = 50  # 浏览器实例复用次数上限，达到后重启以释放内存
+
+# 通知实时推送：每个API进程按该间隔查询其他进程（抓取工作进程、其他API工作进程）写入的新通知，推送给本进程的在线用户，0表示不查询
+NOTIFICATION_POLL_SECONDS = float(os.environ.get("NOTIFICATION_POLL_SECONDS", 2))
+
 # 代理设置（默认不启用）
 USE_PROXY = False
 PROXY_URL = ""  # 例如 "http://127.0.0.1:7890" 或 "socks5://127.0.0.1:1080"
@@ -33,8 +81,53 @@ PROXY_URL = ""  # 例如 "http://127.0.0.1:7890" 或 "socks5://127.0.0.1:1080"
 # SSL设置
 VERIFY_SSL = False  # 是否验证SSL证书
 
+# 定时重新抓取配置
+RECRAWL_ENABLED = os.environ.get("RECRAWL_ENABLED", "false").lower() == "true"
+RECRAWL_CONCURRENCY = int(os.environ.get("RECRAWL_CONCURRENCY", 4))  # 同时抓取的商品数
+RECRAWL_TICK_SECONDS = 30  # 调度间隔
+RECRAWL_MIN_INTERVAL_HOURS = 1  # 热门商品的最短抓取间隔
+RECRAWL_MAX_INTERVAL_HOURS = 72  # 无销量商品的抓取间隔
+RECRAWL_JITTER = 0.1  # 抓取时间随机抖动比例，避免集中请求
+# 各平台每分钟最多抓取次数，未列出的平台使用默认值
+RECRAWL_RATE_LIMITS = {"Amazon": 6, "eBay": 20, "AliExpress": 6}
+RECRAWL_DEFAULT_RATE_LIMIT = 10
+
+# 商品图片本地镜像：下载原图后按内容哈希生成多种尺寸的WebP缩略图，存放在静态目录
+IMAGE_MIRROR_ENABLED = os.environ.get("IMAGE_MIRROR_ENABLED", "false").lower() == "true"
+IMAGE_MIRROR_CONCURRENCY = int(os.environ.get("IMAGE_MIRROR_CONCURRENCY", 4))  # 同时下载的图片数
+IMAGE_MIRROR_BATCH_SIZE = 50  # 每批处理的图片数，结果在一个事务中写入
+IMAGE_MIRROR_TICK_SECONDS = 10  # 没有待处理图片时的检查间隔
+IMAGE_DIR = "static/images"
+IMAGE_THUMBNAIL_SIZES = (96, 240, 480)  # 缩略图最长边的像素数
+IMAGE_LIST_THUMBNAIL_SIZE = 96  # 商品列表使用的缩略图尺寸
+IMAGE_WEBP_QUALITY = 80
+IMAGE_MAX_BYTES = 10 * 1024 * 1024  # 原图大小上限
+IMAGE_CACHE_MAX_AGE = 365 * 24 * 3600  # 缩略图按内容哈希命名，内容不会变化，浏览器可长期缓存
+
+# 性能监控：执行时间超过该秒数的SQL记录到慢查询日志
+SLOW_QUERY_SECONDS = float(os.environ.get("SLOW_QUERY_SECONDS", 0.2))
+# 监控指标接口 /metrics：METRICS_ENABLED=false 时不注册；配置 METRICS_TOKEN 后需带 Authorization: Bearer <令牌> 访问，
+# 未配置令牌时只允许本机访问（经同机nginx转发的请求由nginx限制来源）
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# 按需性能分析：管理员可对工作进程采样或对单个请求（X-Profile: 1 请求头）采样，关闭时不注册中间件
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "true").lower() == "true"
+PROFILING_INTERVAL_MS = 5  # 采样间隔（毫秒）
+PROFILING_MAX_SECONDS = 60  # 单次采样的最长时间
+
+# 读接口响应缓存：memory 为每个工作进程各自的LRU，sqlite 为本机多个工作进程共享的SQLite文件
+RESPONSE_CACHE_BACKEND = os.environ.get("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_PATH = os.environ.get("RESPONSE_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "response_cache.db"))
+RESPONSE_CACHE_MAXSIZE = int(os.environ.get("RESPONSE_CACHE_MAXSIZE", 2048))  # 最多缓存的条目数
+RESPONSE_CACHE_TTL_SECONDS = 600  # 条目按表版本号失效，过期时间只用于回收长期不用的条目
+RESPONSE_CACHE_LOCK_SECONDS = 10  # 同一条目计算中时其他请求最多等待的秒数
+
 # 应用配置
 API_PREFIX = "/api"
+
+# 响应压缩配置：小于该字节数的响应不压缩
+COMPRESSION_MINIMUM_SIZE = int(os.environ.get("COMPRESSION_MINIMUM_SIZE", 1024))
 # 限制CORS来源，允许本地开发环境、特定域名和所有生产环境域名
 ALLOW_ORIGINS = ["http://localhost:3000", "http://127.0.0.1:3000", "http://localhost:8000", "http://127.0.0.1:8000"]
 
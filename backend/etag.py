@@ -0,0 +1,26 @@
+from fastapi import Request, Response
+import hashlib
+
+# 条件请求的缓存策略：浏览器可缓存，但每次使用前都要带 If-None-Match 重新验证
+CACHE_CONTROL = "private, no-cache"
+
+# 根据表版本号、请求参数等计算弱ETag（响应可能被压缩，字节不一定一致）
+def compute_etag(*parts):
+    digest = hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+def etag_headers(etag):
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+# 请求的 If-None-Match 与当前ETag匹配时返回304响应，否则返回None
+def not_modified(request: Request, etag):
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+
+    current = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == current:
+            return Response(status_code=304, headers=etag_headers(etag))
+    return None
@@ -0,0 +1,289 @@
+from sqlalchemy import or_, insert
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from io import BytesIO
+import hashlib
+import os
+import tempfile
+import threading
+
+from starlette.staticfiles import StaticFiles
+
+from models import SessionLocal, Product, ProductImage
+from config import (
+    USER_AGENT, REQUEST_TIMEOUT, USE_PROXY, PROXY_URL, VERIFY_SSL,
+    IMAGE_MIRROR_CONCURRENCY, IMAGE_MIRROR_BATCH_SIZE, IMAGE_MIRROR_TICK_SECONDS, IMAGE_DIR,
+    IMAGE_THUMBNAIL_SIZES, IMAGE_LIST_THUMBNAIL_SIZE, IMAGE_WEBP_QUALITY, IMAGE_MAX_BYTES, IMAGE_CACHE_MAX_AGE
+)
+
+# 缩略图目录和对应的访问路径，文件名为 <内容哈希>_<尺寸>.webp，按哈希前两位分子目录
+THUMBNAIL_DIR = os.path.join(IMAGE_DIR, "thumbs")
+THUMBNAIL_URL_PREFIX = "/static/images/thumbs"
+# 认领下载任务的租约，进程异常退出后租约到期自动重试
+CLAIM_LEASE = timedelta(minutes=10)
+# 每次登记的新图片数
+REGISTER_BATCH_SIZE = 1000
+# 商品更新时间与登记进度之间的重叠窗口，避免漏掉提交较晚的事务
+REGISTER_OVERLAP = timedelta(minutes=5)
+# 失败重试的最长间隔
+MAX_RETRY_INTERVAL = timedelta(days=1)
+
+def thumbnail_path(content_hash, size):
+    return os.path.join(THUMBNAIL_DIR, content_hash[:2], f"{content_hash}_{size}.webp")
+
+def thumbnail_url(content_hash, size=IMAGE_LIST_THUMBNAIL_SIZE):
+    if not content_hash:
+        return None
+    return f"{THUMBNAIL_URL_PREFIX}/{content_hash[:2]}/{content_hash}_{size}.webp"
+
+def has_thumbnails(content_hash):
+    return all(os.path.exists(thumbnail_path(content_hash, size)) for size in IMAGE_THUMBNAIL_SIZES)
+
+# 失败后的重试间隔，按失败次数指数退避
+def retry_interval(failure_count):
+    return min(timedelta(minutes=2 ** max(failure_count - 1, 0)), MAX_RETRY_INTERVAL)
+
+# 下载原图，超过大小上限时放弃
+def download_image(url):
+    import requests
+
+    proxies = {"http": PROXY_URL, "https": PROXY_URL} if USE_PROXY and PROXY_URL else None
+    with requests.get(
+        url,
+        headers={"User-Agent": USER_AGENT},
+        timeout=REQUEST_TIMEOUT,
+        proxies=proxies,
+        verify=VERIFY_SSL,
+        stream=True
+    ) as response:
+        response.raise_for_status()
+        content_type = response.headers.get("Content-Type", "")
+        if content_type and not content_type.startswith("image/"):
+            raise ValueError(f"不是图片: {content_type}")
+        data = BytesIO()
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            data.write(chunk)
+            if data.tell() > IMAGE_MAX_BYTES:
+                raise ValueError("图片超过大小上限")
+        return data.getvalue()
+
+# 原子写入文件：先写临时文件再改名，多个进程同时生成同一缩略图时不会读到半个文件
+def write_file_atomic(path, save):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            save(f)
+        os.replace(temp_path, path)
+    except Exception:
+        os.remove(temp_path)
+        raise
+
+# 生成各尺寸的WebP缩略图，返回内容哈希；相同内容的图片已生成过时直接复用
+def write_thumbnails(data):
+    # PIL 只在镜像进程中用到，API进程只需要生成缩略图地址
+    from PIL import Image, ImageOps
+
+    content_hash = hashlib.sha256(data).hexdigest()
+    if has_thumbnails(content_hash):
+        return content_hash
+
+    image = Image.open(BytesIO(data))
+    # JPEG 可在解码时直接缩小，大图只解码到接近最大缩略图的尺寸
+    largest = max(IMAGE_THUMBNAIL_SIZES)
+    image.draft("RGB", (largest, largest))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+
+    # 从大到小依次缩放，每次在上一尺寸的结果上缩小
+    for size in sorted(IMAGE_THUMBNAIL_SIZES, reverse=True):
+        image.thumbnail((size, size), Image.LANCZOS)
+        write_file_atomic(
+            thumbnail_path(content_hash, size),
+            lambda f: image.save(f, "WEBP", quality=IMAGE_WEBP_QUALITY, method=4)
+        )
+    return content_hash
+
+def mirror_image(url):
+    return write_thumbnails(download_image(url))
+
+# 缩略图的静态文件服务：文件内容不会变化，返回长期缓存头
+class ImmutableStaticFiles(StaticFiles):
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = f"public, max-age={IMAGE_CACHE_MAX_AGE}, immutable"
+        return response
+
+# 商品图片镜像：登记有图片的商品，分批下载原图并生成缩略图，每批结果在一个事务中写入
+class ImageMirror:
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        fetch=mirror_image,
+        concurrency=IMAGE_MIRROR_CONCURRENCY,
+        batch_size=IMAGE_MIRROR_BATCH_SIZE,
+        tick_seconds=IMAGE_MIRROR_TICK_SECONDS
+    ):
+        self.session_factory = session_factory
+        self.fetch = fetch
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.tick_seconds = tick_seconds
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="image-mirror")
+        self._stop = threading.Event()
+        self._thread = None
+        # 已登记到的商品更新时间，之后只检查这之后更新过的商品
+        self._registered_until = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self.run_forever, name="image-mirror", daemon=True)
+        self._thread.start()
+
+    def stop(self, wait=True):
+        self._stop.set()
+        if self._thread is not None and wait:
+            self._thread.join()
+        self._executor.shutdown(wait=wait)
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                processed = self.tick()
+            except Exception as e:
+                print(f"图片镜像出错: {e}")
+                processed = 0
+            # 处理满一批说明还有积压，立即继续
+            if processed < self.batch_size:
+                self._stop.wait(self.tick_seconds)
+
+    # 登记新增图片或图片地址变化的商品，按商品更新时间递增扫描
+    def register_products(self, db):
+        query = db.query(
+            Product.id, Product.image_url, Product.updated_at, ProductImage.product_id.label("registered_id")
+        ).outerjoin(
+            ProductImage, ProductImage.product_id == Product.id
+        ).filter(
+            Product.image_url.isnot(None),
+            Product.image_url != "",
+            or_(ProductImage.product_id.is_(None), ProductImage.source_url != Product.image_url)
+        )
+        if self._registered_until is not None:
+            query = query.filter(Product.updated_at >= self._registered_until)
+        rows = query.order_by(Product.updated_at).limit(REGISTER_BATCH_SIZE).all()
+        if not rows:
+            return 0
+
+        now = datetime.now()
+        new_rows = [
+            {"product_id": row.id, "source_url": row.image_url, "next_attempt_at": now, "failure_count": 0}
+            for row in rows if row.registered_id is None
+        ]
+        if new_rows:
+            db.execute(insert(ProductImage), new_rows)
+        for row in rows:
+            if row.registered_id is not None:
+                db.query(ProductImage).filter(ProductImage.product_id == row.id).update({
+                    ProductImage.source_url: row.image_url,
+                    ProductImage.content_hash: None,
+                    ProductImage.next_attempt_at: now,
+                    ProductImage.failure_count: 0,
+                    ProductImage.last_error: None,
+                }, synchronize_session=False)
+        db.commit()
+
+        last_updated_at = rows[-1].updated_at
+        if last_updated_at is not None:
+            # 一批没有登记完时从本批最后的时间继续，否则保留重叠窗口
+            if len(rows) < REGISTER_BATCH_SIZE:
+                last_updated_at -= REGISTER_OVERLAP
+            if self._registered_until is None or last_updated_at > self._registered_until:
+                self._registered_until = last_updated_at
+        return len(rows)
+
+    # 认领任务：把下次尝试时间推迟一个租约，多个进程同时处理时只有一个能认领成功
+    def claim(self, db, product_id, next_attempt_at, now):
+        claimed = db.query(ProductImage).filter(
+            ProductImage.product_id == product_id,
+            ProductImage.next_attempt_at == next_attempt_at
+        ).update({ProductImage.next_attempt_at: now + CLAIM_LEASE}, synchronize_session=False)
+        db.commit()
+        return claimed == 1
+
+    def fetch_one(self, url):
+        try:
+            return self.fetch(url), None
+        except Exception as e:
+            return None, str(e) or type(e).__name__
+
+    # 处理一批到期的图片，返回处理的数量
+    def tick(self):
+        db = self.session_factory()
+        try:
+            self.register_products(db)
+
+            now = datetime.now()
+            due = db.query(
+                ProductImage.product_id, ProductImage.source_url, ProductImage.next_attempt_at
+            ).filter(
+                ProductImage.next_attempt_at <= now
+            ).order_by(ProductImage.next_attempt_at).limit(self.batch_size).all()
+            claimed = [row for row in due if self.claim(db, row.product_id, row.next_attempt_at, now)]
+            if not claimed:
+                return 0
+
+            # 同一地址已下载过且缩略图还在时直接复用，不重复下载
+            known = dict(db.query(ProductImage.source_url, ProductImage.content_hash).filter(
+                ProductImage.source_url.in_({row.source_url for row in claimed}),
+                ProductImage.content_hash.isnot(None)
+            ).all())
+            results = {}
+            pending_urls = []
+            for row in claimed:
+                content_hash = known.get(row.source_url)
+                if content_hash and has_thumbnails(content_hash):
+                    results[row.source_url] = (content_hash, None)
+                elif row.source_url not in results:
+                    results[row.source_url] = None
+                    pending_urls.append(row.source_url)
+            results.update(zip(pending_urls, self._executor.map(self.fetch_one, pending_urls)))
+
+            self.save_results(db, claimed, results)
+            return len(claimed)
+        finally:
+            db.close()
+
+    # 一个事务写入整批结果，商品列表的缓存和ETag每批只失效一次
+    def save_results(self, db, claimed, results):
+        now = datetime.now()
+        images = db.query(ProductImage).filter(
+            ProductImage.product_id.in_([row.product_id for row in claimed])
+        ).all()
+        claimed_urls = {row.product_id: row.source_url for row in claimed}
+        for image in images:
+            # 处理期间图片地址又变化了，交给下一次登记
+            if image.source_url != claimed_urls[image.product_id]:
+                continue
+            content_hash, error = results[image.source_url]
+            if error is None:
+                image.content_hash = content_hash
+                image.next_attempt_at = None
+                image.failure_count = 0
+                image.last_error = None
+            else:
+                image.failure_count = (image.failure_count or 0) + 1
+                image.last_error = error[:255]
+                image.next_attempt_at = now + retry_interval(image.failure_count)
+        db.commit()
+
+# 单独运行图片镜像：python images.py
+if __name__ == "__main__":
+    mirror = ImageMirror()
+    print(f"图片镜像已启动，并发数 {mirror.concurrency}，缩略图目录 {THUMBNAIL_DIR}")
+    try:
+        mirror.run_forever()
+    except KeyboardInterrupt:
+        mirror.stop(wait=False)
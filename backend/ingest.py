@@ -0,0 +1,62 @@
+from sqlalchemy.orm import Session
+
+from models import Product, ProductCategory, Platform, new_crawl_schedule
+from alerts import ProductChange, evaluate_product_changes
+from notifier import latest_notification_id, publish_notifications_since
+
+# 查找或创建平台
+def get_or_create_platform(db: Session, name: str):
+    platform = db.query(Platform).filter(Platform.name == name).first()
+    if not platform:
+        platform = Platform(name=name, website="")
+        db.add(platform)
+        db.commit()
+        db.refresh(platform)
+    return platform
+
+# 查找或创建分类
+def get_or_create_category(db: Session, name: str):
+    category = db.query(ProductCategory).filter(ProductCategory.name == name).first()
+    if not category:
+        category = ProductCategory(name=name)
+        db.add(category)
+        db.commit()
+        db.refresh(category)
+    return category
+
+# 保存抓取结果：URL已存在时更新商品并检查价格提醒，否则创建新商品
+def save_scraped_product(db: Session, product_data):
+    platform = get_or_create_platform(db, product_data.platform_name)
+    category = get_or_create_category(db, product_data.category_name)
+    
+    product = db.query(Product).filter(Product.url == product_data.url).first()
+    change = None
+    if product is None:
+        product = Product(url=product_data.url, crawl_schedule=new_crawl_schedule())
+        db.add(product)
+    else:
+        change = ProductChange(product, product_data.price, product_data.sales_count)
+    
+    product.name = product_data.name
+    product.price = product_data.price
+    product.currency = product_data.currency
+    product.sales_count = product_data.sales_count
+    product.image_url = product_data.image_url
+    product.description = product_data.description
+    product.specifications = product_data.specifications or None
+    product.category_id = category.id
+    product.platform_id = platform.id
+    
+    # 提醒通知与商品更新在同一事务中提交
+    notified_user_ids = []
+    if change is not None:
+        after_id = latest_notification_id(db)
+        notified_user_ids = evaluate_product_changes(db, [change])
+    
+    db.commit()
+    db.refresh(product)
+    
+    if notified_user_ids:
+        publish_notifications_since(db, notified_user_ids, after_id)
+    
+    return product, category, platform
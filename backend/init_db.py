@@ -4,6 +4,7 @@ import string
 from passlib.context import CryptContext
 from config import DB_CONFIG
 from models import create_tables, SessionLocal, SysUser, ProductCategory, Platform
+from migrations import upgrade
 
 # 密码哈希工具
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -125,6 +126,7 @@ def init_database():
     print("开始初始化数据库...")
     create_database()
     create_tables()
+    upgrade()
     init_admin_user()
     init_categories()
     init_platforms()
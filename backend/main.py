@@ -1,24 +1,47 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse
 import uvicorn
 import os
+import secrets
+import traceback
 
-from config import ALLOW_ORIGINS, API_PREFIX
-from models import get_db, SysUser
+from config import (
+    ALLOW_ORIGINS, API_PREFIX, COMPRESSION_MINIMUM_SIZE, IMAGE_MIRROR_ENABLED, PROFILING_ENABLED,
+    NOTIFICATION_POLL_SECONDS, METRICS_ENABLED, METRICS_TOKEN
+)
+from compression import CompressionMiddleware
+from admission import AdmissionMiddleware, PoolTimeoutError, pool_timeout_handler
+from metrics import MetricsMiddleware, registry, route_label, HTTP_EXCEPTIONS
+from sqlalchemy.orm import Session
+from models import get_db, get_read_db, get_table_versions, SysUser, BackgroundSessionLocal
+from cache import response_cache
 from auth import get_current_active_user
+from images import ImmutableStaticFiles, THUMBNAIL_DIR, THUMBNAIL_URL_PREFIX
 
 # 导入路由
-from routers import auth, products, categories, platforms, notifications
+from routers import auth, products, categories, platforms, notifications, watches, admin
 
 # 创建FastAPI应用
 app = FastAPI(
     title="跨境电商商品统计系统",
     description="用于统计各个跨境电商平台热门商品信息的系统",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
+# 单个请求性能分析（请求头 X-Profile: 1，仅管理员），未启用时不注册，没有额外开销
+if PROFILING_ENABLED:
+    from profiler import ProfilingMiddleware
+    app.add_middleware(ProfilingMiddleware)
+
+# 响应压缩（根据客户端支持选择 br 或 gzip）
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE)
+
+# 连接池满载时直接返回503（在CORS之内，浏览器能读到响应）
+app.add_middleware(AdmissionMiddleware)
+
 # 配置CORS
 app.add_middleware(
     CORSMiddleware,
@@ -26,19 +49,64 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing", "Retry-After", "X-Profile-Status", "X-Profile-Duration", "X-Profile-Samples"],
 )
 
+# 请求计时与数据库查询统计（最外层，耗时包含压缩）
+app.add_middleware(MetricsMiddleware)
+
 # 注册路由
 app.include_router(auth.router, prefix=API_PREFIX)
 app.include_router(products.router, prefix=API_PREFIX)
 app.include_router(categories.router, prefix=API_PREFIX)
 app.include_router(platforms.router, prefix=API_PREFIX)
 app.include_router(notifications.router, prefix=API_PREFIX)
+app.include_router(watches.router, prefix=API_PREFIX)
+app.include_router(admin.router, prefix=API_PREFIX)
+
+# 商品图片本地镜像（设置环境变量 IMAGE_MIRROR_ENABLED=true 时随服务启动）
+image_mirror = None
+
+@app.on_event("startup")
+async def start_image_mirror():
+    global image_mirror
+    if IMAGE_MIRROR_ENABLED:
+        from images import ImageMirror
+        image_mirror = ImageMirror(session_factory=BackgroundSessionLocal)
+        image_mirror.start()
+
+@app.on_event("shutdown")
+async def stop_image_mirror():
+    if image_mirror is not None:
+        image_mirror.stop(wait=False)
+
+# 跨进程通知推送：查询其他进程写入的新通知推送给本进程的在线用户
+notification_poller = None
+
+@app.on_event("startup")
+async def start_notification_poller():
+    global notification_poller
+    if NOTIFICATION_POLL_SECONDS > 0:
+        from notifier import NotificationPoller
+        notification_poller = NotificationPoller(session_factory=BackgroundSessionLocal)
+        notification_poller.start()
+
+@app.on_event("shutdown")
+async def stop_notification_poller():
+    if notification_poller is not None:
+        notification_poller.stop(wait=False)
+
+# 关闭抓取解析进程池
+@app.on_event("shutdown")
+async def stop_parse_pool():
+    from parse_pool import shutdown_parse_pool
+    shutdown_parse_pool(wait=False)
 
 # 创建静态文件目录
-os.makedirs("static/images", exist_ok=True)
+os.makedirs(THUMBNAIL_DIR, exist_ok=True)
 
-# 挂载静态文件
+# 挂载静态文件，缩略图按内容哈希命名，单独挂载并返回长期缓存头（需在 /static 之前挂载）
+app.mount(THUMBNAIL_URL_PREFIX, ImmutableStaticFiles(directory=THUMBNAIL_DIR), name="thumbnails")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # 根路由
@@ -51,6 +119,18 @@ async def root():
 async def health_check():
     return {"status": "ok"}
 
+# 监控指标（Prometheus 文本格式），每个工作进程分别统计；配置了 METRICS_TOKEN 时校验令牌，否则只允许本机访问
+if METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics(request: Request):
+        if METRICS_TOKEN:
+            authorization = request.headers.get("Authorization", "")
+            if not secrets.compare_digest(authorization, f"Bearer {METRICS_TOKEN}"):
+                raise HTTPException(status_code=401, detail="无效的监控令牌")
+        elif request.client is None or request.client.host not in ("127.0.0.1", "::1"):
+            raise HTTPException(status_code=403, detail="监控指标只允许本机访问")
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # 获取系统信息（需要认证）
 @app.get("/api/system-info")
 async def system_info(current_user: SysUser = Depends(get_current_active_user)):
@@ -64,13 +144,19 @@ async def system_info(current_user: SysUser = Depends(get_current_active_user)):
         }
     }
 
-# 获取系统统计数据（需要认证）
+# 获取系统统计数据（需要认证），按相关表的版本号缓存
 @app.get("/api/system-stats")
-async def system_stats(current_user: SysUser = Depends(get_current_active_user)):
-    from sqlalchemy.orm import Session
-    from models import Product, ProductCategory, Platform, get_db
-    
-    db = next(get_db())
+async def system_stats(
+    db: Session = Depends(get_read_db),
+    current_user: SysUser = Depends(get_current_active_user)
+):
+    versions = get_table_versions(db, "product", "product_category", "platform")
+    return await response_cache.get_or_compute(
+        "system_stats", (), versions, lambda: load_system_stats(db), before_wait=db.close
+    )
+
+def load_system_stats(db: Session):
+    from models import Product, ProductCategory, Platform
     
     # 获取统计数据
     product_count = db.query(Product).count()
@@ -95,9 +181,16 @@ async def system_stats(current_user: SysUser = Depends(get_current_active_user))
         ]
     }
 
+# 等待数据库连接超时
+app.add_exception_handler(PoolTimeoutError, pool_timeout_handler)
+
 # 异常处理
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
+    route = route_label(request.scope)
+    HTTP_EXCEPTIONS.inc(route=route, exception=type(exc).__name__)
+    print(f"请求处理出错 {request.method} {request.url.path} [{route}]:\n"
+          + "".join(traceback.format_exception(type(exc), exc, exc.__traceback__)))
     return JSONResponse(
         status_code=500,
         content={"detail": "Internal server error"}
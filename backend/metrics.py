@@ -0,0 +1,283 @@
+from bisect import bisect_left
+from contextvars import ContextVar
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import SLOW_QUERY_SECONDS
+
+# 延迟类指标的桶边界（秒）
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# 每个请求的查询次数的桶边界
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+# 慢查询日志中SQL语句的最大长度
+SLOW_QUERY_LOG_LENGTH = 1000
+
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_labels(labelnames, values, extra=()):
+    pairs = [f'{name}="{escape_label_value(value)}"' for name, value in zip(labelnames, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+# 指标基类：按标签取值分别统计，进程内线程安全；多个工作进程各自统计，由采集端汇总
+class Metric:
+    type = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def label_values(self, labels):
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.render_samples())
+        return lines
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self.label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render_samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}" for key, value in items]
+
+# 仪表盘指标：可直接设置，也可以传入回调在输出时读取当前值
+class Gauge(Metric):
+    type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self.label_values(labels)] = value
+
+    # callback 返回单个值，或带标签时返回 {标签值元组: 值}
+    def render_samples(self):
+        if self.callback is not None:
+            value = self.callback()
+            items = sorted(value.items()) if isinstance(value, dict) else [((), value)]
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return [f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}" for key, value in items]
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self.label_values(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # 各桶的计数（非累计）、总和、总数
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render_samples(self):
+        with self._lock:
+            items = sorted((key, (list(state[0]), state[1], state[2])) for key, state in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for upper, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = format_labels(self.labelnames, key, [("le", format_value(upper))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs):
+        return self.register(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs):
+        return self.register(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self.register(Histogram(*args, **kwargs))
+
+    # 输出 Prometheus 文本格式
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.counter("http_requests_total", "HTTP请求数", ("method", "route", "status"))
+HTTP_REQUEST_DURATION = registry.histogram("http_request_duration_seconds", "HTTP请求耗时", ("method", "route"))
+HTTP_EXCEPTIONS = registry.counter("http_exceptions_total", "未处理的异常数", ("route", "exception"))
+DB_QUERY_DURATION = registry.histogram("db_query_duration_seconds", "单条SQL执行耗时")
+DB_SLOW_QUERIES = registry.counter("db_slow_queries_total", "超过阈值的慢查询数")
+DB_REQUEST_QUERIES = registry.histogram(
+    "db_request_queries", "每个HTTP请求执行的SQL条数", ("route",), buckets=QUERY_COUNT_BUCKETS
+)
+DB_REQUEST_QUERY_DURATION = registry.histogram("db_request_query_seconds", "每个HTTP请求的SQL总耗时", ("route",))
+DB_POOL_CHECKOUT_WAIT = registry.histogram("db_pool_checkout_wait_seconds", "从连接池获取连接的等待时间")
+DB_POOL_REJECTIONS = registry.counter("db_pool_rejections_total", "连接池满载时拒绝的请求数", ("reason",))
+SCRAPE_FETCH_DURATION = registry.histogram("scrape_fetch_seconds", "抓取页面获取耗时", ("platform",))
+SCRAPE_PARSE_DURATION = registry.histogram("scrape_parse_seconds", "抓取页面解析耗时（含进程池排队）", ("platform",))
+SCRAPE_FAILURES = registry.counter("scrape_failures_total", "抓取失败次数", ("platform", "stage"))
+
+# 当前请求的数据库统计，由中间件设置；同步依赖和接口在线程池中执行时会复制上下文，修改的是同一个对象
+class RequestStats:
+    __slots__ = ("queries", "query_time", "scope")
+
+    def __init__(self, scope):
+        self.queries = 0
+        self.query_time = 0.0
+        self.scope = scope
+
+_request_stats = ContextVar("request_stats", default=None)
+
+# 记录等待时间的连接池：连接池满时获取连接会阻塞，等待时间即连接池压力；waiting 为正在获取连接的线程数
+class TimedQueuePool(QueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waiting = 0
+        self._waiting_lock = threading.Lock()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        with self._waiting_lock:
+            self.waiting += 1
+        try:
+            return super()._do_get()
+        finally:
+            with self._waiting_lock:
+                self.waiting -= 1
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+
+    # 没有空闲连接且不能再创建新连接时，新的请求只能等待
+    def saturated(self):
+        return self.checkedin() == 0 and self.overflow() >= self._max_overflow
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    DB_QUERY_DURATION.observe(elapsed)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.query_time += elapsed
+    if elapsed >= SLOW_QUERY_SECONDS:
+        DB_SLOW_QUERIES.inc()
+        route = route_label(stats.scope) if stats is not None else "-"
+        print(f"慢查询 {elapsed * 1000:.0f}ms [{route}]: {' '.join(statement.split())[:SLOW_QUERY_LOG_LENGTH]}")
+
+def _handle_error(context):
+    # 执行出错时不会触发 after_cursor_execute，丢弃对应的开始时间
+    if context.connection is not None:
+        start_times = context.connection.info.get("query_start_time")
+        if start_times:
+            start_times.pop()
+
+# 为引擎注册SQL计时和连接池状态指标
+# 各数据库（主库和只读副本）的引擎，连接池指标按 database 标签分别输出
+_pooled_engines = {}
+
+def _pool_gauge(name, documentation, read):
+    registry.gauge(name, documentation, ("database",), callback=lambda: {
+        (database,): read(engine.pool) for database, engine in _pooled_engines.items()
+    })
+
+_pool_gauge("db_pool_size", "连接池大小", lambda pool: pool.size())
+_pool_gauge("db_pool_checked_out", "已借出的连接数", lambda pool: pool.checkedout())
+_pool_gauge("db_pool_overflow", "超出连接池大小的连接数", lambda pool: max(pool.overflow(), 0))
+_pool_gauge("db_pool_waiting", "正在等待连接的线程数", lambda pool: getattr(pool, "waiting", 0))
+
+def instrument_engine(engine, database="primary"):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    if isinstance(engine.pool, QueuePool):
+        _pooled_engines[database] = engine
+
+# 请求对应的路由模板（如 /api/products/{product_id}），避免按实际路径产生过多标签
+def route_label(scope):
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return route.path
+    # 挂载的静态文件目录
+    return scope.get("root_path") or "unmatched"
+
+# 请求计时中间件：按路由统计请求耗时、状态码和数据库查询，并通过 Server-Timing 响应头返回本次请求的耗时
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = _request_stats.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed = time.perf_counter() - start
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    f'app;dur={elapsed * 1000:.1f}, db;dur={stats.query_time * 1000:.1f};desc="{stats.queries} queries"'
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stats.reset(token)
+            elapsed = time.perf_counter() - start
+            route = route_label(scope)
+            method = scope["method"]
+            HTTP_REQUESTS.inc(method=method, route=route, status=status_code)
+            HTTP_REQUEST_DURATION.observe(elapsed, method=method, route=route)
+            DB_REQUEST_QUERIES.observe(stats.queries, route=route)
+            DB_REQUEST_QUERY_DURATION.observe(stats.query_time, route=route)
@@ -0,0 +1,198 @@
+from sqlalchemy import select, text, inspect
+import json
+
+from models import (
+    engine, Product, ProductSpec, Notification, NotificationArchive, PriceWatch,
+    CrawlSchedule, ProductImage, ScrapeJob,
+    SchemaMigration, TableVersion, VERSIONED_TABLES
+)
+
+# 数据回填时每批处理的行数
+BATCH_SIZE = 1000
+
+# 已注册的迁移列表：(版本号, 描述, 升级函数)
+MIGRATIONS = []
+
+# 注册迁移的装饰器，版本号必须递增且不可复用
+def migration(version, description):
+    def decorator(func):
+        if any(item[0] == version for item in MIGRATIONS):
+            raise ValueError(f"迁移版本 {version} 重复")
+        MIGRATIONS.append((version, description, func))
+        return func
+    return decorator
+
+# 按模型中声明的索引名创建索引（已存在时跳过，保证新库和旧库都能执行）
+def create_model_index(conn, model, index_name):
+    for index in model.__table__.indexes:
+        if index.name == index_name:
+            index.create(bind=conn, checkfirst=True)
+            return
+    raise ValueError(f"模型 {model.__name__} 中未声明索引 {index_name}")
+
+# 迁移1：为商品列表和通知列表的高频查询添加复合索引
+@migration(1, "商品列表与通知查询的复合索引")
+def add_query_indexes(conn):
+    for index_name in (
+        "ix_product_updated_at",
+        "ix_product_sales_count",
+        "ix_product_category_updated",
+        "ix_product_category_price",
+        "ix_product_platform_updated",
+        "ix_product_platform_price",
+    ):
+        create_model_index(conn, Product, index_name)
+
+    create_model_index(conn, Notification, "ix_notification_user_read_created")
+
+# 迁移2：规格参数改为原生JSON列，并回填键值索引表 product_spec
+@migration(2, "商品规格参数改为JSON列并建立键值索引表")
+def add_product_spec_table(conn):
+    ProductSpec.__table__.create(bind=conn, checkfirst=True)
+    spec_table = ProductSpec.__table__
+
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT id, specifications FROM product "
+            "WHERE id > :last_id AND specifications IS NOT NULL "
+            "ORDER BY id LIMIT :batch_size"
+        ), {"last_id": last_id, "batch_size": BATCH_SIZE}).fetchall()
+        if not rows:
+            break
+
+        product_ids = [row[0] for row in rows]
+        entries = []
+        invalid_ids = []
+        for product_id, raw in rows:
+            try:
+                specs = json.loads(raw) if isinstance(raw, str) else raw
+            except ValueError:
+                specs = None
+            if not isinstance(specs, dict):
+                invalid_ids.append(product_id)
+                continue
+            for spec_key, spec_value in specs.items():
+                entries.append({
+                    "product_id": product_id,
+                    "spec_key": str(spec_key)[:100],
+                    "spec_value": str(spec_value)[:255]
+                })
+
+        conn.execute(spec_table.delete().where(spec_table.c.product_id.in_(product_ids)))
+        if entries:
+            conn.execute(spec_table.insert(), entries)
+        # 无法解析的旧数据置空，否则无法转换为JSON列
+        if invalid_ids:
+            conn.execute(Product.__table__.update()
+                         .where(Product.__table__.c.id.in_(invalid_ids))
+                         .values(specifications=None))
+        last_id = product_ids[-1]
+
+    # SQLite 的 JSON 列以文本存储，只有 MySQL 需要修改列类型
+    if conn.dialect.name == "mysql":
+        conn.execute(text("ALTER TABLE product MODIFY specifications JSON NULL"))
+
+# 插入缺少的版本号记录，写入时只更新已有记录，不在并发事务中插入
+def seed_table_versions(conn):
+    table = TableVersion.__table__
+    existing = set(conn.execute(select(table.c.table_name)).scalars())
+    rows = [{"table_name": name, "version": 0} for name in VERSIONED_TABLES if name not in existing]
+    if rows:
+        conn.execute(table.insert(), rows)
+
+# 迁移3：数据表版本号表，预先插入各表的记录，避免首次写入时并发插入冲突
+@migration(3, "数据表版本号表")
+def add_table_version(conn):
+    TableVersion.__table__.create(bind=conn, checkfirst=True)
+    table = TableVersion.__table__
+
+    seed_table_versions(conn)
+
+# 迁移4：用户表增加未读通知计数列并按现有通知回填，通知分页列表增加 (user_id, created_at) 索引
+@migration(4, "用户未读通知计数与通知分页索引")
+def add_unread_notification_count(conn):
+    create_model_index(conn, Notification, "ix_notification_user_created")
+
+    columns = {column["name"] for column in inspect(conn).get_columns("sys_user")}
+    if "unread_notification_count" not in columns:
+        conn.execute(text("ALTER TABLE sys_user ADD COLUMN unread_notification_count INTEGER NOT NULL DEFAULT 0"))
+
+    conn.execute(text(
+        "UPDATE sys_user SET unread_notification_count = ("
+        "SELECT COUNT(*) FROM notification "
+        "WHERE notification.user_id = sys_user.id AND notification.is_read = :is_read)"
+    ), {"is_read": False})
+
+# 迁移5：通知归档表
+@migration(5, "通知归档表")
+def add_notification_archive(conn):
+    NotificationArchive.__table__.create(bind=conn, checkfirst=True)
+
+# 迁移6：价格提醒表，抓取入库按URL查找商品的索引
+@migration(6, "价格提醒表与商品URL索引")
+def add_price_watch(conn):
+    PriceWatch.__table__.create(bind=conn, checkfirst=True)
+    create_model_index(conn, Product, "ix_product_url")
+
+# 迁移7：定时重新抓取的调度表
+@migration(7, "定时重新抓取调度表")
+def add_crawl_schedule(conn):
+    CrawlSchedule.__table__.create(bind=conn, checkfirst=True)
+
+# 迁移8：商品图片本地镜像表
+@migration(8, "商品图片本地镜像表")
+def add_product_image(conn):
+    ProductImage.__table__.create(bind=conn, checkfirst=True)
+
+# 迁移9：抓取任务队列表
+@migration(9, "抓取任务队列表")
+def add_scrape_job(conn):
+    ScrapeJob.__table__.create(bind=conn, checkfirst=True)
+
+# 迁移10：补齐版本号记录（迁移3之后新增的 product_image 等表），写入时不再插入缺少的记录
+@migration(10, "补齐数据表版本号记录")
+def seed_missing_table_versions(conn):
+    seed_table_versions(conn)
+
+# 迁移11：按分类/平台筛选并按销量排序的复合索引，避免按销量排序时扫描分类或平台下的全部商品再排序
+@migration(11, "商品按分类/平台筛选并按销量排序的复合索引")
+def add_sales_filter_indexes(conn):
+    create_model_index(conn, Product, "ix_product_category_sales")
+    create_model_index(conn, Product, "ix_product_platform_sales")
+
+# 获取已应用的迁移版本
+def get_applied_versions(bind=None):
+    bind = bind or engine
+    SchemaMigration.__table__.create(bind=bind, checkfirst=True)
+    with bind.connect() as conn:
+        return set(conn.execute(select(SchemaMigration.version)).scalars())
+
+# 执行所有未应用的迁移，target 指定时只升级到该版本
+def upgrade(bind=None, target=None):
+    bind = bind or engine
+    applied = get_applied_versions(bind)
+
+    count = 0
+    for version, description, func in sorted(MIGRATIONS, key=lambda item: item[0]):
+        if version in applied:
+            continue
+        if target is not None and version > target:
+            break
+
+        with bind.begin() as conn:
+            func(conn)
+            conn.execute(SchemaMigration.__table__.insert().values(
+                version=version,
+                description=description
+            ))
+        print(f"已应用迁移 {version}: {description}")
+        count += 1
+
+    if count == 0:
+        print("数据库结构已是最新版本")
+    return count
+
+if __name__ == "__main__":
+    import sys
+    upgrade(target=int(sys.argv[1]) if len(sys.argv) > 1 else None)
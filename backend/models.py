@@ -1,21 +1,68 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey, Boolean, create_engine
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey, Boolean, Index, JSON, create_engine
+from sqlalchemy import event, select, update
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import Session, sessionmaker, relationship, validates
 from sqlalchemy.sql import func
-from config import DATABASE_URL
+from sqlalchemy.exc import DisconnectionError
+from config import (
+    DATABASE_URL, DATABASE_REPLICA_URLS, REPLICA_MAX_LAG_SECONDS, REPLICA_LAG_CHECK_SECONDS,
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PING_IDLE_SECONDS,
+    DB_BACKGROUND_POOL_SIZE
+)
+from metrics import TimedQueuePool, instrument_engine, registry
+from collections import deque
+import threading
+import time
 import datetime
+import orjson
 
-# 创建数据库引擎，添加连接池配置
-engine = create_engine(
-    DATABASE_URL,
-    pool_size=10,  # 连接池大小
-    max_overflow=20,  # 超过连接池大小外最多创建的连接
-    pool_timeout=30,  # 池中没有连接最多等待的秒数
-    pool_recycle=1800,  # 连接重置周期，默认-1，推荐设置为小于数据库超时时间
-    pool_pre_ping=True,  # 每次连接前检测连接是否有效
-    echo=False  # 是否打印SQL语句，生产环境设为False
-)
+# 创建数据库引擎，连接池参数默认由 config 中的连接池配置档决定
+def create_db_engine(url, database="primary", pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT):
+    db_engine = create_engine(
+        url,
+        poolclass=TimedQueuePool,  # 记录获取连接的等待时间
+        pool_size=pool_size,  # 连接池大小
+        max_overflow=max_overflow,  # 超过连接池大小外最多创建的连接
+        pool_timeout=pool_timeout,  # 池中没有连接最多等待的秒数
+        pool_recycle=DB_POOL_RECYCLE,  # 连接重置周期，默认-1，推荐设置为小于数据库超时时间
+        echo=False,  # 是否打印SQL语句，生产环境设为False
+        json_serializer=lambda obj: orjson.dumps(obj).decode(),  # JSON列使用orjson编解码
+        json_deserializer=orjson.loads
+    )
+    ping_idle_connections(db_engine, DB_POOL_PING_IDLE_SECONDS)
+    # 记录SQL执行耗时和慢查询
+    instrument_engine(db_engine, database)
+    return db_engine
+
+# 连接存活检测：只在连接空闲超过 idle_seconds 后借出时检测一次，代替每次借出都多一次往返的 pool_pre_ping
+# 频繁使用的连接不检测；数据库主动断开的连接由 pool_recycle 提前重建，执行时才发现断线的由 SQLAlchemy 作废整个连接池
+def ping_idle_connections(db_engine, idle_seconds):
+    @event.listens_for(db_engine, "checkin")
+    def _record_checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(db_engine, "checkout")
+    def _ping_idle(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < idle_seconds:
+            return
+        try:
+            db_engine.dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            # 连接池收到 DisconnectionError 后丢弃该连接并重新获取
+            raise DisconnectionError(f"连接已断开: {e}")
+
+engine = create_db_engine(DATABASE_URL)
+# 只读副本，名称用于监控指标
+replica_engines = {
+    f"replica{index}": create_db_engine(url, f"replica{index}")
+    for index, url in enumerate(DATABASE_REPLICA_URLS, 1)
+}
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# API进程内的后台线程（通知轮询、图片镜像）使用的主库连接池，与接口请求分开，
+# 后台线程借出连接不会让接口连接池满载而触发503；引擎创建时不建立连接，未使用时不占数据库连接
+background_engine = create_db_engine(DATABASE_URL, "background", pool_size=DB_BACKGROUND_POOL_SIZE, max_overflow=0, pool_timeout=30)
+BackgroundSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=background_engine)
 Base = declarative_base()
 
 # 获取数据库会话
@@ -26,6 +73,14 @@ def get_db():
     finally:
         db.close()
 
+# 获取只读接口的数据库会话：配置了只读副本时查询发往延迟正常的副本，见 RoutingSession
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
 # 用户表
 class SysUser(Base):
     __tablename__ = "sys_user"
@@ -38,6 +93,7 @@ class SysUser(Base):
     is_active = Column(Boolean, default=True)
     is_admin = Column(Boolean, default=False)
     last_login = Column(DateTime, default=None, nullable=True)
+    unread_notification_count = Column(Integer, nullable=False, default=0, server_default="0")  # 未读通知数，随通知增删改维护
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
@@ -81,7 +137,7 @@ class Product(Base):
     sales_count = Column(Integer, default=0)  # 销量
     image_url = Column(String(512), nullable=True)  # 商品图片URL
     description = Column(Text, nullable=True)  # 商品描述
-    specifications = Column(Text, nullable=True)  # 商品规格参数，JSON格式
+    specifications = Column(JSON(none_as_null=True), nullable=True)  # 商品规格参数，原生JSON列
     
     # 外键关联
     category_id = Column(Integer, ForeignKey("product_category.id"))
@@ -90,10 +146,54 @@ class Product(Base):
     # 关系
     category = relationship("ProductCategory", back_populates="products")
     platform = relationship("Platform", back_populates="products")
+    # 规格参数的键值索引，用于按规格筛选
+    spec_entries = relationship("ProductSpec", back_populates="product", cascade="all, delete-orphan")
+    # 定时重新抓取的调度记录，创建商品时一并创建（见 new_crawl_schedule）
+    crawl_schedule = relationship("CrawlSchedule", uselist=False, cascade="all, delete-orphan")
     
     # 时间戳
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    
+    # 复合索引，对应商品列表的筛选条件（分类/平台 + 价格区间）和排序字段（更新时间/价格/销量）
+    __table_args__ = (
+        Index("ix_product_updated_at", "updated_at"),
+        Index("ix_product_sales_count", "sales_count"),
+        Index("ix_product_category_updated", "category_id", "updated_at"),
+        Index("ix_product_category_price", "category_id", "price"),
+        Index("ix_product_platform_updated", "platform_id", "updated_at"),
+        Index("ix_product_platform_price", "platform_id", "price"),
+        Index("ix_product_category_sales", "category_id", "sales_count"),
+        Index("ix_product_platform_sales", "platform_id", "sales_count"),
+        Index("ix_product_url", "url"),
+    )
+    
+    # 赋值规格参数时同步重建键值索引；内容未变时（如重新抓取）不重建，不产生写入和版本号变化
+    @validates("specifications")
+    def sync_spec_entries(self, key, specifications):
+        if (specifications or None) == self.specifications:
+            return self.specifications
+        self.spec_entries = [
+            ProductSpec(spec_key=str(spec_key)[:100], spec_value=str(spec_value)[:255])
+            for spec_key, spec_value in (specifications or {}).items()
+        ]
+        return specifications or None
+
+# 商品规格参数表（键值对），冗余存储 Product.specifications 以便建立索引筛选
+class ProductSpec(Base):
+    __tablename__ = "product_spec"
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    product_id = Column(Integer, ForeignKey("product.id", ondelete="CASCADE"), nullable=False)
+    spec_key = Column(String(100), nullable=False)
+    spec_value = Column(String(255), nullable=False)
+    
+    product = relationship("Product", back_populates="spec_entries")
+    
+    __table_args__ = (
+        Index("ix_product_spec_key_value", "spec_key", "spec_value", "product_id"),
+        Index("ix_product_spec_product", "product_id"),
+    )
 
 # 系统通知表
 class Notification(Base):
@@ -105,6 +205,108 @@ class Notification(Base):
     is_read = Column(Boolean, default=False)
     user_id = Column(Integer, ForeignKey("sys_user.id"))
     created_at = Column(DateTime, default=func.now())
+    
+    # 覆盖 "当前用户 + 已读状态 + 按时间倒序" 的查询，以及不筛选已读状态的分页列表
+    __table_args__ = (
+        Index("ix_notification_user_read_created", "user_id", "is_read", "created_at"),
+        Index("ix_notification_user_created", "user_id", "created_at"),
+    )
+
+# 通知归档表，保留期满的已读通知从 notification 表迁移到这里
+class NotificationArchive(Base):
+    __tablename__ = "notification_archive"
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)  # 沿用原通知id
+    title = Column(String(100), nullable=False)
+    content = Column(Text, nullable=False)
+    is_read = Column(Boolean, default=True)
+    user_id = Column(Integer, ForeignKey("sys_user.id"))
+    created_at = Column(DateTime)
+    archived_at = Column(DateTime, default=func.now())
+    
+    __table_args__ = (
+        Index("ix_notification_archive_user_created", "user_id", "created_at"),
+    )
+
+# 价格提醒（用户关注的商品及触发阈值），抓取到新数据时按商品增量检查
+class PriceWatch(Base):
+    __tablename__ = "price_watch"
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("sys_user.id", ondelete="CASCADE"), nullable=False)
+    product_id = Column(Integer, ForeignKey("product.id", ondelete="CASCADE"), nullable=False)
+    price_drop_amount = Column(Float, nullable=True)  # 降价金额阈值
+    price_drop_percent = Column(Float, nullable=True)  # 降价百分比阈值
+    sales_velocity = Column(Float, nullable=True)  # 销量增速阈值（件/天）
+    is_active = Column(Boolean, default=True)
+    last_triggered_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=func.now())
+    
+    product = relationship("Product")
+    
+    __table_args__ = (
+        Index("ix_price_watch_user_product", "user_id", "product_id", unique=True),
+        Index("ix_price_watch_product_active", "product_id", "is_active"),
+    )
+
+# 定时重新抓取的调度状态，每个商品一行，记录下次抓取时间以便重启后继续
+class CrawlSchedule(Base):
+    __tablename__ = "crawl_schedule"
+    
+    product_id = Column(Integer, ForeignKey("product.id", ondelete="CASCADE"), primary_key=True)
+    next_crawl_at = Column(DateTime, nullable=False)
+    last_crawled_at = Column(DateTime, nullable=True)
+    failure_count = Column(Integer, nullable=False, default=0)
+    last_error = Column(String(255), nullable=True)
+    
+    __table_args__ = (
+        Index("ix_crawl_schedule_next", "next_crawl_at"),
+    )
+
+# 新商品的调度记录：立即到期，首次重新抓取后由调度器按销量安排下次抓取时间
+def new_crawl_schedule():
+    return CrawlSchedule(next_crawl_at=datetime.datetime.now(), failure_count=0)
+
+# 商品图片的本地镜像状态，每个商品一行；content_hash 为原图内容的SHA-256，缩略图按哈希存放，相同图片只存一份
+# source_url 与商品当前的 image_url 不一致时说明图片已更换，需要重新下载
+class ProductImage(Base):
+    __tablename__ = "product_image"
+
+    product_id = Column(Integer, ForeignKey("product.id", ondelete="CASCADE"), primary_key=True)
+    source_url = Column(String(512), nullable=False)
+    content_hash = Column(String(64), nullable=True)
+    next_attempt_at = Column(DateTime, nullable=True)  # 为空表示已完成，无需下载
+    failure_count = Column(Integer, nullable=False, default=0)
+    last_error = Column(String(255), nullable=True)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_product_image_next", "next_attempt_at"),
+        Index("ix_product_image_source", "source_url"),
+    )
+
+# 抓取任务队列：API只写入任务，由独立的抓取工作进程认领执行并写回结果
+class ScrapeJob(Base):
+    __tablename__ = "scrape_job"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    url = Column(String(512), nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # pending/running/succeeded/failed
+    user_id = Column(Integer, ForeignKey("sys_user.id", ondelete="SET NULL"), nullable=True)  # 提交任务的用户
+    product_id = Column(Integer, ForeignKey("product.id", ondelete="SET NULL"), nullable=True)  # 抓取成功后写入的商品
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(String(255), nullable=True)
+    worker = Column(String(64), nullable=True)  # 认领任务的工作进程
+    run_after = Column(DateTime, default=func.now())  # 失败重试时推迟到该时间之后
+    lease_expires_at = Column(DateTime, nullable=True)  # 执行中的任务超过该时间未完成视为工作进程已退出，重新认领
+    created_at = Column(DateTime, default=func.now())
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_scrape_job_status_run_after", "status", "run_after"),
+        Index("ix_scrape_job_user_created", "user_id", "created_at"),
+    )
 
 # 验证码记录表
 class CaptchaRecord(Base):
@@ -117,6 +319,160 @@ class CaptchaRecord(Base):
     is_used = Column(Boolean, default=False)
     created_at = Column(DateTime, default=func.now())
 
+# 数据库迁移版本记录表
+class SchemaMigration(Base):
+    __tablename__ = "schema_migration"
+    
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    description = Column(String(255), nullable=False)
+    applied_at = Column(DateTime, default=func.now())
+
+# 数据表版本号表：事务修改某张表时，在提交前于同一事务内将其版本号加一
+# 多个工作进程共享同一份版本号，可用于缓存失效判断和ETag计算
+class TableVersion(Base):
+    __tablename__ = "table_version"
+    
+    table_name = Column(String(64), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+# 维护版本号的表：缓存和ETag依赖的商品、分类、平台相关表，其余表的写入不更新版本号
+# 版本号记录由迁移预先插入，新增表时需同时增加迁移
+VERSIONED_TABLES = ("product", "product_category", "platform", "product_spec", "product_image")
+
+# 标记当前事务修改过的表；批量UPDATE/DELETE等绕过ORM刷新的写操作需要手动调用
+def mark_tables_changed(session, *table_names):
+    session.info.setdefault("changed_tables", set()).update(
+        name for name in table_names if name in VERSIONED_TABLES
+    )
+
+# 读取若干张表的当前版本号，表不存在版本记录时视为0
+def get_table_versions(db, *table_names):
+    rows = db.execute(
+        select(TableVersion.table_name, TableVersion.version).where(TableVersion.table_name.in_(table_names))
+    ).all()
+    versions = dict(rows)
+    return tuple(versions.get(name, 0) for name in table_names)
+
+# 只读副本路由：以 table_version 作为复制进度的标记，定期读取主库和各副本的版本号
+# 副本的版本号追上主库某次快照时，说明副本至少包含该时刻之前提交的数据，延迟不超过距该快照的时间
+class ReplicaRouter:
+    def __init__(self, primary, replicas, max_lag=REPLICA_MAX_LAG_SECONDS, check_interval=REPLICA_LAG_CHECK_SECONDS):
+        self.primary = primary
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lags = {name: float("inf") for name in replicas}  # 尚未检查的副本视为延迟未知
+        self._snapshots = deque()  # (时间, 主库版本号)
+        self._checked_at = None
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def read_versions(self, db_engine):
+        with db_engine.connect() as conn:
+            return dict(conn.execute(select(TableVersion.table_name, TableVersion.version)).all())
+
+    # 检查各副本的延迟；同时只有一个线程检查，其他线程沿用上次的结果
+    def check(self):
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            now = time.monotonic()
+            try:
+                primary_versions = self.read_versions(self.primary)
+            except Exception as e:
+                print(f"读取主库版本号失败: {e}")
+                return
+            self._snapshots.append((now, primary_versions))
+            # 只保留判断延迟需要的快照，更早的快照都已超过延迟上限
+            while len(self._snapshots) > 1 and self._snapshots[1][0] < now - self.max_lag - self.check_interval:
+                self._snapshots.popleft()
+
+            for name, replica in self.replicas.items():
+                try:
+                    replica_versions = self.read_versions(replica)
+                except Exception as e:
+                    print(f"读取只读副本 {name} 版本号失败: {e}")
+                    self.lags[name] = float("inf")
+                    continue
+                self.lags[name] = self.lag_behind(replica_versions, now)
+            self._checked_at = now
+        finally:
+            self._lock.release()
+
+    def lag_behind(self, replica_versions, now):
+        latest = True
+        for snapshot_time, primary_versions in reversed(self._snapshots):
+            if all(replica_versions.get(table, 0) >= version for table, version in primary_versions.items()):
+                return 0.0 if latest else now - snapshot_time
+            latest = False
+        return float("inf")
+
+    # 按轮询顺序选择延迟在上限内的副本，都不满足时使用主库
+    def choose(self):
+        if not self.replicas:
+            return self.primary
+        if self._checked_at is None or time.monotonic() - self._checked_at >= self.check_interval:
+            self.check()
+        names = list(self.replicas)
+        for offset in range(len(names)):
+            name = names[(self._next + offset) % len(names)]
+            if self.lags[name] <= self.max_lag:
+                self._next = (self._next + offset + 1) % len(names)
+                return self.replicas[name]
+        return self.primary
+
+replica_router = ReplicaRouter(engine, replica_engines)
+registry.gauge("db_replica_lag_seconds", "只读副本落后主库的时间", ("database",), callback=lambda: {
+    (name,): lag for name, lag in replica_router.lags.items()
+})
+
+# 读写分离会话：查询发往 ReplicaRouter 选出的副本，整个会话使用同一个副本；
+# 会话中一旦写入（刷新或执行INSERT/UPDATE/DELETE），之后的读写都走主库，保证本次请求能读到自己的写入
+class RoutingSession(Session):
+    def __init__(self, router=replica_router, **kwargs):
+        super().__init__(**kwargs)
+        self.router = router
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or (clause is not None and clause.is_dml):
+            self.info["read_bind"] = self.router.primary
+        if "read_bind" not in self.info:
+            self.info["read_bind"] = self.router.choose()
+        return self.info["read_bind"]
+
+ReadSessionLocal = (
+    sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False) if replica_engines else SessionLocal
+)
+
+# 每次刷新后记录本次写入涉及的表
+@event.listens_for(Session, "after_flush")
+def _collect_changed_tables(session, flush_context):
+    changed = {obj.__table__.name for obj in session.new}
+    changed.update(obj.__table__.name for obj in session.deleted)
+    changed.update(
+        obj.__table__.name for obj in session.dirty
+        if session.is_modified(obj, include_collections=False)
+    )
+    mark_tables_changed(session, *changed)
+
+# 提交前递增涉及表的版本号（按表名排序更新，避免并发事务间死锁）
+@event.listens_for(Session, "before_commit")
+def _bump_table_versions(session):
+    session.flush()
+    changed = session.info.pop("changed_tables", None)
+    if not changed:
+        return
+    
+    table = TableVersion.__table__
+    for table_name in sorted(changed):
+        session.execute(
+            update(table).where(table.c.table_name == table_name).values(version=table.c.version + 1)
+        )
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_tables(session):
+    session.info.pop("changed_tables", None)
+
 # 创建所有表
 def create_tables():
     Base.metadata.create_all(bind=engine)
\ No newline at end of file
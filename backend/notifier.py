@@ -0,0 +1,359 @@
+from sqlalchemy import insert, select, func
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from collections import Counter, defaultdict, deque
+import asyncio
+import threading
+
+from models import Notification, NotificationArchive, SysUser, SessionLocal
+from config import NOTIFICATION_POLL_SECONDS
+
+# 清理任务每批处理的通知数
+PURGE_BATCH_SIZE = 1000
+# 群发通知每批写入的用户数
+FANOUT_BATCH_SIZE = 1000
+
+# 调整用户的未读通知计数（原子自增/自减，与通知写入在同一事务中提交）
+def adjust_unread_count(db: Session, user_id: int, delta: int):
+    if delta == 0:
+        return
+    db.query(SysUser).filter(SysUser.id == user_id).update(
+        {SysUser.unread_notification_count: SysUser.unread_notification_count + delta},
+        synchronize_session=False
+    )
+
+# 创建一条通知并维护未读计数，调用方负责提交
+def add_notification(db: Session, user_id: int, title: str, content: str, is_read: bool = False):
+    notification = Notification(
+        title=title,
+        content=content,
+        is_read=is_read,
+        user_id=user_id
+    )
+    db.add(notification)
+    if not is_read:
+        adjust_unread_count(db, user_id, 1)
+    return notification
+
+# 群发的目标用户，按id分批返回；user_ids 为空时发送给所有启用的用户
+def iter_recipient_batches(db: Session, user_ids=None, batch_size: int = FANOUT_BATCH_SIZE):
+    if user_ids is not None:
+        user_ids = sorted(set(user_ids))
+        for start in range(0, len(user_ids), batch_size):
+            chunk = user_ids[start:start + batch_size]
+            batch = [row[0] for row in db.query(SysUser.id).filter(
+                SysUser.id.in_(chunk),
+                SysUser.is_active == True
+            ).order_by(SysUser.id).all()]
+            if batch:
+                yield batch
+        return
+    
+    last_id = 0
+    while True:
+        batch = [row[0] for row in db.query(SysUser.id).filter(
+            SysUser.id > last_id,
+            SysUser.is_active == True
+        ).order_by(SysUser.id).limit(batch_size).all()]
+        if not batch:
+            break
+        yield batch
+        last_id = batch[-1]
+
+# 批量写入通知（一条多行INSERT）并按用户增加未读计数，调用方负责提交
+def insert_notifications(db: Session, rows):
+    if not rows:
+        return
+    db.execute(insert(Notification.__table__), [
+        {
+            "title": row["title"],
+            "content": row["content"],
+            "is_read": row.get("is_read", False),
+            "user_id": row["user_id"],
+        }
+        for row in rows
+    ])
+    
+    # 按增量分组更新未读计数，同一增量的用户合并为一条UPDATE
+    unread_counts = Counter(row["user_id"] for row in rows if not row.get("is_read", False))
+    users_by_delta = defaultdict(list)
+    for user_id, delta in unread_counts.items():
+        users_by_delta[delta].append(user_id)
+    for delta, user_ids in users_by_delta.items():
+        db.query(SysUser).filter(SysUser.id.in_(user_ids)).update(
+            {SysUser.unread_notification_count: SysUser.unread_notification_count + delta},
+            synchronize_session=False
+        )
+
+# 当前最大的通知id，批量写入前记录，提交后据此找出新通知推送
+def latest_notification_id(db: Session):
+    return db.query(func.max(Notification.id)).scalar() or 0
+
+# 推送给定用户中在线用户的新通知（id大于 after_id），必须在事务提交之后调用
+def publish_notifications_since(db: Session, user_ids, after_id):
+    online_ids = notification_hub.online_users(user_ids)
+    if not online_ids:
+        return
+    for notification in db.query(Notification).filter(
+        Notification.user_id.in_(online_ids),
+        Notification.id > after_id
+    ).order_by(Notification.id).all():
+        publish_notification(notification)
+
+# 群发通知：每批一条多行INSERT写入通知、一条UPDATE增加未读计数并单独提交，返回发送的用户数
+def broadcast_notification(db: Session, title: str, content: str, user_ids=None, batch_size: int = FANOUT_BATCH_SIZE):
+    total = 0
+    for batch in iter_recipient_batches(db, user_ids, batch_size):
+        after_id = latest_notification_id(db)
+        insert_notifications(db, [
+            {"title": title, "content": content, "user_id": user_id}
+            for user_id in batch
+        ])
+        db.commit()
+        total += len(batch)
+        
+        publish_notifications_since(db, batch, after_id)
+    
+    return total
+
+# 将用户的一条未读通知标记为已读（带条件的单条UPDATE），按实际更新的条数扣减未读计数，
+# 并发重复标记时只扣减一次；返回更新的条数（已读或不存在时为0），调用方负责提交
+def mark_read(db: Session, user_id: int, notification_id: int):
+    count = db.query(Notification).filter(
+        Notification.id == notification_id,
+        Notification.user_id == user_id,
+        Notification.is_read == False
+    ).update({Notification.is_read: True}, synchronize_session=False)
+    adjust_unread_count(db, user_id, -count)
+    return count
+
+# 将用户的全部未读通知标记为已读（单条UPDATE），按实际更新的条数扣减未读计数（不直接清零，
+# 避免覆盖并发写入的新通知的计数），返回更新的条数，调用方负责提交
+def mark_all_read(db: Session, user_id: int):
+    count = db.query(Notification).filter(
+        Notification.user_id == user_id,
+        Notification.is_read == False
+    ).update({Notification.is_read: True}, synchronize_session=False)
+    adjust_unread_count(db, user_id, -count)
+    return count
+
+# 按id或时间批量删除用户的通知，同步扣减未读计数，返回删除的条数，调用方负责提交
+def delete_notifications(db: Session, user_id: int, ids=None, older_than_days=None, only_read=False):
+    query = db.query(Notification).filter(Notification.user_id == user_id)
+    if ids:
+        query = query.filter(Notification.id.in_(ids))
+    if older_than_days is not None:
+        query = query.filter(Notification.created_at < datetime.now() - timedelta(days=older_than_days))
+    
+    # 已读和未读分开删除，根据实际删除的未读条数扣减计数
+    unread_deleted = 0
+    if not only_read:
+        unread_deleted = query.filter(Notification.is_read == False).delete(synchronize_session=False)
+        adjust_unread_count(db, user_id, -unread_deleted)
+    read_deleted = query.filter(Notification.is_read == True).delete(synchronize_session=False)
+    
+    return unread_deleted + read_deleted
+
+# 清理超过保留期的已读通知，按批删除（可选先归档），每批单独提交以避免长事务锁表
+def purge_read_notifications(db: Session, older_than_days: int, archive: bool = False, batch_size: int = PURGE_BATCH_SIZE):
+    cutoff = datetime.now() - timedelta(days=older_than_days)
+    columns = ["id", "title", "content", "is_read", "user_id", "created_at"]
+    notification_table = Notification.__table__
+    
+    total = 0
+    while True:
+        ids = [row[0] for row in db.query(Notification.id).filter(
+            Notification.is_read == True,
+            Notification.created_at < cutoff
+        ).order_by(Notification.id).limit(batch_size).all()]
+        if not ids:
+            break
+        
+        if archive:
+            db.execute(insert(NotificationArchive.__table__).from_select(
+                columns,
+                select(*[notification_table.c[name] for name in columns]).where(notification_table.c.id.in_(ids))
+            ))
+        db.query(Notification).filter(Notification.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        total += len(ids)
+    
+    return total
+
+# 通知推送的订阅者：每个事件流连接一个队列，积压过多时标记溢出，由事件流断开让客户端重连补发
+class NotificationSubscriber:
+    def __init__(self, loop, max_pending):
+        self.loop = loop
+        self.queue = asyncio.Queue()
+        self.max_pending = max_pending
+        self.overflowed = False
+
+    def put(self, event):
+        if self.queue.qsize() >= self.max_pending:
+            self.overflowed = True
+            # 放入空事件唤醒等待中的事件流
+            self.queue.put_nowait(None)
+            return
+        self.queue.put_nowait(event)
+
+# 进程内通知发布/订阅，按用户分发；publish 可在任意线程调用
+# 同一条通知可能由写入方和 NotificationPoller 各推送一次，按通知id只推送第一次；
+# 只记录有在线连接的推送，最多保留 max_published 条，不启用轮询时也不会无限增长
+class NotificationHub:
+    def __init__(self, max_pending=100, max_published=10000):
+        self.max_pending = max_pending
+        self.max_published = max_published
+        self._subscribers = defaultdict(set)
+        self._published = set()  # 近期推送过的通知id
+        self._published_order = deque()  # 按推送顺序排列的通知id，超出上限时淘汰最早的
+        self._lock = threading.Lock()
+
+    # 在事件循环中调用，返回订阅者
+    def subscribe(self, user_id):
+        subscriber = NotificationSubscriber(asyncio.get_running_loop(), self.max_pending)
+        with self._lock:
+            self._subscribers[user_id].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, user_id, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    # 推送一条通知，已推送过时返回 False
+    def publish(self, user_id, event):
+        with self._lock:
+            if event["id"] in self._published:
+                return False
+            subscribers = list(self._subscribers.get(user_id, ()))
+            if subscribers:
+                self._published.add(event["id"])
+                self._published_order.append(event["id"])
+                while len(self._published_order) > self.max_published:
+                    self._published.discard(self._published_order.popleft())
+        for subscriber in subscribers:
+            if not subscriber.overflowed:
+                subscriber.loop.call_soon_threadsafe(subscriber.put, event)
+        return True
+
+    # 返回给定用户中有在线连接的用户，不传时返回所有在线用户
+    def online_users(self, user_ids=None):
+        with self._lock:
+            if user_ids is None:
+                return list(self._subscribers)
+            return [user_id for user_id in user_ids if self._subscribers.get(user_id)]
+
+    # 清除 id 不大于 max_id 的推送记录，之后不会再推送这些通知
+    def forget_published(self, max_id):
+        with self._lock:
+            self._published_order = deque(
+                notification_id for notification_id in self._published_order if notification_id > max_id
+            )
+            self._published = set(self._published_order)
+
+    def subscriber_count(self, user_id=None):
+        with self._lock:
+            if user_id is not None:
+                return len(self._subscribers.get(user_id, ()))
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+notification_hub = NotificationHub()
+
+# 通知的推送数据
+def notification_event(notification: Notification):
+    return {
+        "id": notification.id,
+        "title": notification.title,
+        "content": notification.content,
+        "is_read": notification.is_read,
+        "user_id": notification.user_id,
+        "created_at": notification.created_at,
+    }
+
+# 推送通知给在线用户，必须在事务提交之后调用
+def publish_notification(notification: Notification):
+    notification_hub.publish(notification.user_id, notification_event(notification))
+
+# 跨进程推送：抓取工作进程、其他API工作进程写入的通知不经过本进程的 notification_hub，
+# 每个API进程定时查询本进程在线用户的新通知补推；通知id不一定按提交顺序递增，极少数通知可能漏推，
+# 前端另有低频的未读数量轮询兜底，重连时也会按 Last-Event-ID 补发
+class NotificationPoller:
+    def __init__(self, session_factory=SessionLocal, hub=None, interval=NOTIFICATION_POLL_SECONDS, batch_size=FANOUT_BATCH_SIZE):
+        self.session_factory = session_factory
+        self.hub = hub or notification_hub
+        self.interval = interval
+        self.batch_size = batch_size
+        self.last_id = None
+        self._forget_below = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self.run_forever, name="notification-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self, wait=True):
+        self._stop.set()
+        if self._thread is not None and wait:
+            self._thread.join()
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"查询新通知出错: {e}")
+            self._stop.wait(self.interval)
+
+    # 推送上次查询之后写入的、本进程在线用户的通知，返回推送的条数；首次调用只记录当前最大id
+    def poll(self):
+        db = self.session_factory()
+        try:
+            latest_id = latest_notification_id(db)
+            if self.last_id is None:
+                self.last_id = latest_id
+                return 0
+            if latest_id <= self.last_id:
+                return 0
+
+            published = 0
+            online_ids = self.hub.online_users()
+            for start in range(0, len(online_ids), self.batch_size):
+                for notification in db.query(Notification).filter(
+                    Notification.id > self.last_id,
+                    Notification.id <= latest_id,
+                    Notification.user_id.in_(online_ids[start:start + self.batch_size])
+                ).order_by(Notification.id).all():
+                    if self.hub.publish(notification.user_id, notification_event(notification)):
+                        published += 1
+        finally:
+            db.close()
+
+        # 保留上一轮的推送记录，写入方在本轮查询之后才推送的通知仍能去重
+        self.hub.forget_published(self._forget_below)
+        self._forget_below = self.last_id
+        self.last_id = latest_id
+        return published
+
+# 命令行入口，供定时任务调用：python notifier.py 90 --archive
+if __name__ == "__main__":
+    import argparse
+    from models import SessionLocal
+    
+    parser = argparse.ArgumentParser(description="清理超过保留期的已读通知")
+    parser.add_argument("days", type=int, help="保留天数")
+    parser.add_argument("--archive", action="store_true", help="删除前归档到 notification_archive 表")
+    parser.add_argument("--batch-size", type=int, default=PURGE_BATCH_SIZE)
+    args = parser.parse_args()
+    
+    db = SessionLocal()
+    try:
+        count = purge_read_notifications(db, args.days, archive=args.archive, batch_size=args.batch_size)
+        print(f"已清理 {count} 条已读通知")
+    finally:
+        db.close()
@@ -0,0 +1,73 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import os
+import tempfile
+import threading
+
+from config import SCRAPE_PARSE_WORKERS, SCRAPE_PARSE_FILE_THRESHOLD
+
+# 大页面优先写到内存文件系统，避免落盘
+TEMP_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# 获取常驻的解析进程池，首次使用时创建
+def get_parse_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=SCRAPE_PARSE_WORKERS)
+        return _pool
+
+def shutdown_parse_pool(wait=True):
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=wait)
+            _pool = None
+
+# 小页面直接随任务传递，大页面写入临时文件只传路径
+def pack_html(html):
+    if len(html) < SCRAPE_PARSE_FILE_THRESHOLD:
+        return ("text", html)
+    fd, path = tempfile.mkstemp(suffix=".html", dir=TEMP_DIR)
+    with os.fdopen(fd, "wb") as f:
+        f.write(html.encode("utf-8"))
+    return ("file", path)
+
+def unpack_html(payload):
+    kind, value = payload
+    if kind == "text":
+        return value
+    try:
+        with open(value, "rb") as f:
+            return f.read().decode("utf-8")
+    finally:
+        os.remove(value)
+
+# 在解析进程中执行：按类名创建爬虫实例并调用解析方法
+def run_parser(scraper_class_name, method_name, payload, args):
+    import scraper
+    instance = getattr(scraper, scraper_class_name)()
+    return getattr(instance, method_name)(unpack_html(payload), *args)
+
+# 把解析交给进程池，阻塞等待结果；进程池不可用时在当前进程解析
+def parse_in_pool(scraper_instance, method_name, html, *args):
+    if SCRAPE_PARSE_WORKERS <= 0:
+        return getattr(scraper_instance, method_name)(html, *args)
+
+    payload = pack_html(html)
+    try:
+        future = get_parse_pool().submit(
+            run_parser, type(scraper_instance).__name__, method_name, payload, args
+        )
+        return future.result()
+    except BrokenProcessPool as e:
+        print(f"解析进程池异常，改为在当前进程解析: {e}")
+        shutdown_parse_pool(wait=False)
+        return getattr(scraper_instance, method_name)(html, *args)
+    finally:
+        # 解析进程读取后会删除临时文件，异常时在这里兜底清理
+        if payload[0] == "file" and os.path.exists(payload[1]):
+            os.remove(payload[1])
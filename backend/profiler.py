@@ -0,0 +1,152 @@
+from collections import Counter
+import asyncio
+import os
+import sys
+import threading
+import time
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from auth import get_token_user
+from config import PROFILING_INTERVAL_MS
+from models import SessionLocal
+
+# 单个请求性能分析的请求头，值为 1 时返回该请求的调用栈采样结果而不是原响应
+PROFILE_HEADER = "X-Profile"
+# 线程阻塞等待时的栈顶函数，默认不计入采样
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+# 同一时间只允许一个性能分析，避免多个采样线程互相干扰
+_session_lock = threading.Lock()
+
+class ProfilerBusy(Exception):
+    pass
+
+def frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+# 调用栈采样器：后台线程定时读取所有线程的当前调用栈，按折叠格式（栈帧以 ; 分隔）统计出现次数
+# 输出可直接用 flamegraph.pl、speedscope 等工具生成火焰图；未启动时没有任何开销
+class StackSampler:
+    def __init__(self, interval=PROFILING_INTERVAL_MS / 1000, include_idle=False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.counts = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if not _session_lock.acquire(blocking=False):
+            raise ProfilerBusy()
+        self._thread = threading.Thread(target=self.run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        _session_lock.release()
+        return self
+
+    def run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if not self.include_idle and (
+                    os.path.basename(frame.f_code.co_filename), frame.f_code.co_name
+                ) in IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_name(frame))
+                    frame = frame.f_back
+                stack.append(f"thread:{thread_names.get(thread_id, thread_id)}")
+                self.counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    # 折叠格式：每行一个调用栈和采样次数
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+# 对当前工作进程采样指定秒数
+async def sample_for(seconds, include_idle=False):
+    sampler = StackSampler(include_idle=include_idle).start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        sampler.stop()
+    return sampler
+
+# 校验令牌对应的用户是否为管理员，只接受完整的访问令牌，事件流令牌等限定用途的令牌不能触发性能分析
+def is_admin_token(token):
+    db = SessionLocal()
+    try:
+        user = get_token_user(token, db)
+        return bool(user.is_active and user.is_admin)
+    except HTTPException:
+        return False
+    finally:
+        db.close()
+
+# 单个请求性能分析中间件：管理员请求带 X-Profile: 1 时，采样该请求执行期间的调用栈并代替原响应返回
+# 采样覆盖进程内所有线程，同时处理的其他请求也会出现在结果中
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        if headers.get(PROFILE_HEADER) != "1":
+            await self.app(scope, receive, send)
+            return
+
+        scheme, _, token = headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not await run_in_threadpool(is_admin_token, token):
+            response = JSONResponse({"detail": "只有管理员可以进行性能分析"}, status_code=403)
+            await response(scope, receive, send)
+            return
+
+        try:
+            sampler = StackSampler().start()
+        except ProfilerBusy:
+            response = JSONResponse({"detail": "已有性能分析正在进行"}, status_code=409)
+            await response(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def discard_response(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+
+        try:
+            await self.app(scope, receive, discard_response)
+        finally:
+            sampler.stop()
+        elapsed = time.perf_counter() - start
+
+        response = PlainTextResponse(sampler.folded(), headers={
+            "X-Profile-Status": str(status_code),
+            "X-Profile-Duration": f"{elapsed * 1000:.1f}ms",
+            "X-Profile-Samples": str(sampler.samples),
+        })
+        await response(scope, receive, send)
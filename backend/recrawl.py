@@ -0,0 +1,237 @@
+from sqlalchemy import select, insert, exists, func, literal
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import math
+import random
+import threading
+import time
+
+from models import SessionLocal, Product, Platform, CrawlSchedule
+from config import (
+    RECRAWL_CONCURRENCY, RECRAWL_TICK_SECONDS, RECRAWL_MIN_INTERVAL_HOURS, RECRAWL_MAX_INTERVAL_HOURS,
+    RECRAWL_JITTER, RECRAWL_RATE_LIMITS, RECRAWL_DEFAULT_RATE_LIMIT
+)
+from scraper import scrape_product_from_url
+from ingest import save_scraped_product
+
+# 认领抓取任务的租约：期间不会被重复调度，进程异常退出后租约到期自动重新调度
+CLAIM_LEASE = timedelta(minutes=30)
+# 补登调度记录时每批登记的商品数
+REGISTER_BATCH_SIZE = 1000
+# 每个空闲抓取槽位取出的候选任务数，用于在候选中按优先级和平台限流挑选
+CANDIDATES_PER_SLOT = 10
+
+# 商品热度：销量取对数
+def popularity(sales_count):
+    return math.log10(1 + max(sales_count or 0, 0))
+
+# 根据销量计算抓取间隔，销量越高间隔越短
+def crawl_interval(sales_count):
+    hours = RECRAWL_MAX_INTERVAL_HOURS / (1 + popularity(sales_count) ** 2)
+    return timedelta(hours=max(hours, RECRAWL_MIN_INTERVAL_HOURS))
+
+# 失败后的重试间隔，按失败次数指数退避
+def retry_interval(failure_count):
+    hours = RECRAWL_MIN_INTERVAL_HOURS * 2 ** max(failure_count - 1, 0)
+    return timedelta(hours=min(hours, RECRAWL_MAX_INTERVAL_HOURS))
+
+# 调度优先级：过期程度（距上次更新的时间 / 应有的抓取间隔）乘以热度权重
+def crawl_priority(sales_count, updated_at, now):
+    interval = crawl_interval(sales_count).total_seconds()
+    staleness = (now - updated_at).total_seconds() / interval if updated_at else 1.0
+    return staleness * (1 + popularity(sales_count))
+
+def with_jitter(delta, jitter=RECRAWL_JITTER):
+    return delta * random.uniform(1 - jitter, 1 + jitter)
+
+# 按平台限流的令牌桶，每个平台每分钟最多 rate 次抓取
+class RateLimiter:
+    def __init__(self, rate_limits=None, default_rate=RECRAWL_DEFAULT_RATE_LIMIT):
+        self.rate_limits = rate_limits if rate_limits is not None else RECRAWL_RATE_LIMITS
+        self.default_rate = default_rate
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, platform_name):
+        rate = self.rate_limits.get(platform_name, self.default_rate)
+        capacity = max(rate, 1)
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(platform_name, (capacity, now))
+            tokens = min(capacity, tokens + (now - last) * rate / 60)
+            if tokens < 1:
+                self._buckets[platform_name] = (tokens, now)
+                return False
+            self._buckets[platform_name] = (tokens - 1, now)
+            return True
+
+# 定时重新抓取调度器：周期性选出到期的商品，按优先级和平台限流交给固定大小的线程池抓取
+class RecrawlScheduler:
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        scrape=scrape_product_from_url,
+        concurrency=RECRAWL_CONCURRENCY,
+        tick_seconds=RECRAWL_TICK_SECONDS,
+        rate_limiter=None
+    ):
+        self.session_factory = session_factory
+        self.scrape = scrape
+        self.concurrency = concurrency
+        self.tick_seconds = tick_seconds
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="recrawl")
+        self._stop = threading.Event()
+        self._thread = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._backfilled = False
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self.run_forever, name="recrawl-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, wait=True):
+        self._stop.set()
+        if self._thread is not None and wait:
+            self._thread.join()
+        self._executor.shutdown(wait=wait)
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"定时抓取调度出错: {e}")
+            self._stop.wait(with_jitter(self.tick_seconds))
+
+    # 为还没有调度记录的商品登记一批，按上次更新时间作为首次抓取时间，返回登记的行数
+    # 商品创建时已一并创建调度记录（见 new_crawl_schedule），这里只补登此前创建或绕过ORM导入的商品，
+    # 每个进程启动后的第一次调度执行一次，不在每次调度时全表反连接
+    def register_new_products(self, db):
+        now = datetime.now()
+        missing = select(
+            Product.id,
+            func.coalesce(Product.updated_at, literal(now)),
+            literal(0)
+        ).where(
+            ~exists().where(CrawlSchedule.product_id == Product.id)
+        ).limit(REGISTER_BATCH_SIZE)
+        result = db.execute(insert(CrawlSchedule).from_select(
+            ["product_id", "next_crawl_at", "failure_count"], missing
+        ))
+        db.commit()
+        return result.rowcount
+
+    # 执行一次调度，返回提交的抓取任务数
+    def tick(self):
+        with self._lock:
+            free_slots = self.concurrency - self._in_flight
+        db = self.session_factory()
+        try:
+            if not self._backfilled:
+                while self.register_new_products(db) >= REGISTER_BATCH_SIZE:
+                    pass
+                self._backfilled = True
+            if free_slots <= 0:
+                return 0
+
+            now = datetime.now()
+            candidates = db.query(
+                CrawlSchedule.product_id,
+                CrawlSchedule.next_crawl_at,
+                Product.url,
+                Product.sales_count,
+                Product.updated_at,
+                Platform.name
+            ).join(
+                Product, Product.id == CrawlSchedule.product_id
+            ).outerjoin(
+                Platform, Product.platform_id == Platform.id
+            ).filter(
+                CrawlSchedule.next_crawl_at <= now
+            ).order_by(CrawlSchedule.next_crawl_at).limit(free_slots * CANDIDATES_PER_SLOT).all()
+
+            candidates.sort(key=lambda row: crawl_priority(row.sales_count, row.updated_at, now), reverse=True)
+
+            submitted = 0
+            for row in candidates:
+                if submitted >= free_slots:
+                    break
+                if not self.rate_limiter.try_acquire(row.name or ""):
+                    continue
+                if not self.claim(db, row.product_id, row.next_crawl_at, now):
+                    continue
+                with self._lock:
+                    self._in_flight += 1
+                self._executor.submit(self.crawl, row.product_id, row.url)
+                submitted += 1
+            return submitted
+        finally:
+            db.close()
+
+    # 认领任务：把下次抓取时间推迟一个租约，多个进程同时调度时只有一个能认领成功
+    def claim(self, db, product_id, next_crawl_at, now):
+        claimed = db.query(CrawlSchedule).filter(
+            CrawlSchedule.product_id == product_id,
+            CrawlSchedule.next_crawl_at == next_crawl_at
+        ).update({CrawlSchedule.next_crawl_at: now + CLAIM_LEASE}, synchronize_session=False)
+        db.commit()
+        return claimed == 1
+
+    def crawl(self, product_id, url):
+        try:
+            try:
+                product_data = self.scrape(url)
+                error = None if product_data else "无法从URL抓取商品信息"
+            except Exception as e:
+                product_data, error = None, str(e)
+
+            db = self.session_factory()
+            try:
+                # 抓取期间商品被删除时不再重新创建
+                if db.query(Product.id).filter(Product.id == product_id).first() is None:
+                    return
+                sales_count = None
+                if product_data:
+                    product_data.url = url
+                    product, _, _ = save_scraped_product(db, product_data)
+                    sales_count = product.sales_count
+                self.reschedule(db, product_id, sales_count, error)
+            except Exception as e:
+                db.rollback()
+                print(f"保存抓取结果时出错: {e}")
+                self.reschedule(db, product_id, None, str(e))
+            finally:
+                db.close()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    # 根据抓取结果安排下次抓取：成功时按销量计算间隔，失败时指数退避
+    def reschedule(self, db, product_id, sales_count, error=None):
+        schedule = db.query(CrawlSchedule).filter(CrawlSchedule.product_id == product_id).first()
+        if schedule is None:
+            return
+        now = datetime.now()
+        if error is None:
+            schedule.failure_count = 0
+            schedule.last_error = None
+            schedule.last_crawled_at = now
+            schedule.next_crawl_at = now + with_jitter(crawl_interval(sales_count))
+        else:
+            schedule.failure_count = (schedule.failure_count or 0) + 1
+            schedule.last_error = error[:255]
+            schedule.next_crawl_at = now + with_jitter(retry_interval(schedule.failure_count))
+        db.commit()
+
+# 单独运行调度器：python recrawl.py
+if __name__ == "__main__":
+    scheduler = RecrawlScheduler()
+    print(f"定时抓取已启动，并发数 {scheduler.concurrency}")
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        scheduler.stop(wait=False)
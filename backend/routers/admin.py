@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+import os
+
+from models import SysUser
+from auth import get_current_active_user
+from config import PROFILING_ENABLED, PROFILING_MAX_SECONDS
+from profiler import sample_for, ProfilerBusy
+
+router = APIRouter(prefix="/admin", tags=["系统管理"])
+
+# 对处理本请求的工作进程采样指定秒数，返回折叠格式的调用栈（可用 flamegraph.pl 或 speedscope 生成火焰图）
+# 多进程部署时只采样接到请求的那个进程（仅管理员可用）
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile_worker(
+    seconds: float = Query(10, gt=0, le=PROFILING_MAX_SECONDS),
+    include_idle: bool = Query(False, description="是否包含阻塞等待中的线程"),
+    current_user: SysUser = Depends(get_current_active_user)
+):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="只有管理员可以进行性能分析")
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="性能分析未启用")
+
+    try:
+        sampler = await sample_for(seconds, include_idle=include_idle)
+    except ProfilerBusy:
+        raise HTTPException(status_code=409, detail="已有性能分析正在进行")
+
+    return PlainTextResponse(sampler.folded(), headers={
+        "X-Profile-Pid": str(os.getpid()),
+        "X-Profile-Samples": str(sampler.samples),
+    })
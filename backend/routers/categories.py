@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
 
-from models import get_db, ProductCategory, SysUser
+from models import get_db, get_read_db, get_table_versions, ProductCategory, SysUser
 from auth import get_current_active_user
+from etag import compute_etag, etag_headers, not_modified
+from cache import response_cache
 
 router = APIRouter(prefix="/categories", tags=["商品分类"])
 
@@ -30,17 +32,39 @@ class CategoryResponse(CategoryBase):
 # 获取所有分类
 @router.get("", response_model=List[CategoryResponse])
 async def get_categories(
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
     current_user: SysUser = Depends(get_current_active_user)
 ):
-    categories = db.query(ProductCategory).all()
+    # 表未变化时返回304，前端重复进入页面时无需重新传输
+    versions = get_table_versions(db, "product_category")
+    etag = compute_etag("categories", versions)
+    cached_response = not_modified(request, etag)
+    if cached_response is not None:
+        return cached_response
+    
+    def load_categories():
+        return [
+            CategoryResponse(
+                id=category.id,
+                name=category.name,
+                description=category.description,
+                created_at=category.created_at,
+                updated_at=category.updated_at
+            )
+            for category in db.query(ProductCategory).all()
+        ]
+    
+    categories = await response_cache.get_or_compute("categories", (), versions, load_categories, before_wait=db.close)
+    response.headers.update(etag_headers(etag))
     return categories
 
 # 获取单个分类
 @router.get("/{category_id}", response_model=CategoryResponse)
 async def get_category(
     category_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: SysUser = Depends(get_current_active_user)
 ):
     category = db.query(ProductCategory).filter(ProductCategory.id == category_id).first()
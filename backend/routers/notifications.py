@@ -1,15 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import desc, or_, and_
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
+import asyncio
+import orjson
 
 from models import get_db, Notification, SysUser
-from auth import get_current_active_user
+from config import STREAM_TOKEN_EXPIRE_SECONDS
+from auth import get_current_active_user, get_stream_user, create_stream_token
+from notifier import (
+    add_notification, mark_read, mark_all_read, delete_notifications,
+    purge_read_notifications, broadcast_notification, notification_hub, notification_event,
+    publish_notification
+)
 
 router = APIRouter(prefix="/notifications", tags=["通知"])
 
+# 事件流心跳间隔（秒），防止代理因连接空闲而断开
+STREAM_HEARTBEAT_SECONDS = 15
+# 客户端断线后的重连等待时间（毫秒）
+STREAM_RETRY_MILLISECONDS = 3000
+# 断线重连时最多补发的通知数
+STREAM_RESUME_LIMIT = 100
+
 # 通知基础模型
 class NotificationBase(BaseModel):
     title: str
@@ -29,10 +45,39 @@ class NotificationResponse(NotificationBase):
     class Config:
         orm_mode = True
 
-# 获取当前用户的通知
+# 群发通知请求模型：user_ids 为空时发送给所有启用的用户
+class NotificationBroadcast(BaseModel):
+    title: str
+    content: str
+    user_ids: Optional[List[int]] = Field(None, max_length=100000)
+
+# 批量删除请求模型：按id列表或按时间（早于指定天数）删除
+class NotificationBulkDelete(BaseModel):
+    ids: Optional[List[int]] = Field(None, max_length=1000)
+    older_than_days: Optional[int] = Field(None, ge=0)
+    only_read: bool = False
+
+# 已读通知清理请求模型
+class NotificationPurge(BaseModel):
+    older_than_days: int = Field(90, ge=1)
+    archive: bool = False
+
+# 未读数量响应模型
+class UnreadCountResponse(BaseModel):
+    count: int
+
+# 事件流令牌响应模型
+class StreamTokenResponse(BaseModel):
+    token: str
+    expires_in: int
+
+# 获取当前用户的通知（游标分页，下一页游标通过 X-Next-Cursor 响应头返回）
 @router.get("", response_model=List[NotificationResponse])
 async def get_notifications(
+    response: Response,
     is_read: Optional[bool] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[int] = Query(None, description="上一页响应头 X-Next-Cursor 的值"),
     db: Session = Depends(get_db),
     current_user: SysUser = Depends(get_current_active_user)
 ):
@@ -43,11 +88,105 @@ async def get_notifications(
     if is_read is not None:
         query = query.filter(Notification.is_read == is_read)
     
-    # 排序并获取结果
-    notifications = query.order_by(desc(Notification.created_at)).all()
+    # 从游标（上一页最后一条通知的id）继续向后翻页，按 (created_at, id) 比较
+    # 游标行的 created_at 用子查询取出，比较始终在数据库内完成；游标行已被删除时退化为按id比较
+    if cursor is not None:
+        cursor_created_at = db.query(Notification.created_at).filter(
+            Notification.id == cursor,
+            Notification.user_id == current_user.id
+        ).scalar_subquery()
+        query = query.filter(or_(
+            Notification.created_at < cursor_created_at,
+            and_(Notification.created_at == cursor_created_at, Notification.id < cursor),
+            and_(cursor_created_at.is_(None), Notification.id < cursor)
+        ))
+    
+    # 多取一条判断是否还有下一页
+    notifications = query.order_by(desc(Notification.created_at), desc(Notification.id)).limit(limit + 1).all()
+    if len(notifications) > limit:
+        notifications = notifications[:limit]
+        response.headers["X-Next-Cursor"] = str(notifications[-1].id)
     
     return notifications
 
+# 获取当前用户的未读通知数量（读取用户表中维护的计数，无需扫描通知表）
+@router.get("/unread-count", response_model=UnreadCountResponse)
+async def get_unread_count(
+    current_user: SysUser = Depends(get_current_active_user)
+):
+    return UnreadCountResponse(count=current_user.unread_notification_count or 0)
+
+# 格式化一条SSE事件，id 使用通知id，断线重连时浏览器通过 Last-Event-ID 带回
+def format_sse(event):
+    data = orjson.dumps(event).decode()
+    return f"id: {event['id']}\nevent: notification\ndata: {data}\n\n"
+
+# 事件流：先补发断线期间的通知，再持续推送新通知，空闲时发送心跳
+async def notification_event_stream(user_id, subscriber, backlog):
+    sent_ids = {event["id"] for event in backlog}
+    try:
+        yield f"retry: {STREAM_RETRY_MILLISECONDS}\n\n"
+        for event in backlog:
+            yield format_sse(event)
+        
+        while True:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if subscriber.overflowed:
+                # 消费过慢，断开连接让客户端重连后从数据库补发
+                break
+            # 订阅先于补发查询，跳过已经补发过的通知（群发与单发并发时推送顺序不一定按id递增）
+            if event["id"] in sent_ids:
+                continue
+            yield format_sse(event)
+    finally:
+        notification_hub.unsubscribe(user_id, subscriber)
+
+# 获取订阅事件流用的短期令牌，放在 /stream 的 token 查询参数中，避免把长期有效的访问令牌写进URL
+@router.post("/stream-token", response_model=StreamTokenResponse)
+async def get_stream_token(
+    current_user: SysUser = Depends(get_current_active_user)
+):
+    return StreamTokenResponse(token=create_stream_token(current_user.username), expires_in=STREAM_TOKEN_EXPIRE_SECONDS)
+
+# 订阅当前用户的实时通知（Server-Sent Events）
+@router.get("/stream")
+async def stream_notifications(
+    last_event_id: Optional[int] = Query(None),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+    db: Session = Depends(get_db),
+    current_user: SysUser = Depends(get_stream_user)
+):
+    user_id = current_user.id
+    if last_event_id is None and last_event_id_header and last_event_id_header.isdigit():
+        last_event_id = int(last_event_id_header)
+    
+    # 先订阅再查询补发，避免两者之间的通知丢失
+    subscriber = notification_hub.subscribe(user_id)
+    backlog = []
+    try:
+        if last_event_id is not None:
+            missed = db.query(Notification).filter(
+                Notification.user_id == user_id,
+                Notification.id > last_event_id
+            ).order_by(Notification.id).limit(STREAM_RESUME_LIMIT).all()
+            backlog = [notification_event(notification) for notification in missed]
+    except Exception:
+        notification_hub.unsubscribe(user_id, subscriber)
+        raise
+    finally:
+        # 事件流是长连接，提前归还数据库连接，不占用连接池
+        db.close()
+    
+    return StreamingResponse(
+        notification_event_stream(user_id, subscriber, backlog),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # 获取单个通知
 @router.get("/{notification_id}", response_model=NotificationResponse)
 async def get_notification(
@@ -83,19 +222,43 @@ async def create_notification(
         raise HTTPException(status_code=404, detail="目标用户不存在")
     
     # 创建通知
-    notification = Notification(
+    notification = add_notification(
+        db,
+        user_id=notification_data.user_id,
         title=notification_data.title,
         content=notification_data.content,
-        is_read=notification_data.is_read,
-        user_id=notification_data.user_id
+        is_read=notification_data.is_read
     )
     
-    db.add(notification)
     db.commit()
     db.refresh(notification)
+    publish_notification(notification)
     
     return notification
 
+# 群发通知（管理员）
+# 按批写入所有目标用户的通知，耗时随用户数增长，声明为普通函数在线程池中执行，不阻塞事件循环
+@router.post("/broadcast", status_code=status.HTTP_201_CREATED)
+def create_broadcast_notification(
+    broadcast_data: NotificationBroadcast,
+    db: Session = Depends(get_db),
+    current_user: SysUser = Depends(get_current_active_user)
+):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="只有管理员可以创建通知")
+    
+    if broadcast_data.user_ids is not None and not broadcast_data.user_ids:
+        raise HTTPException(status_code=400, detail="目标用户列表不能为空")
+    
+    count = broadcast_notification(
+        db,
+        title=broadcast_data.title,
+        content=broadcast_data.content,
+        user_ids=broadcast_data.user_ids
+    )
+    
+    return {"status": "success", "count": count}
+
 # 标记通知为已读
 @router.put("/{notification_id}/read", response_model=NotificationResponse)
 async def mark_notification_as_read(
@@ -103,7 +266,10 @@ async def mark_notification_as_read(
     db: Session = Depends(get_db),
     current_user: SysUser = Depends(get_current_active_user)
 ):
-    # 查询通知
+    # 带条件的UPDATE标记为已读，按实际更新的条数扣减未读计数
+    mark_read(db, current_user.id, notification_id)
+    db.commit()
+    
     notification = db.query(Notification).filter(
         Notification.id == notification_id,
         Notification.user_id == current_user.id
@@ -112,12 +278,6 @@ async def mark_notification_as_read(
     if not notification:
         raise HTTPException(status_code=404, detail="通知不存在")
     
-    # 标记为已读
-    notification.is_read = True
-    
-    db.commit()
-    db.refresh(notification)
-    
     return notification
 
 # 标记所有通知为已读
@@ -126,19 +286,47 @@ async def mark_all_notifications_as_read(
     db: Session = Depends(get_db),
     current_user: SysUser = Depends(get_current_active_user)
 ):
-    # 查询所有未读通知
-    unread_notifications = db.query(Notification).filter(
-        Notification.user_id == current_user.id,
-        Notification.is_read == False
-    ).all()
+    # 单条UPDATE完成标记，不再逐条加载通知
+    count = mark_all_read(db, current_user.id)
+    db.commit()
     
-    # 标记为已读
-    for notification in unread_notifications:
-        notification.is_read = True
+    return {"status": "success", "count": count}
+
+# 批量删除当前用户的通知
+@router.post("/bulk-delete", status_code=status.HTTP_200_OK)
+async def bulk_delete_notifications(
+    delete_data: NotificationBulkDelete,
+    db: Session = Depends(get_db),
+    current_user: SysUser = Depends(get_current_active_user)
+):
+    if not delete_data.ids and delete_data.older_than_days is None:
+        raise HTTPException(status_code=400, detail="请指定要删除的通知id或时间范围")
     
+    count = delete_notifications(
+        db,
+        current_user.id,
+        ids=delete_data.ids,
+        older_than_days=delete_data.older_than_days,
+        only_read=delete_data.only_read
+    )
     db.commit()
     
-    return {"status": "success", "count": len(unread_notifications)}
+    return {"status": "success", "count": count}
+
+# 清理所有用户超过保留期的已读通知（管理员）
+# 分批删除耗时较长，声明为普通函数在线程池中执行，不阻塞事件循环
+@router.post("/purge", status_code=status.HTTP_200_OK)
+def purge_notifications(
+    purge_data: NotificationPurge,
+    db: Session = Depends(get_db),
+    current_user: SysUser = Depends(get_current_active_user)
+):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="只有管理员可以清理通知")
+    
+    count = purge_read_notifications(db, purge_data.older_than_days, archive=purge_data.archive)
+    
+    return {"status": "success", "count": count}
 
 # 删除通知
 @router.delete("/{notification_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -147,17 +335,10 @@ async def delete_notification(
     db: Session = Depends(get_db),
     current_user: SysUser = Depends(get_current_active_user)
 ):
-    # 查询通知
-    notification = db.query(Notification).filter(
-        Notification.id == notification_id,
-        Notification.user_id == current_user.id
-    ).first()
-    
-    if not notification:
+    # 按实际删除的未读条数扣减计数，并发重复删除时只扣减一次
+    count = delete_notifications(db, current_user.id, ids=[notification_id])
+    if count == 0:
         raise HTTPException(status_code=404, detail="通知不存在")
-    
-    # 删除通知
-    db.delete(notification)
     db.commit()
     
-    return {"status": "success"}
\ No newline at end of file
+    return {"status": "success"}
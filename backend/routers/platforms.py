@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
 
-from models import get_db, Platform, SysUser
+from models import get_db, get_read_db, get_table_versions, Platform, SysUser
 from auth import get_current_active_user
+from etag import compute_etag, etag_headers, not_modified
+from cache import response_cache
 
 router = APIRouter(prefix="/platforms", tags=["电商平台"])
 
@@ -32,17 +34,41 @@ class PlatformResponse(PlatformBase):
 # 获取所有平台
 @router.get("", response_model=List[PlatformResponse])
 async def get_platforms(
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
     current_user: SysUser = Depends(get_current_active_user)
 ):
-    platforms = db.query(Platform).all()
+    # 表未变化时返回304，前端重复进入页面时无需重新传输
+    versions = get_table_versions(db, "platform")
+    etag = compute_etag("platforms", versions)
+    cached_response = not_modified(request, etag)
+    if cached_response is not None:
+        return cached_response
+    
+    def load_platforms():
+        return [
+            PlatformResponse(
+                id=platform.id,
+                name=platform.name,
+                website=platform.website,
+                logo_url=platform.logo_url,
+                description=platform.description,
+                created_at=platform.created_at,
+                updated_at=platform.updated_at
+            )
+            for platform in db.query(Platform).all()
+        ]
+    
+    platforms = await response_cache.get_or_compute("platforms", (), versions, load_platforms, before_wait=db.close)
+    response.headers.update(etag_headers(etag))
     return platforms
 
 # 获取单个平台
 @router.get("/{platform_id}", response_model=PlatformResponse)
 async def get_platform(
     platform_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: SysUser = Depends(get_current_active_user)
 ):
     platform = db.query(Platform).filter(Platform.id == platform_id).first()
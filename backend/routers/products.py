@@ -1,14 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Body
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Body, Request, Response
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, or_
+from sqlalchemy import desc, or_, and_, select, func, case
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, Field
-import json
 from datetime import datetime
 
-from models import get_db, Product, ProductCategory, Platform, SysUser
+from models import get_db, get_read_db, get_table_versions, Product, ProductCategory, Platform, ProductSpec, ProductImage, ScrapeJob, SysUser, new_crawl_schedule
 from auth import get_current_active_user
-from scraper import scrape_product_from_url
+from cache import response_cache
+from etag import compute_etag, etag_headers, not_modified
+from scrape_queue import enqueue_scrape_job
+from images import thumbnail_url
+from config import IMAGE_THUMBNAIL_SIZES
 
 router = APIRouter(prefix="/products", tags=["商品"])
 
@@ -38,16 +42,57 @@ class ProductResponse(ProductBase):
     id: int
     category_name: str
     platform_name: str
+    thumbnail_url: Optional[str] = None
     created_at: datetime
     updated_at: datetime
     
     class Config:
         orm_mode = True
 
+# 商品列表项模型：除 id 外字段均可选，配合 fields 参数只返回请求的字段
+class ProductListItem(BaseModel):
+    id: int
+    name: Optional[str] = None
+    url: Optional[str] = None
+    price: Optional[float] = None
+    currency: Optional[str] = None
+    sales_count: Optional[int] = None
+    image_url: Optional[str] = None
+    description: Optional[str] = None
+    specifications: Optional[Dict[str, Any]] = None
+    category_id: Optional[int] = None
+    platform_id: Optional[int] = None
+    category_name: Optional[str] = None
+    platform_name: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
 # 商品列表响应模型
 class ProductListResponse(BaseModel):
     total: int
-    items: List[ProductResponse]
+    items: List[ProductListItem]
+
+# 可选字段与查询列的对应关系，列表接口只查询请求的列
+PRODUCT_FIELD_COLUMNS = {
+    "id": Product.id,
+    "name": Product.name,
+    "url": Product.url,
+    "price": Product.price,
+    "currency": Product.currency,
+    "sales_count": Product.sales_count,
+    "image_url": Product.image_url,
+    "description": Product.description,
+    "specifications": Product.specifications,
+    "category_id": Product.category_id,
+    "platform_id": Product.platform_id,
+    "category_name": ProductCategory.name,
+    "platform_name": Platform.name,
+    # 本地缩略图：查询镜像的内容哈希，响应时转换为缩略图地址
+    "thumbnail_url": ProductImage.content_hash,
+    "created_at": Product.created_at,
+    "updated_at": Product.updated_at,
+}
 
 # 商品筛选参数模型
 class ProductFilterParams(BaseModel):
@@ -57,29 +102,100 @@ class ProductFilterParams(BaseModel):
     min_price: Optional[float] = None
     max_price: Optional[float] = None
 
+# 分面统计项模型（分类/平台）
+class FacetCount(BaseModel):
+    id: int
+    name: str
+    count: int
+
+# 价格区间统计项模型，max 为空表示无上限
+class PriceRangeCount(BaseModel):
+    min: float
+    max: Optional[float] = None
+    count: int
+
+# 分面统计响应模型
+class ProductFacetsResponse(BaseModel):
+    total: int
+    categories: List[FacetCount]
+    platforms: List[FacetCount]
+    price_ranges: List[PriceRangeCount]
+
+# 价格分面的区间边界
+PRICE_RANGE_BOUNDS = [0, 10, 50, 100, 500, 1000]
+
+# 商品响应依赖的表，任意一张表写入后ETag和缓存失效
+PRODUCT_READ_TABLES = ("product", "product_category", "platform", "product_spec", "product_image")
+
+# 关联商品图片镜像，只使用与当前图片地址一致的镜像（图片更换后在重新下载前仍返回原图地址）
+def join_product_image(query):
+    return query.outerjoin(ProductImage, and_(
+        ProductImage.product_id == Product.id,
+        ProductImage.source_url == Product.image_url
+    ))
+
+# 批量获取一次最多查询的商品数
+BATCH_GET_MAX_IDS = 100
+
+# 批量获取商品请求模型，超过数量上限的请求在校验时返回422
+class ProductBatchGetRequest(BaseModel):
+    ids: List[int] = Field(..., max_length=BATCH_GET_MAX_IDS)
+
+# 批量获取商品响应模型，items 按请求的顺序排列，missing 为不存在的商品ID
+class ProductBatchGetResponse(BaseModel):
+    items: List[ProductResponse]
+    missing: List[int]
+
 # 从URL抓取商品请求模型
 class ScrapeProductRequest(BaseModel):
     url: str
 
-# 获取商品列表
-@router.get("", response_model=ProductListResponse)
-async def get_products(
-    skip: int = 0,
-    limit: int = 10,
+# 抓取任务响应模型，status 为 pending/running/succeeded/failed
+class ScrapeJobResponse(BaseModel):
+    id: int
+    url: str
+    status: str
+    attempts: int
+    error: Optional[str] = None
+    product_id: Optional[int] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    
+    class Config:
+        orm_mode = True
+
+# 解析规格筛选参数，格式为 "键:值"，例如 spec=storage:256GB
+def parse_spec_filters(spec: Optional[List[str]]):
+    spec_filters = []
+    for item in spec or []:
+        spec_key, sep, spec_value = item.partition(":")
+        if not sep or not spec_key.strip():
+            raise HTTPException(status_code=400, detail=f"规格筛选格式错误: {item}，应为 键:值")
+        spec_filters.append((spec_key.strip(), spec_value.strip()))
+    return spec_filters
+
+# 解析 fields 参数（逗号分隔），未指定时返回全部字段，id 始终返回
+def parse_product_fields(fields: Optional[str]):
+    if not fields or not fields.strip():
+        return list(PRODUCT_FIELD_COLUMNS)
+    
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in PRODUCT_FIELD_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"未知字段: {', '.join(unknown)}")
+    
+    return ["id"] + [field for field in dict.fromkeys(requested) if field != "id"]
+
+# 对商品查询应用筛选条件，列表接口和分面统计接口共用
+def apply_product_filters(
+    query,
     category_id: Optional[int] = None,
     platform_id: Optional[int] = None,
     name: Optional[str] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
-    sort_field: Optional[str] = None,
-    sort_order: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: SysUser = Depends(get_current_active_user)
+    spec_filters=()
 ):
-    # 构建查询
-    query = db.query(Product)
-    
-    # 应用筛选条件
     if category_id is not None:
         query = query.filter(Product.category_id == category_id)
     
@@ -95,8 +211,79 @@ async def get_products(
     if max_price is not None:
         query = query.filter(Product.price <= max_price)
     
+    # 规格筛选走 product_spec 的 (spec_key, spec_value) 索引
+    for spec_key, spec_value in spec_filters:
+        query = query.filter(Product.id.in_(
+            select(ProductSpec.product_id).where(
+                ProductSpec.spec_key == spec_key,
+                ProductSpec.spec_value == spec_value
+            )
+        ))
+    
+    return query
+
+# 获取商品列表
+# 指定 fields 时每个商品只包含请求的字段，结果（或缓存）直接序列化为 ORJSONResponse 返回，不经过响应模型校验；
+# 响应格式仍按 ProductListResponse 写入接口文档
+@router.get("", responses={200: {"model": ProductListResponse, "description": "商品列表，items 中只包含 fields 指定的字段"}})
+async def get_products(
+    request: Request,
+    skip: int = 0,
+    limit: int = 10,
+    category_id: Optional[int] = None,
+    platform_id: Optional[int] = None,
+    name: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    spec: Optional[List[str]] = Query(None, description="规格筛选，格式为 键:值，可传多个"),
+    fields: Optional[str] = Query(None, description="只返回指定字段，逗号分隔，例如 name,price,sales_count"),
+    sort_field: Optional[str] = None,
+    sort_order: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+    current_user: SysUser = Depends(get_current_active_user)
+):
+    spec_filters = parse_spec_filters(spec)
+    selected_fields = parse_product_fields(fields)
+    
+    # 数据未变化时直接返回304，跳过查询和序列化
+    versions = get_table_versions(db, *PRODUCT_READ_TABLES)
+    params = sorted(request.query_params.multi_items())
+    etag = compute_etag("products", versions, params)
+    cached_response = not_modified(request, etag)
+    if cached_response is not None:
+        return cached_response
+    
+    filters = dict(
+        category_id=category_id,
+        platform_id=platform_id,
+        name=name,
+        min_price=min_price,
+        max_price=max_price,
+        spec_filters=spec_filters
+    )
+    
+    # 相同参数的列表对所有用户相同，按请求参数缓存
+    result = await response_cache.get_or_compute(
+        "products", params, versions,
+        lambda: load_products(db, filters, selected_fields, skip, limit, sort_field, sort_order),
+        before_wait=db.close
+    )
+    return ORJSONResponse(result, headers=etag_headers(etag))
+
+# 查询一页商品列表，只查询和返回请求的字段
+def load_products(db: Session, filters, selected_fields, skip, limit, sort_field, sort_order):
     # 获取总数
-    total = query.count()
+    total = apply_product_filters(db.query(func.count(Product.id)), **filters).scalar()
+    
+    # 只查询请求的列，分类和平台名称通过关联查询一次取出
+    query = db.query(*[PRODUCT_FIELD_COLUMNS[field].label(field) for field in selected_fields]).select_from(Product)
+    if "category_name" in selected_fields:
+        query = query.outerjoin(ProductCategory, Product.category_id == ProductCategory.id)
+    if "platform_name" in selected_fields:
+        query = query.outerjoin(Platform, Product.platform_id == Platform.id)
+    if "thumbnail_url" in selected_fields:
+        query = join_product_image(query)
+    query = apply_product_filters(query, **filters)
     
     # 排序并分页
     if sort_field and sort_order:
@@ -116,42 +303,123 @@ async def get_products(
         # 默认按更新时间降序排序
         query = query.order_by(Product.updated_at.desc())
     
-    items = query.offset(skip).limit(limit).all()
+    rows = query.offset(skip).limit(limit).all()
     
-    # 构建响应
+    # 构建响应，只包含请求的字段
+    # 各列类型已由数据库模型保证，直接用orjson序列化字典，跳过逐行构建和校验Pydantic模型
     result_items = []
-    for item in items:
-        result_items.append(ProductResponse(
-            id=item.id,
-            name=item.name,
-            url=item.url,
-            price=item.price,
-            currency=item.currency,
-            sales_count=item.sales_count,
-            image_url=item.image_url,
-            description=item.description,
-            specifications=json.loads(item.specifications) if item.specifications else {},
-            category_id=item.category_id,
-            platform_id=item.platform_id,
-            category_name=item.category.name if item.category else "",
-            platform_name=item.platform.name if item.platform else "",
-            created_at=item.created_at,
-            updated_at=item.updated_at
-        ))
+    for row in rows:
+        item = dict(zip(selected_fields, row))
+        if "specifications" in item:
+            item["specifications"] = item["specifications"] or {}
+        if "category_name" in item:
+            item["category_name"] = item["category_name"] or ""
+        if "platform_name" in item:
+            item["platform_name"] = item["platform_name"] or ""
+        if "thumbnail_url" in item:
+            item["thumbnail_url"] = thumbnail_url(item["thumbnail_url"])
+        result_items.append(item)
+    
+    return {"total": total, "items": result_items}
+
+# 获取商品列表的分面统计：当前筛选条件下各分类、平台、价格区间的商品数量
+@router.get("/facets", response_model=ProductFacetsResponse)
+async def get_product_facets(
+    category_id: Optional[int] = None,
+    platform_id: Optional[int] = None,
+    name: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    spec: Optional[List[str]] = Query(None, description="规格筛选，格式为 键:值，可传多个"),
+    db: Session = Depends(get_read_db),
+    current_user: SysUser = Depends(get_current_active_user)
+):
+    spec_filters = parse_spec_filters(spec)
+    filters = dict(
+        category_id=category_id,
+        platform_id=platform_id,
+        name=name.strip() if name else None,
+        min_price=min_price,
+        max_price=max_price,
+        spec_filters=tuple(spec_filters)
+    )
     
-    return ProductListResponse(total=total, items=result_items)
+    versions = get_table_versions(db, *PRODUCT_READ_TABLES)
+    return await response_cache.get_or_compute(
+        "product_facets", tuple(sorted(filters.items())), versions, lambda: load_product_facets(db, filters),
+        before_wait=db.close
+    )
+
+# 统计各分面的商品数量
+def load_product_facets(db: Session, filters):
+    total = apply_product_filters(db.query(func.count(Product.id)), **filters).scalar()
+    
+    # 每个分面统计时忽略自身的筛选条件，数量表示切换到该取值后的结果数
+    category_rows = apply_product_filters(
+        db.query(Product.category_id, ProductCategory.name, func.count(Product.id))
+        .join(ProductCategory, Product.category_id == ProductCategory.id),
+        **{**filters, "category_id": None}
+    ).group_by(Product.category_id, ProductCategory.name).all()
+    
+    platform_rows = apply_product_filters(
+        db.query(Product.platform_id, Platform.name, func.count(Product.id))
+        .join(Platform, Product.platform_id == Platform.id),
+        **{**filters, "platform_id": None}
+    ).group_by(Product.platform_id, Platform.name).all()
+    
+    # 价格区间用 CASE 表达式分桶，一次分组查询得到所有区间的数量
+    bucket = case(
+        *[(Product.price < upper, index) for index, upper in enumerate(PRICE_RANGE_BOUNDS[1:])],
+        else_=len(PRICE_RANGE_BOUNDS) - 1
+    )
+    bucket_counts = dict(apply_product_filters(
+        db.query(bucket, func.count(Product.id)),
+        **{**filters, "min_price": None, "max_price": None}
+    ).group_by(bucket).all())
+    
+    result = ProductFacetsResponse(
+        total=total,
+        categories=[
+            FacetCount(id=row[0], name=row[1], count=row[2])
+            for row in sorted(category_rows, key=lambda row: -row[2])
+        ],
+        platforms=[
+            FacetCount(id=row[0], name=row[1], count=row[2])
+            for row in sorted(platform_rows, key=lambda row: -row[2])
+        ],
+        price_ranges=[
+            PriceRangeCount(
+                min=lower,
+                max=PRICE_RANGE_BOUNDS[index + 1] if index + 1 < len(PRICE_RANGE_BOUNDS) else None,
+                count=bucket_counts.get(index, 0)
+            )
+            for index, lower in enumerate(PRICE_RANGE_BOUNDS)
+        ]
+    )
+    return result
 
 # 获取单个商品
 @router.get("/{product_id}", response_model=ProductResponse)
 async def get_product(
     product_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
     current_user: SysUser = Depends(get_current_active_user)
 ):
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
+    etag = compute_etag("product", get_table_versions(db, *PRODUCT_READ_TABLES), product_id)
+    cached_response = not_modified(request, etag)
+    if cached_response is not None:
+        return cached_response
+    
+    row = join_product_image(
+        db.query(Product, ProductImage.content_hash).filter(Product.id == product_id)
+    ).first()
+    if not row:
         raise HTTPException(status_code=404, detail="商品不存在")
+    product, image_hash = row
     
+    response.headers.update(etag_headers(etag))
     return ProductResponse(
         id=product.id,
         name=product.name,
@@ -161,15 +429,59 @@ async def get_product(
         sales_count=product.sales_count,
         image_url=product.image_url,
         description=product.description,
-        specifications=json.loads(product.specifications) if product.specifications else {},
+        specifications=product.specifications or {},
         category_id=product.category_id,
         platform_id=product.platform_id,
         category_name=product.category.name if product.category else "",
         platform_name=product.platform.name if product.platform else "",
+        thumbnail_url=thumbnail_url(image_hash, max(IMAGE_THUMBNAIL_SIZES)),
         created_at=product.created_at,
         updated_at=product.updated_at
     )
 
+# 按ID批量获取商品详情：一次查询取出商品及分类、平台名称，按请求的顺序返回，重复的ID只返回一次
+@router.post("/batch-get", response_model=ProductBatchGetResponse)
+async def batch_get_products(
+    batch_data: ProductBatchGetRequest,
+    db: Session = Depends(get_read_db),
+    current_user: SysUser = Depends(get_current_active_user)
+):
+    ids = list(dict.fromkeys(batch_data.ids))
+    if not ids:
+        return {"items": [], "missing": []}
+    
+    rows = join_product_image(
+        db.query(Product, ProductCategory.name, Platform.name, ProductImage.content_hash)
+        .outerjoin(ProductCategory, Product.category_id == ProductCategory.id)
+        .outerjoin(Platform, Product.platform_id == Platform.id)
+    ).filter(Product.id.in_(ids)).all()
+    
+    products = {
+        product.id: ProductResponse(
+            id=product.id,
+            name=product.name,
+            url=product.url,
+            price=product.price,
+            currency=product.currency,
+            sales_count=product.sales_count,
+            image_url=product.image_url,
+            description=product.description,
+            specifications=product.specifications or {},
+            category_id=product.category_id,
+            platform_id=product.platform_id,
+            category_name=category_name or "",
+            platform_name=platform_name or "",
+            thumbnail_url=thumbnail_url(image_hash, max(IMAGE_THUMBNAIL_SIZES)),
+            created_at=product.created_at,
+            updated_at=product.updated_at
+        )
+        for product, category_name, platform_name, image_hash in rows
+    }
+    return {
+        "items": [products[product_id] for product_id in ids if product_id in products],
+        "missing": [product_id for product_id in ids if product_id not in products]
+    }
+
 # 创建商品
 @router.post("", response_model=ProductResponse, status_code=status.HTTP_201_CREATED)
 async def create_product(
@@ -196,9 +508,10 @@ async def create_product(
         sales_count=product_data.sales_count,
         image_url=product_data.image_url,
         description=product_data.description,
-        specifications=json.dumps(product_data.specifications) if product_data.specifications else None,
+        specifications=product_data.specifications or None,
         category_id=product_data.category_id,
-        platform_id=product_data.platform_id
+        platform_id=product_data.platform_id,
+        crawl_schedule=new_crawl_schedule()
     )
     
     db.add(product)
@@ -254,9 +567,10 @@ async def create_products_bulk(
             sales_count=product_data.sales_count,
             image_url=product_data.image_url,
             description=product_data.description,
-            specifications=json.dumps(product_data.specifications) if product_data.specifications else None,
+            specifications=product_data.specifications or None,
             category_id=product_data.category_id,
-            platform_id=product_data.platform_id
+            platform_id=product_data.platform_id,
+            crawl_schedule=new_crawl_schedule()
         )
         db.add(product)
         products.append(product)
@@ -278,7 +592,7 @@ async def create_products_bulk(
             sales_count=product.sales_count,
             image_url=product.image_url,
             description=product.description,
-            specifications=json.loads(product.specifications) if product.specifications else {},
+            specifications=product.specifications or {},
             category_id=product.category_id,
             platform_id=product.platform_id,
             category_name=category_map[product.category_id].name,
@@ -289,69 +603,30 @@ async def create_products_bulk(
     
     return result
 
-# 从URL抓取商品
-@router.post("/scrape", response_model=ProductResponse, status_code=status.HTTP_201_CREATED)
+# 提交抓取任务：只写入任务队列，由独立的抓取工作进程（scrape_worker.py）执行，客户端按任务ID查询结果
+@router.post("/scrape", response_model=ScrapeJobResponse, status_code=status.HTTP_202_ACCEPTED)
 async def scrape_product(
     scrape_data: ScrapeProductRequest,
     db: Session = Depends(get_db),
     current_user: SysUser = Depends(get_current_active_user)
 ):
-    # 抓取商品信息
-    product_data = scrape_product_from_url(scrape_data.url)
-    if not product_data:
-        raise HTTPException(status_code=400, detail="无法从URL抓取商品信息")
-    
-    # 查找或创建平台
-    platform = db.query(Platform).filter(Platform.name == product_data.platform_name).first()
-    if not platform:
-        platform = Platform(name=product_data.platform_name, website="")
-        db.add(platform)
-        db.commit()
-        db.refresh(platform)
+    url = scrape_data.url.strip()
+    if not url.startswith(("http://", "https://")):
+        raise HTTPException(status_code=400, detail="请输入有效的商品URL")
     
-    # 查找或创建分类
-    category = db.query(ProductCategory).filter(ProductCategory.name == product_data.category_name).first()
-    if not category:
-        category = ProductCategory(name=product_data.category_name)
-        db.add(category)
-        db.commit()
-        db.refresh(category)
-    
-    # 创建商品
-    product = Product(
-        name=product_data.name,
-        url=product_data.url,
-        price=product_data.price,
-        currency=product_data.currency,
-        sales_count=product_data.sales_count,
-        image_url=product_data.image_url,
-        description=product_data.description,
-        specifications=json.dumps(product_data.specifications) if product_data.specifications else None,
-        category_id=category.id,
-        platform_id=platform.id
-    )
-    
-    db.add(product)
-    db.commit()
-    db.refresh(product)
-    
-    return ProductResponse(
-        id=product.id,
-        name=product.name,
-        url=product.url,
-        price=product.price,
-        currency=product.currency,
-        sales_count=product.sales_count,
-        image_url=product.image_url,
-        description=product.description,
-        specifications=product_data.specifications or {},
-        category_id=product.category_id,
-        platform_id=product.platform_id,
-        category_name=category.name,
-        platform_name=platform.name,
-        created_at=product.created_at,
-        updated_at=product.updated_at
-    )
+    return enqueue_scrape_job(db, url, current_user.id)
+
+# 查询抓取任务状态，成功后 product_id 为写入的商品
+@router.get("/scrape-jobs/{job_id}", response_model=ScrapeJobResponse)
+async def get_scrape_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: SysUser = Depends(get_current_active_user)
+):
+    job = db.query(ScrapeJob).filter(ScrapeJob.id == job_id).first()
+    if not job or (job.user_id != current_user.id and not current_user.is_admin):
+        raise HTTPException(status_code=404, detail="抓取任务不存在")
+    return job
 
 # 更新商品
 @router.put("/{product_id}", response_model=ProductResponse)
@@ -384,7 +659,7 @@ async def update_product(
     product.sales_count = product_data.sales_count
     product.image_url = product_data.image_url
     product.description = product_data.description
-    product.specifications = json.dumps(product_data.specifications) if product_data.specifications else None
+    product.specifications = product_data.specifications or None
     product.category_id = product_data.category_id
     product.platform_id = product_data.platform_id
     
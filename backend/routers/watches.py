@@ -0,0 +1,138 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from pydantic import BaseModel, Field
+from datetime import datetime
+
+from models import get_db, PriceWatch, Product, SysUser
+from auth import get_current_active_user
+
+router = APIRouter(prefix="/watches", tags=["价格提醒"])
+
+# 价格提醒基础模型，阈值至少设置一项
+class PriceWatchBase(BaseModel):
+    price_drop_amount: Optional[float] = Field(None, gt=0)
+    price_drop_percent: Optional[float] = Field(None, gt=0, le=100)
+    sales_velocity: Optional[float] = Field(None, gt=0)
+    is_active: bool = True
+
+# 创建价格提醒请求模型
+class PriceWatchCreate(PriceWatchBase):
+    product_id: int
+
+# 价格提醒响应模型
+class PriceWatchResponse(PriceWatchBase):
+    id: int
+    product_id: int
+    product_name: str
+    last_triggered_at: Optional[datetime] = None
+    created_at: datetime
+
+# 检查阈值
+def validate_thresholds(watch_data: PriceWatchBase):
+    if (watch_data.price_drop_amount is None
+            and watch_data.price_drop_percent is None
+            and watch_data.sales_velocity is None):
+        raise HTTPException(status_code=400, detail="请至少设置一项提醒阈值")
+
+def to_response(watch: PriceWatch, product_name: str):
+    return PriceWatchResponse(
+        id=watch.id,
+        product_id=watch.product_id,
+        product_name=product_name,
+        price_drop_amount=watch.price_drop_amount,
+        price_drop_percent=watch.price_drop_percent,
+        sales_velocity=watch.sales_velocity,
+        is_active=watch.is_active,
+        last_triggered_at=watch.last_triggered_at,
+        created_at=watch.created_at
+    )
+
+# 获取当前用户的价格提醒
+@router.get("", response_model=List[PriceWatchResponse])
+async def get_watches(
+    db: Session = Depends(get_db),
+    current_user: SysUser = Depends(get_current_active_user)
+):
+    rows = db.query(PriceWatch, Product.name).join(
+        Product, PriceWatch.product_id == Product.id
+    ).filter(PriceWatch.user_id == current_user.id).order_by(PriceWatch.id.desc()).all()
+    
+    return [to_response(watch, product_name) for watch, product_name in rows]
+
+# 关注商品，同一商品重复关注时更新阈值
+@router.post("", response_model=PriceWatchResponse, status_code=status.HTTP_201_CREATED)
+async def create_watch(
+    watch_data: PriceWatchCreate,
+    db: Session = Depends(get_db),
+    current_user: SysUser = Depends(get_current_active_user)
+):
+    validate_thresholds(watch_data)
+    
+    product = db.query(Product).filter(Product.id == watch_data.product_id).first()
+    if not product:
+        raise HTTPException(status_code=404, detail="商品不存在")
+    
+    watch = db.query(PriceWatch).filter(
+        PriceWatch.user_id == current_user.id,
+        PriceWatch.product_id == watch_data.product_id
+    ).first()
+    if not watch:
+        watch = PriceWatch(user_id=current_user.id, product_id=watch_data.product_id)
+        db.add(watch)
+    
+    watch.price_drop_amount = watch_data.price_drop_amount
+    watch.price_drop_percent = watch_data.price_drop_percent
+    watch.sales_velocity = watch_data.sales_velocity
+    watch.is_active = watch_data.is_active
+    
+    db.commit()
+    db.refresh(watch)
+    
+    return to_response(watch, product.name)
+
+# 更新价格提醒
+@router.put("/{watch_id}", response_model=PriceWatchResponse)
+async def update_watch(
+    watch_id: int,
+    watch_data: PriceWatchBase,
+    db: Session = Depends(get_db),
+    current_user: SysUser = Depends(get_current_active_user)
+):
+    validate_thresholds(watch_data)
+    
+    watch = db.query(PriceWatch).filter(
+        PriceWatch.id == watch_id,
+        PriceWatch.user_id == current_user.id
+    ).first()
+    if not watch:
+        raise HTTPException(status_code=404, detail="价格提醒不存在")
+    
+    watch.price_drop_amount = watch_data.price_drop_amount
+    watch.price_drop_percent = watch_data.price_drop_percent
+    watch.sales_velocity = watch_data.sales_velocity
+    watch.is_active = watch_data.is_active
+    
+    db.commit()
+    db.refresh(watch)
+    
+    return to_response(watch, watch.product.name)
+
+# 删除价格提醒
+@router.delete("/{watch_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_watch(
+    watch_id: int,
+    db: Session = Depends(get_db),
+    current_user: SysUser = Depends(get_current_active_user)
+):
+    watch = db.query(PriceWatch).filter(
+        PriceWatch.id == watch_id,
+        PriceWatch.user_id == current_user.id
+    ).first()
+    if not watch:
+        raise HTTPException(status_code=404, detail="价格提醒不存在")
+    
+    db.delete(watch)
+    db.commit()
+    
+    return {"status": "success"}
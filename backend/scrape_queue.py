@@ -0,0 +1,104 @@
+from sqlalchemy import or_, and_
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+
+from models import ScrapeJob
+from config import SCRAPE_JOB_MAX_ATTEMPTS, SCRAPE_JOB_LEASE_SECONDS
+
+# 每次认领时取出的候选任务数（相对空闲槽位的倍数），多个工作进程竞争时减少认领失败后的重新查询
+CANDIDATES_PER_SLOT = 3
+
+# 写入抓取任务，同一用户对同一URL已有未完成的任务时直接返回该任务
+# 先查后写不加锁：并发提交同一URL时可能写入两个任务，结果按URL写入同一个商品，重复抓取一次不影响数据，
+# 因此不为此增加唯一约束（MySQL不支持只约束未完成任务的部分唯一索引）
+def enqueue_scrape_job(db: Session, url: str, user_id=None):
+    existing = db.query(ScrapeJob).filter(
+        ScrapeJob.url == url,
+        ScrapeJob.user_id == user_id,
+        ScrapeJob.status.in_(["pending", "running"])
+    ).first()
+    if existing:
+        return existing
+
+    job = ScrapeJob(url=url, user_id=user_id, status="pending", attempts=0, run_after=datetime.now())
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+# 认领最多 limit 个可执行的任务：到期的待执行任务，以及租约已过期（工作进程异常退出）的执行中任务
+# 通过带条件的 UPDATE 认领，多个工作进程同时认领同一任务时只有一个成功
+def claim_scrape_jobs(db: Session, worker: str, limit: int):
+    now = datetime.now()
+    candidates = db.query(ScrapeJob.id, ScrapeJob.status, ScrapeJob.attempts).filter(or_(
+        and_(ScrapeJob.status == "pending", ScrapeJob.run_after <= now),
+        and_(ScrapeJob.status == "running", ScrapeJob.lease_expires_at < now)
+    )).order_by(ScrapeJob.run_after).limit(limit * CANDIDATES_PER_SLOT).all()
+
+    claimed = []
+    for job_id, status, attempts in candidates:
+        if len(claimed) >= limit:
+            break
+        updated = db.query(ScrapeJob).filter(
+            ScrapeJob.id == job_id,
+            ScrapeJob.status == status,
+            ScrapeJob.attempts == attempts
+        ).update({
+            ScrapeJob.status: "running",
+            ScrapeJob.attempts: attempts + 1,
+            ScrapeJob.worker: worker,
+            ScrapeJob.started_at: now,
+            ScrapeJob.lease_expires_at: now + timedelta(seconds=SCRAPE_JOB_LEASE_SECONDS),
+        }, synchronize_session=False)
+        db.commit()
+        if updated == 1:
+            claimed.append(job_id)
+
+    if not claimed:
+        return []
+    return db.query(ScrapeJob).filter(ScrapeJob.id.in_(claimed)).order_by(ScrapeJob.id).all()
+
+# 任务仍由该工作进程持有（执行中、未被其他工作进程在租约过期后重新认领）
+def owns_scrape_job(db: Session, job: ScrapeJob, worker: str):
+    return db.query(ScrapeJob.id).filter(
+        ScrapeJob.id == job.id,
+        ScrapeJob.worker == worker,
+        ScrapeJob.status == "running",
+        ScrapeJob.attempts == job.attempts
+    ).first() is not None
+
+# 结束任务：通过带条件的 UPDATE 写入，只有仍持有任务的工作进程能写入，返回是否写入成功
+def _finish_scrape_job(db: Session, job: ScrapeJob, worker: str, values):
+    updated = db.query(ScrapeJob).filter(
+        ScrapeJob.id == job.id,
+        ScrapeJob.worker == worker,
+        ScrapeJob.status == "running",
+        ScrapeJob.attempts == job.attempts
+    ).update(values, synchronize_session=False)
+    db.commit()
+    return updated == 1
+
+# 任务成功，记录写入的商品
+def complete_scrape_job(db: Session, job: ScrapeJob, worker: str, product_id: int):
+    return _finish_scrape_job(db, job, worker, {
+        ScrapeJob.status: "succeeded",
+        ScrapeJob.product_id: product_id,
+        ScrapeJob.error: None,
+        ScrapeJob.lease_expires_at: None,
+        ScrapeJob.finished_at: datetime.now(),
+    })
+
+# 任务失败：未达到重试上限时按次数退避后重新排队，否则标记为失败
+def fail_scrape_job(db: Session, job: ScrapeJob, worker: str, error: str):
+    now = datetime.now()
+    values = {
+        ScrapeJob.error: (error or "抓取失败")[:255],
+        ScrapeJob.lease_expires_at: None,
+    }
+    if job.attempts < SCRAPE_JOB_MAX_ATTEMPTS:
+        values[ScrapeJob.status] = "pending"
+        values[ScrapeJob.run_after] = now + timedelta(seconds=30 * 2 ** (job.attempts - 1))
+    else:
+        values[ScrapeJob.status] = "failed"
+        values[ScrapeJob.finished_at] = now
+    return _finish_scrape_job(db, job, worker, values)
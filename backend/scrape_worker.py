@@ -0,0 +1,130 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import socket
+import threading
+
+from models import SessionLocal, ScrapeJob
+from config import SCRAPE_WORKER_CONCURRENCY, SCRAPE_WORKER_POLL_SECONDS, RECRAWL_ENABLED
+from scrape_queue import claim_scrape_jobs, owns_scrape_job, complete_scrape_job, fail_scrape_job
+from scraper import scrape_product_from_url, BrowserPool
+from ingest import save_scraped_product
+from parse_pool import shutdown_parse_pool
+
+# 独立的抓取工作进程：轮询 scrape_job 表认领任务，用自己的线程池和浏览器池抓取，结果通过与API相同的入库逻辑写回
+# 与API进程分开部署，抓取（尤其是Chrome）占用的CPU和内存不影响接口响应，可按队列积压单独扩容
+# recrawl 为 True 时（RECRAWL_ENABLED）同时运行定时重新抓取调度器，与队列任务共用浏览器池
+class ScrapeWorker:
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        scrape=scrape_product_from_url,
+        concurrency=SCRAPE_WORKER_CONCURRENCY,
+        poll_seconds=SCRAPE_WORKER_POLL_SECONDS,
+        browser_pool=None,
+        recrawl=RECRAWL_ENABLED
+    ):
+        self.session_factory = session_factory
+        self.scrape = scrape
+        self.concurrency = concurrency
+        self.poll_seconds = poll_seconds
+        self.browser_pool = browser_pool or BrowserPool(size=concurrency)
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="scrape-worker")
+        self._stop = threading.Event()
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self.recrawl_scheduler = None
+        if recrawl:
+            from recrawl import RecrawlScheduler
+            self.recrawl_scheduler = RecrawlScheduler(
+                session_factory=session_factory,
+                scrape=lambda url: self.scrape(url, browser_pool=self.browser_pool)
+            )
+
+    def stop(self):
+        self._stop.set()
+
+    def run_forever(self):
+        if self.recrawl_scheduler is not None:
+            self.recrawl_scheduler.start()
+        try:
+            while not self._stop.is_set():
+                try:
+                    submitted = self.poll()
+                except Exception as e:
+                    print(f"认领抓取任务出错: {e}")
+                    submitted = 0
+                if submitted == 0:
+                    self._stop.wait(self.poll_seconds)
+        finally:
+            if self.recrawl_scheduler is not None:
+                self.recrawl_scheduler.stop(wait=True)
+            self._executor.shutdown(wait=True)
+            self.browser_pool.close()
+            shutdown_parse_pool()
+
+    # 按空闲槽位认领任务并提交执行，返回提交的任务数
+    def poll(self):
+        with self._lock:
+            free_slots = self.concurrency - self._in_flight
+        if free_slots <= 0:
+            return 0
+
+        db = self.session_factory()
+        try:
+            jobs = claim_scrape_jobs(db, self.name, free_slots)
+            for job in jobs:
+                with self._lock:
+                    self._in_flight += 1
+                self._executor.submit(self.run_job, job.id, job.url)
+            return len(jobs)
+        finally:
+            db.close()
+
+    def run_job(self, job_id, url):
+        try:
+            try:
+                product_data = self.scrape(url, browser_pool=self.browser_pool)
+                error = None if product_data else "无法从URL抓取商品信息"
+            except Exception as e:
+                product_data, error = None, str(e)
+
+            db = self.session_factory()
+            try:
+                job = db.query(ScrapeJob).filter(ScrapeJob.id == job_id).first()
+                # 抓取耗时超过租约时任务可能已被其他工作进程重新认领，此时丢弃本次结果
+                if job is None or not owns_scrape_job(db, job, self.name):
+                    print(f"抓取任务 {job_id} 已不属于本工作进程，丢弃抓取结果: {url}")
+                    return
+                if product_data:
+                    product, _, _ = save_scraped_product(db, product_data)
+                    if complete_scrape_job(db, job, self.name, product.id):
+                        print(f"抓取任务 {job_id} 完成: {url}")
+                    else:
+                        print(f"抓取任务 {job_id} 已被重新认领，未记录结果: {url}")
+                elif fail_scrape_job(db, job, self.name, error):
+                    print(f"抓取任务 {job_id} 失败（第 {job.attempts} 次）: {error}")
+            except Exception as e:
+                db.rollback()
+                print(f"保存抓取任务 {job_id} 结果时出错: {e}")
+                job = db.query(ScrapeJob).filter(ScrapeJob.id == job_id).first()
+                if job is not None:
+                    fail_scrape_job(db, job, self.name, str(e))
+            finally:
+                db.close()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+# 启动抓取工作进程：python scrape_worker.py，可在多台机器上启动多个
+if __name__ == "__main__":
+    import signal
+
+    worker = ScrapeWorker()
+    signal.signal(signal.SIGTERM, lambda *args: worker.stop())
+    print(f"抓取工作进程 {worker.name} 已启动，并发数 {worker.concurrency}"
+          + ("，定时重新抓取已启用" if worker.recrawl_scheduler is not None else ""))
+    try:
+        worker.run_forever()
+    except KeyboardInterrupt:
+        worker.stop()
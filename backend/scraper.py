@@ -1,18 +1,17 @@
 import requests
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
+from bs4 import BeautifulSoup, SoupStrainer
 import json
 import re
 import time
 from urllib.parse import urlparse
 from typing import Dict, Any, Optional, List
-from config import USER_AGENT, REQUEST_TIMEOUT, USE_PROXY, PROXY_URL, VERIFY_SSL
+import threading
+from config import (
+    USER_AGENT, REQUEST_TIMEOUT, USE_PROXY, PROXY_URL, VERIFY_SSL, HTML_PARSER,
+    SCRAPE_BROWSER_MAX_USES
+)
+from parse_pool import parse_in_pool
+from metrics import SCRAPE_FETCH_DURATION, SCRAPE_PARSE_DURATION, SCRAPE_FAILURES
 
 # 商品数据模型
 class ProductData:
@@ -27,6 +26,7 @@ class ProductData:
         self.specifications = {}
         self.platform_name = ""
         self.category_name = ""
+        self.description_url = ""  # 需要额外请求的描述页面（如eBay的iframe）
 
 # 基础爬虫类
 class BaseScraper:
@@ -203,6 +203,38 @@ class BaseScraper:
             return "运动户外"
         else:
             return "其他"
+    
+    def timed_fetch(self, url):
+        """获取页面，按平台记录耗时和失败次数"""
+        platform = self.get_platform_name(url)
+        start = time.perf_counter()
+        html = self.fetch_page(url)
+        SCRAPE_FETCH_DURATION.observe(time.perf_counter() - start, platform=platform)
+        if not html:
+            SCRAPE_FAILURES.inc(platform=platform, stage="fetch")
+        return html
+    
+    def timed_parse(self, url, method_name, html, *args):
+        """在进程池中解析页面，按平台记录耗时和失败次数"""
+        platform = self.get_platform_name(url)
+        start = time.perf_counter()
+        try:
+            return parse_in_pool(self, method_name, html, *args)
+        except Exception:
+            SCRAPE_FAILURES.inc(platform=platform, stage="parse")
+            raise
+        finally:
+            SCRAPE_PARSE_DURATION.observe(time.perf_counter() - start, platform=platform)
+    
+    def scrape_product(self, url):
+        """抓取商品信息：在当前线程获取页面（I/O），解析交给进程池（CPU）
+        
+        页面由子类的 parse_product(html, url) 解析，在解析进程池中执行，不能访问网络或浏览器
+        """
+        html = self.timed_fetch(url)
+        if not html:
+            return None
+        return self.timed_parse(url, "parse_product", html, url)
 
 # 请求爬虫类
 class RequestScraper(BaseScraper):
@@ -248,9 +280,16 @@ class SeleniumScraper(BaseScraper):
     def __init__(self):
         super().__init__()
         self.driver = None
+        # 浏览器由浏览器池提供时为 False，出错时不能自行关闭或替换，交给浏览器池处理
+        self.owns_driver = True
     
     def initialize_driver(self):
         """初始化Selenium WebDriver"""
+        # selenium 只在需要浏览器时导入，解析进程和只用 requests 的爬虫不加载
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+        from selenium.webdriver.chrome.options import Options
+        
         try:
             chrome_options = Options()
             chrome_options.add_argument("--headless")  # 无头模式
@@ -292,6 +331,10 @@ class SeleniumScraper(BaseScraper):
         if not self.driver and not self.initialize_driver():
             return None
         
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        
         max_retries = 3
         retry_count = 0
         
@@ -316,20 +359,17 @@ class SeleniumScraper(BaseScraper):
                 if retry_count < max_retries:
                     # 重试前等待时间递增
                     time.sleep(2 * retry_count)
-                    # 刷新驱动
-                    self.close()
-                    if not self.initialize_driver():
-                        return None
+                    # 刷新驱动（浏览器池提供的浏览器直接重试，仍失败时由浏览器池关闭）
+                    if self.owns_driver:
+                        self.close()
+                        if not self.initialize_driver():
+                            return None
                 else:
                     return None
     
-    def scrape_product(self, url):
-        """通用商品信息抓取方法"""
-        html = self.fetch_page(url)
-        if not html:
-            return None
-        
-        soup = BeautifulSoup(html, 'html.parser')
+    def parse_product(self, html, url):
+        """通用商品信息解析方法"""
+        soup = BeautifulSoup(html, HTML_PARSER)
         product = ProductData()
         product.url = url
         product.platform_name = self.get_platform_name(url)
@@ -408,13 +448,9 @@ class AmazonScraper(SeleniumScraper):
     def __init__(self):
         super().__init__()
     
-    def scrape_product(self, url):
-        """抓取亚马逊商品信息"""
-        html = self.fetch_page(url)
-        if not html:
-            return None
-        
-        soup = BeautifulSoup(html, 'html.parser')
+    def parse_product(self, html, url):
+        """解析亚马逊商品信息"""
+        soup = BeautifulSoup(html, HTML_PARSER)
         product = ProductData()
         product.url = url
         product.platform_name = "Amazon"
@@ -475,13 +511,9 @@ class EbayScraper(RequestScraper):
     def __init__(self):
         super().__init__()
     
-    def scrape_product(self, url):
-        """抓取eBay商品信息"""
-        html = self.fetch_page(url)
-        if not html:
-            return None
-        
-        soup = BeautifulSoup(html, 'html.parser')
+    def parse_product(self, html, url):
+        """解析eBay商品信息"""
+        soup = BeautifulSoup(html, HTML_PARSER)
         product = ProductData()
         product.url = url
         product.platform_name = "eBay"
@@ -517,12 +549,8 @@ class EbayScraper(RequestScraper):
         # 提取描述
         desc_elem = soup.select_one("#desc_ifr")
         if desc_elem and 'src' in desc_elem.attrs:
-            # eBay的描述通常在iframe中，需要额外请求
-            desc_url = desc_elem['src']
-            desc_html = self.fetch_page(desc_url)
-            if desc_html:
-                desc_soup = BeautifulSoup(desc_html, 'html.parser')
-                product.description = desc_soup.text.strip()
+            # eBay的描述通常在iframe中，由 scrape_product 额外请求
+            product.description_url = desc_elem['src']
         
         # 提取规格参数
         specs = {}
@@ -536,39 +564,58 @@ class EbayScraper(RequestScraper):
         
         product.specifications = specs
         
-        # 猜测分类
-        product.category_name = self.guess_category(product.name, product.description)
-        
         return product
+    
+    def parse_description(self, html):
+        """解析eBay描述iframe页面"""
+        return BeautifulSoup(html, HTML_PARSER).text.strip()
+    
+    def scrape_product(self, url):
+        """抓取eBay商品信息，描述在iframe中需要再请求一次"""
+        product = super().scrape_product(url)
+        if product and product.description_url:
+            desc_html = self.timed_fetch(product.description_url)
+            if desc_html:
+                product.description = self.timed_parse(url, "parse_description", desc_html)
+        if product:
+            # 描述获取后再猜测分类
+            product.category_name = self.guess_category(product.name, product.description)
+        return product
+
+# window.runParams 中数据对象的键，兼容 data: {...} 和 "data": {...} 两种写法
+RUN_PARAMS_DATA_KEY = re.compile(r'(?<![\w$])["\']?data["\']?\s*:\s*(?={)')
+_json_decoder = json.JSONDecoder()
+
+def extract_run_params(html):
+    """从页面原始HTML中提取 window.runParams 的 data 对象，找不到或无法解码时返回None"""
+    start = html.find("window.runParams")
+    if start == -1:
+        return None
+    
+    match = RUN_PARAMS_DATA_KEY.search(html, start)
+    if not match:
+        return None
+    
+    # raw_decode 从对象起始位置解码，到对象结束即停止，不扫描后续内容
+    try:
+        data, _ = _json_decoder.raw_decode(html, match.end())
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
 
 # AliExpress爬虫
 class AliExpressScraper(SeleniumScraper):
     def __init__(self):
         super().__init__()
     
-    def scrape_product(self, url):
-        """抓取AliExpress商品信息"""
-        html = self.fetch_page(url)
-        if not html:
-            return None
-        
-        soup = BeautifulSoup(html, 'html.parser')
+    def parse_product(self, html, url):
+        """解析AliExpress商品信息"""
         product = ProductData()
         product.url = url
         product.platform_name = "AliExpress"
         
-        # 尝试从页面脚本中提取JSON数据
-        script_data = None
-        for script in soup.select("script"):
-            if script.string and "window.runParams" in script.string:
-                try:
-                    # 提取JSON数据
-                    json_str = re.search(r'data: ({.*})', script.string)
-                    if json_str:
-                        script_data = json.loads(json_str.group(1))
-                        break
-                except:
-                    continue
+        # 直接在原始HTML中定位 window.runParams 的数据对象并解码，不构建DOM
+        script_data = extract_run_params(html)
         
         if script_data and "productInfoComponent" in script_data:
             info = script_data["productInfoComponent"]
@@ -616,7 +663,12 @@ class AliExpressScraper(SeleniumScraper):
                         specs[prop["attrName"]] = prop["attrValue"]
                 product.specifications = specs
         
-        # 如果无法从脚本中提取，尝试从HTML中提取
+        # 如果无法从脚本中提取，才解析完整DOM；否则只解析描述元素
+        if not product.name or not product.image_url:
+            soup = BeautifulSoup(html, HTML_PARSER)
+        else:
+            soup = BeautifulSoup(html, HTML_PARSER, parse_only=SoupStrainer(class_="product-description"))
+        
         if not product.name:
             name_elem = soup.select_one(".product-title")
             if name_elem:
@@ -654,10 +706,80 @@ class ScraperFactory:
             # 对于其他网站，使用通用的Selenium爬虫
             return SeleniumScraper()
 
+# 浏览器池：复用已启动的 WebDriver，避免每次抓取都启动 Chrome；实例使用一定次数后重启以释放内存
+class BrowserPool:
+    def __init__(self, size, max_uses=SCRAPE_BROWSER_MAX_USES):
+        self.size = size
+        self.max_uses = max_uses
+        self._idle = []  # (driver, 已使用次数)
+        self._created = 0
+        self._lock = threading.Condition()
+    
+    def acquire(self):
+        """取出一个空闲浏览器，池满时等待；返回 (driver, 已使用次数)，启动失败时 driver 为 None"""
+        with self._lock:
+            while not self._idle and self._created >= self.size:
+                self._lock.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+        scraper = SeleniumScraper()
+        if not scraper.initialize_driver():
+            self._discard()
+            return None, 0
+        return scraper.driver, 0
+    
+    def release(self, driver, uses, broken=False):
+        """归还浏览器，出错或达到复用次数上限时关闭"""
+        if driver is None or broken or uses >= self.max_uses:
+            try:
+                if driver is not None:
+                    driver.quit()
+            except Exception:
+                pass
+            self._discard()
+            return
+        with self._lock:
+            self._idle.append((driver, uses))
+            self._lock.notify()
+    
+    def _discard(self):
+        with self._lock:
+            self._created -= 1
+            self._lock.notify()
+    
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+        for driver, _ in idle:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
 # 主抓取函数
-def scrape_product_from_url(url):
-    """从URL抓取商品信息"""
+def scrape_product_from_url(url, browser_pool=None):
+    """从URL抓取商品信息，传入浏览器池时复用其中的浏览器，否则每次启动并关闭一个"""
     scraper = ScraperFactory.get_scraper(url)
+    if browser_pool is not None and isinstance(scraper, SeleniumScraper):
+        driver, uses = browser_pool.acquire()
+        if driver is None:
+            return None
+        scraper.driver = driver
+        scraper.owns_driver = False
+        product = None
+        try:
+            product = scraper.scrape_product(url)
+            return product
+        except Exception as e:
+            print(f"抓取商品信息时出错: {e}")
+            return None
+        finally:
+            # 归还当前使用的浏览器；抓取失败或浏览器被替换过时不再复用
+            current, scraper.driver = scraper.driver, None
+            browser_pool.release(current, uses + 1, broken=product is None or current is not driver)
+    
     try:
         if isinstance(scraper, SeleniumScraper):
             product = scraper.scrape_product(url)
@@ -670,4 +792,4 @@ def scrape_product_from_url(url):
         print(f"抓取商品信息时出错: {e}")
         if isinstance(scraper, SeleniumScraper):
             scraper.close()
-        return None
\ No newline at end of file
+        return None
@@ -1,4 +1,6 @@
 @echo off
 echo Starting backend service...
 pip install -r requirements.txt
+rem 抓取工作进程，执行页面提交的抓取任务
+start "scrape-worker" cmd /c "set DB_POOL_PROFILE=worker&& python scrape_worker.py"
 python start.py
\ No newline at end of file
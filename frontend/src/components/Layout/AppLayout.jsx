@@ -19,6 +19,9 @@ import { PageTransition } from '../Animation'
 const { Header, Sider, Content } = Layout
 const { Title, Text } = Typography
 
+// 未读数量兜底轮询间隔（毫秒）
+const UNREAD_POLL_INTERVAL = 60000
+
 const AppLayout = () => {
   const navigate = useNavigate()
   const location = useLocation()
@@ -27,6 +30,9 @@ const AppLayout = () => {
     notifications, 
     unreadCount, 
     fetchNotifications, 
+    fetchUnreadCount, 
+    connectStream, 
+    disconnectStream, 
     markAsRead, 
     markAllAsRead 
   } = useNotificationStore()
@@ -34,17 +40,17 @@ const AppLayout = () => {
   const [collapsed, setCollapsed] = useState(false)
   const [notificationOpen, setNotificationOpen] = useState(false)
   
-  // 获取通知
+  // 获取通知，之后的新通知通过事件流实时推送；另外低频轮询未读数量，兜底事件流漏推或断开的情况
   useEffect(() => {
     fetchNotifications()
+    connectStream()
+    const timer = setInterval(fetchUnreadCount, UNREAD_POLL_INTERVAL)
     
-    // 定时刷新通知
-    const interval = setInterval(() => {
-      fetchNotifications()
-    }, 60000) // 每分钟刷新一次
-    
-    return () => clearInterval(interval)
-  }, [fetchNotifications])
+    return () => {
+      clearInterval(timer)
+      disconnectStream()
+    }
+  }, [fetchNotifications, fetchUnreadCount, connectStream, disconnectStream])
   
   // 处理菜单选中
   const getSelectedKey = () => {
@@ -161,7 +167,10 @@ const AppLayout = () => {
             <Dropdown
               trigger={['click']}
               open={notificationOpen}
-              onOpenChange={setNotificationOpen}
+              onOpenChange={(open) => {
+                setNotificationOpen(open)
+                if (open) fetchNotifications()
+              }}
               dropdownRender={() => (
                 <NotificationList 
                   notifications={notifications}
@@ -272,6 +272,16 @@ const ProductList = () => {
   
   // 表格列定义
   const columns = [
+    {
+      title: '图片',
+      dataIndex: 'thumbnail_url',
+      key: 'thumbnail',
+      width: 72,
+      // 只显示本地缩略图，尚未镜像的商品不加载平台原图
+      render: (text) => text ? (
+        <img src={text} alt="" width={48} height={48} loading="lazy" style={{ objectFit: 'contain' }} />
+      ) : '-',
+    },
     {
       title: '商品名称',
       dataIndex: 'name',
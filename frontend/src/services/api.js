@@ -56,18 +56,27 @@ export const productAPI = {
   // 获取商品列表
   getProducts: (params) => api.get('/products', { params }),
   
+  // 获取商品分面统计（分类、平台、价格区间数量）
+  getProductFacets: (params) => api.get('/products/facets', { params }),
+  
   // 获取单个商品
   getProduct: (id) => api.get(`/products/${id}`),
   
+  // 按ID批量获取商品，按传入的顺序返回（一次最多100个）
+  getProductsByIds: (ids) => api.post('/products/batch-get', { ids }),
+  
   // 创建商品
   createProduct: (data) => api.post('/products', data),
   
   // 批量创建商品
   createProductsBulk: (data) => api.post('/products/bulk', data),
   
-  // 从URL抓取商品
+  // 提交URL抓取任务
   scrapeProduct: (data) => api.post('/products/scrape', data),
   
+  // 查询抓取任务状态
+  getScrapeJob: (id) => api.get(`/products/scrape-jobs/${id}`),
+  
   // 更新商品
   updateProduct: (id, data) => api.put(`/products/${id}`, data),
   
@@ -116,12 +125,18 @@ export const notificationAPI = {
   // 获取通知列表
   getNotifications: (params) => api.get('/notifications', { params }),
   
+  // 获取未读通知数量
+  getUnreadCount: () => api.get('/notifications/unread-count'),
+  
   // 获取单个通知
   getNotification: (id) => api.get(`/notifications/${id}`),
   
   // 创建通知（仅管理员）
   createNotification: (data) => api.post('/notifications', data),
   
+  // 群发通知（仅管理员，不传 user_ids 时发送给所有用户）
+  broadcastNotification: (data) => api.post('/notifications/broadcast', data),
+  
   // 标记通知为已读
   markAsRead: (id) => api.put(`/notifications/${id}/read`),
   
@@ -130,6 +145,29 @@ export const notificationAPI = {
   
   // 删除通知
   deleteNotification: (id) => api.delete(`/notifications/${id}`),
+  
+  // 订阅实时通知：EventSource 无法设置请求头，先换取短期有效的事件流令牌再通过查询参数传递
+  openStream: async (lastEventId) => {
+    const { token } = await api.post('/notifications/stream-token')
+    const params = new URLSearchParams({ token })
+    if (lastEventId) params.set('last_event_id', lastEventId)
+    return new EventSource(`/api/notifications/stream?${params}`)
+  },
+}
+
+// 价格提醒相关API
+export const watchAPI = {
+  // 获取当前用户的价格提醒
+  getWatches: () => api.get('/watches'),
+  
+  // 关注商品（重复关注时更新阈值）
+  createWatch: (data) => api.post('/watches', data),
+  
+  // 更新价格提醒
+  updateWatch: (id, data) => api.put(`/watches/${id}`, data),
+  
+  // 删除价格提醒
+  deleteWatch: (id) => api.delete(`/watches/${id}`),
 }
 
 // 系统相关API
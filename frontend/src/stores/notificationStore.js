@@ -1,25 +1,94 @@
 import { create } from 'zustand'
 import { notificationAPI } from '../services/api'
 
+// 通知下拉列表每次加载的条数
+const PAGE_SIZE = 20
+// 事件流断开且浏览器放弃重连后，重新连接前的等待时间（毫秒）
+const STREAM_RECONNECT_DELAY = 3000
+
 export const useNotificationStore = create((set, get) => ({
   // 状态
   notifications: [],
   unreadCount: 0,
   loading: false,
   error: null,
+  stream: null,
+  connecting: false,
+  reconnectTimer: null,
+  lastEventId: null,
+  
+  // 连接实时通知推送，断线后浏览器会带上 Last-Event-ID 自动重连并补发；
+  // 事件流令牌有效期很短，令牌过期导致重连失败时重新换取令牌连接
+  connectStream: async () => {
+    if (get().stream || get().connecting) return
+    set({ connecting: true })
+    
+    let stream
+    try {
+      stream = await notificationAPI.openStream(get().lastEventId)
+    } catch (error) {
+      set({ connecting: false })
+      return
+    }
+    if (!get().connecting) {
+      // 换取令牌期间已断开
+      stream.close()
+      return
+    }
+    
+    // 连接（或重连）成功后校正一次未读数量
+    stream.onopen = () => {
+      get().fetchUnreadCount()
+    }
+    
+    stream.onerror = () => {
+      if (stream.readyState !== EventSource.CLOSED || get().stream !== stream) return
+      set({
+        stream: null,
+        reconnectTimer: setTimeout(() => {
+          set({ reconnectTimer: null })
+          get().connectStream()
+        }, STREAM_RECONNECT_DELAY),
+      })
+    }
+    
+    stream.addEventListener('notification', (event) => {
+      const notification = JSON.parse(event.data)
+      const { notifications, unreadCount } = get()
+      set({ lastEventId: event.lastEventId })
+      if (notifications.some(item => item.id === notification.id)) return
+      
+      set({
+        notifications: [notification, ...notifications].slice(0, PAGE_SIZE),
+        unreadCount: notification.is_read ? unreadCount : unreadCount + 1,
+      })
+    })
+    
+    set({ stream, connecting: false })
+  },
   
-  // 获取通知列表
+  // 断开实时通知推送
+  disconnectStream: () => {
+    const { stream, reconnectTimer } = get()
+    if (stream) {
+      stream.close()
+    }
+    clearTimeout(reconnectTimer)
+    set({ stream: null, connecting: false, reconnectTimer: null })
+  },
+  
+  // 获取通知列表（最近一页）和未读数量
   fetchNotifications: async () => {
     try {
       set({ loading: true, error: null })
-      const response = await notificationAPI.getNotifications()
-      
-      // 计算未读通知数量
-      const unreadCount = response.filter(item => !item.is_read).length
+      const [response, unread] = await Promise.all([
+        notificationAPI.getNotifications({ limit: PAGE_SIZE }),
+        notificationAPI.getUnreadCount(),
+      ])
       
       set({
         notifications: response,
-        unreadCount,
+        unreadCount: unread.count,
         loading: false,
       })
     } catch (error) {
@@ -30,15 +99,28 @@ export const useNotificationStore = create((set, get) => ({
     }
   },
   
+  // 获取未读数量
+  fetchUnreadCount: async () => {
+    try {
+      const unread = await notificationAPI.getUnreadCount()
+      set({ unreadCount: unread.count })
+    } catch (error) {
+      set({ error: error.detail || '获取未读数量失败' })
+    }
+  },
+  
   // 获取未读通知
   fetchUnreadNotifications: async () => {
     try {
       set({ loading: true, error: null })
-      const response = await notificationAPI.getNotifications({ is_read: false })
+      const [response, unread] = await Promise.all([
+        notificationAPI.getNotifications({ is_read: false, limit: PAGE_SIZE }),
+        notificationAPI.getUnreadCount(),
+      ])
       
       set({
         notifications: response,
-        unreadCount: response.length,
+        unreadCount: unread.count,
         loading: false,
       })
     } catch (error) {
@@ -55,17 +137,15 @@ export const useNotificationStore = create((set, get) => ({
       await notificationAPI.markAsRead(id)
       
       // 更新本地状态
-      const { notifications } = get()
+      const { notifications, unreadCount } = get()
+      const target = notifications.find(item => item.id === id)
       const updatedNotifications = notifications.map(item =>
         item.id === id ? { ...item, is_read: true } : item
       )
       
-      // 重新计算未读数量
-      const unreadCount = updatedNotifications.filter(item => !item.is_read).length
-      
       set({
         notifications: updatedNotifications,
-        unreadCount,
+        unreadCount: target && !target.is_read ? Math.max(unreadCount - 1, 0) : unreadCount,
       })
     } catch (error) {
       set({ error: error.detail || '标记通知失败' })
@@ -96,15 +176,13 @@ export const useNotificationStore = create((set, get) => ({
       await notificationAPI.deleteNotification(id)
       
       // 更新本地状态
-      const { notifications } = get()
+      const { notifications, unreadCount } = get()
+      const target = notifications.find(item => item.id === id)
       const updatedNotifications = notifications.filter(item => item.id !== id)
       
-      // 重新计算未读数量
-      const unreadCount = updatedNotifications.filter(item => !item.is_read).length
-      
       set({
         notifications: updatedNotifications,
-        unreadCount,
+        unreadCount: target && !target.is_read ? Math.max(unreadCount - 1, 0) : unreadCount,
       })
     } catch (error) {
       set({ error: error.detail || '删除通知失败' })
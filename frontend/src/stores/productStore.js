@@ -1,6 +1,16 @@
 import { create } from 'zustand'
 import { productAPI, categoryAPI, platformAPI } from '../services/api'
 
+// 抓取任务状态的轮询间隔（毫秒）
+const SCRAPE_POLL_INTERVAL = 1500
+// 任务一直未被认领的最长等待时间（毫秒），超过后认为抓取工作进程未启动
+const SCRAPE_PENDING_TIMEOUT = 30000
+// 轮询的最长时间（毫秒），与后端任务执行超时（SCRAPE_JOB_LEASE_SECONDS）一致
+const SCRAPE_POLL_TIMEOUT = 300000
+
+// 列表页只需要的字段，避免返回描述和规格参数等大字段
+const LIST_FIELDS = 'id,name,url,price,currency,sales_count,thumbnail_url,category_name,platform_name,updated_at'
+
 export const useProductStore = create((set, get) => ({
   // 状态
   products: [],
@@ -35,6 +45,7 @@ export const useProductStore = create((set, get) => ({
       const requestParams = {
         skip: (pagination.current - 1) * pagination.pageSize,
         limit: pagination.pageSize,
+        fields: LIST_FIELDS,
         ...filters,
         ...sorter, // 添加排序参数
         ...params, // 允许覆盖默认参数
@@ -142,12 +153,32 @@ export const useProductStore = create((set, get) => ({
     }
   },
   
-  // 从URL抓取商品
+  // 从URL抓取商品：提交抓取任务后轮询任务状态，成功后获取写入的商品
   scrapeProduct: async (url) => {
     try {
       set({ loading: true, error: null })
       
-      const product = await productAPI.scrapeProduct({ url })
+      let job = await productAPI.scrapeProduct({ url })
+      const startedAt = Date.now()
+      while (job.status === 'pending' || job.status === 'running') {
+        const elapsed = Date.now() - startedAt
+        if (job.status === 'pending' && elapsed >= SCRAPE_PENDING_TIMEOUT) {
+          set({ loading: false, error: '抓取任务仍在排队，抓取工作进程可能未启动' })
+          return null
+        }
+        if (elapsed >= SCRAPE_POLL_TIMEOUT) {
+          set({ loading: false, error: '抓取超时，请稍后在商品列表中查看' })
+          return null
+        }
+        await new Promise((resolve) => setTimeout(resolve, SCRAPE_POLL_INTERVAL))
+        job = await productAPI.getScrapeJob(job.id)
+      }
+      if (job.status !== 'succeeded') {
+        set({ loading: false, error: job.error || '抓取商品失败' })
+        return null
+      }
+      
+      const product = await productAPI.getProduct(job.product_id)
       
       // 更新列表
       await get().fetchProducts()
@@ -0,0 +1,70 @@
+import sys
+import os
+import asyncio
+import tempfile
+
+# 后端模块使用扁平导入（from models import ...），需要把 backend 目录加入路径
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from sqlalchemy import create_engine, text
+
+import admission
+from admission import AdmissionMiddleware
+from config import API_PREFIX, DB_POOL_MAX_WAITING
+from metrics import TimedQueuePool
+
+def make_engine(pool_size=2):
+    return create_engine(
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'admission.db')}",
+        poolclass=TimedQueuePool, pool_size=pool_size, max_overflow=0, pool_timeout=1
+    )
+
+async def endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+def call(path):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": path, "headers": [], "query_string": b""}
+    asyncio.run(AdmissionMiddleware(endpoint)(scope, receive, send))
+    return messages[0]["status"], dict(messages[0].get("headers", []))
+
+def test_saturated_pool_sheds_api_requests(monkeypatch):
+    test_engine = make_engine()
+    monkeypatch.setattr(admission, "engine", test_engine)
+    assert DB_POOL_MAX_WAITING == 0
+    assert call(f"{API_PREFIX}/products")[0] == 200
+
+    # 借出所有连接，模拟正在处理中的请求占满连接池
+    held = [test_engine.connect() for _ in range(2)]
+    for conn in held:
+        conn.execute(text("SELECT 1"))
+    assert test_engine.pool.saturated() and test_engine.pool.waiting == 0
+    status, headers = call(f"{API_PREFIX}/products")
+    assert status == 503 and b"retry-after" in headers
+    # 非接口路径不受影响
+    assert call("/health")[0] == 200
+
+    held.pop().close()
+    assert call(f"{API_PREFIX}/products")[0] == 200
+    for conn in held:
+        conn.close()
+
+def test_background_sessions_do_not_count_against_api_pool():
+    from config import DB_BACKGROUND_POOL_SIZE
+    from models import engine, background_engine, BackgroundSessionLocal
+    # 后台线程（通知轮询、图片镜像）从单独的连接池借出连接，接口连接池的满载判断不受影响
+    assert background_engine.pool is not engine.pool
+    assert background_engine.pool.size() == DB_BACKGROUND_POOL_SIZE and background_engine.pool._max_overflow == 0
+    db = BackgroundSessionLocal()
+    try:
+        assert db.get_bind() is background_engine
+    finally:
+        db.close()
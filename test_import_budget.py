@@ -0,0 +1,43 @@
+import sys
+import os
+import json
+import subprocess
+
+# 后端模块使用扁平导入（from models import ...），在 backend 目录下启动子进程测量冷启动导入
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+
+# API工作进程启动时不应加载的依赖，只在抓取、验证码、图片镜像时按需导入
+LAZY_MODULES = ('selenium', 'webdriver_manager', 'bs4', 'captcha', 'PIL', 'requests')
+# 导入 main 的时间上限（秒），主要耗时在 FastAPI/Pydantic，超出说明引入了新的重量级依赖
+IMPORT_BUDGET_SECONDS = 3.0
+
+def measure_import(module):
+    code = (
+        "import sys, time, json\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = time.perf_counter() - start\n"
+        "print(json.dumps({'elapsed': elapsed, 'modules': sorted(m for m in sys.modules if '.' not in m)}))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def test_api_startup_skips_scraping_stack():
+    result = measure_import('main')
+    loaded = [name for name in LAZY_MODULES if name in result['modules']]
+    print(f"import main: {result['elapsed']:.2f}s")
+    assert not loaded, f'API启动时加载了: {loaded}'
+    assert result['elapsed'] < IMPORT_BUDGET_SECONDS, f"导入耗时 {result['elapsed']:.2f}s 超出预算"
+
+def test_parse_workers_skip_selenium():
+    # 解析进程只导入 scraper 模块做解析，不需要浏览器驱动
+    result = measure_import('scraper')
+    assert 'selenium' not in result['modules']
+    assert 'webdriver_manager' not in result['modules']
+
+if __name__ == '__main__':
+    test_api_startup_skips_scraping_stack()
+    test_parse_workers_skip_selenium()
+    print('导入检查通过')
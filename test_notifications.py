@@ -0,0 +1,351 @@
+import sys
+import os
+import asyncio
+from datetime import datetime, timedelta
+
+# 后端模块使用扁平导入（from models import ...），需要把 backend 目录加入路径
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from fastapi import FastAPI, Depends, HTTPException
+from fastapi.testclient import TestClient
+
+from models import Base, SysUser, Notification, NotificationArchive, get_db
+from migrations import upgrade
+from auth import create_access_token, create_stream_token, get_token_user, STREAM_TOKEN_SCOPE
+from auth import get_current_active_user
+from routers import notifications
+import notifier
+from notifier import (
+    NotificationHub, NotificationPoller, add_notification, broadcast_notification, notification_event, notification_hub
+)
+
+# 使用内存SQLite作为替身数据库，接口测试中依赖项在线程池中执行，允许跨线程使用连接
+def make_session_factory():
+    test_engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=test_engine)
+    upgrade(bind=test_engine)
+    return sessionmaker(bind=test_engine, autoflush=False)
+
+def add_users(db, count):
+    users = [SysUser(username=f"user{i}", password="x", email=f"user{i}@example.com") for i in range(count)]
+    db.add_all(users)
+    db.commit()
+    return [user.id for user in users]
+
+# 只挂载通知路由的应用，数据库和当前用户替换为测试数据
+def make_client(Session, user_id):
+    app = FastAPI()
+    app.include_router(notifications.router)
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def override_current_user(db=Depends(get_db)):
+        return db.query(SysUser).filter(SysUser.id == user_id).one()
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_active_user] = override_current_user
+    return TestClient(app)
+
+def drain(subscriber):
+    events = []
+    while not subscriber.queue.empty():
+        events.append(subscriber.queue.get_nowait())
+    return events
+
+def test_poller_pushes_notifications_written_by_other_processes():
+    Session = make_session_factory()
+    db = Session()
+    online_id, offline_id = add_users(db, 2)
+    hub = NotificationHub()
+    poller = NotificationPoller(session_factory=Session, hub=hub)
+
+    async def run():
+        subscriber = hub.subscribe(online_id)
+        assert poller.poll() == 0
+
+        # 其他进程写入的通知，本进程的 notification_hub 没有推送过
+        add_notification(db, online_id, "降价提醒", "商品A降价")
+        add_notification(db, offline_id, "降价提醒", "商品B降价")
+        db.commit()
+        assert poller.poll() == 1
+
+        # 本进程写入并已推送的通知，轮询时不重复推送
+        notification = add_notification(db, online_id, "系统通知", "维护")
+        db.commit()
+        assert hub.publish(online_id, notification_event(notification))
+        assert poller.poll() == 0
+        await asyncio.sleep(0)
+        return [event["content"] for event in drain(subscriber)]
+
+    assert asyncio.run(run()) == ["商品A降价", "维护"]
+    db.close()
+
+def test_stream_token_only_opens_streams():
+    Session = make_session_factory()
+    db = Session()
+    add_users(db, 1)
+    stream_token = create_stream_token("user0")
+    access_token = create_access_token(data={"sub": "user0"})
+
+    assert get_token_user(stream_token, db, scope=STREAM_TOKEN_SCOPE).username == "user0"
+    assert get_token_user(access_token, db).username == "user0"
+    # 事件流令牌不能用于其他接口，访问令牌也不能放在事件流URL中
+    for token, scope in [(stream_token, None), (access_token, STREAM_TOKEN_SCOPE)]:
+        try:
+            get_token_user(token, db, scope=scope)
+            assert False, "令牌用途不符时应拒绝"
+        except HTTPException as e:
+            assert e.status_code == 401
+    db.close()
+
+def test_mark_read_and_delete_decrement_unread_count_once():
+    Session = make_session_factory()
+    db = Session()
+    user_id, other_id = add_users(db, 2)
+    first = add_notification(db, user_id, "降价提醒", "A")
+    second = add_notification(db, user_id, "降价提醒", "B")
+    others = add_notification(db, other_id, "降价提醒", "C")
+    db.commit()
+    client = make_client(Session, user_id)
+    unread = lambda: client.get("/notifications/unread-count").json()["count"]
+    assert unread() == 2
+
+    # 重复标记只扣减一次
+    assert client.put(f"/notifications/{first.id}/read").json()["is_read"] is True
+    assert client.put(f"/notifications/{first.id}/read").status_code == 200
+    assert unread() == 1
+
+    # 删除已读通知不扣减，删除未读通知扣减一次，重复删除返回404
+    assert client.delete(f"/notifications/{first.id}").status_code == 204
+    assert unread() == 1
+    assert client.delete(f"/notifications/{second.id}").status_code == 204
+    assert client.delete(f"/notifications/{second.id}").status_code == 404
+    assert unread() == 0
+
+    # 其他用户的通知不能标记或删除
+    assert client.put(f"/notifications/{others.id}/read").status_code == 404
+    assert client.delete(f"/notifications/{others.id}").status_code == 404
+    db.expire_all()
+    assert db.query(SysUser.unread_notification_count).filter(SysUser.id == other_id).scalar() == 1
+    db.close()
+
+def test_cursor_pagination_follows_next_cursor_header():
+    Session = make_session_factory()
+    db = Session()
+    user_id, other_id = add_users(db, 2)
+    base = datetime(2024, 1, 1)
+    # 两条通知的创建时间相同，按id区分先后
+    created = [base, base + timedelta(minutes=1), base + timedelta(minutes=1), base + timedelta(minutes=2), base + timedelta(minutes=3)]
+    ids = []
+    for index, created_at in enumerate(created):
+        notification = add_notification(db, user_id, "通知", str(index), is_read=index % 2 == 1)
+        notification.created_at = created_at
+        db.flush()
+        ids.append(notification.id)
+    add_notification(db, other_id, "通知", "其他用户")
+    db.commit()
+    client = make_client(Session, user_id)
+
+    pages, cursor = [], None
+    while True:
+        params = {"limit": 2} if cursor is None else {"limit": 2, "cursor": cursor}
+        response = client.get("/notifications", params=params)
+        pages.append([item["id"] for item in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    # 按 (created_at, id) 倒序，每条只出现一次，最后一页没有下一页游标
+    assert pages == [[ids[4], ids[3]], [ids[2], ids[1]], [ids[0]]]
+
+    # 按已读状态筛选
+    response = client.get("/notifications", params={"is_read": False, "limit": 10})
+    assert [item["id"] for item in response.json()] == [ids[4], ids[2], ids[0]]
+    assert "X-Next-Cursor" not in response.headers
+
+    # 游标对应的通知已被删除时按id继续翻页
+    assert client.delete(f"/notifications/{ids[3]}").status_code == 204
+    response = client.get("/notifications", params={"limit": 10, "cursor": ids[3]})
+    assert [item["id"] for item in response.json()] == [ids[2], ids[1], ids[0]]
+
+    # 未读数量来自用户表的计数，与通知表一致
+    assert client.get("/notifications/unread-count").json()["count"] == 3
+    db.close()
+
+def test_read_all_bulk_delete_and_purge_keep_unread_count():
+    Session = make_session_factory()
+    db = Session()
+    user_id, admin_id = add_users(db, 2)
+    db.query(SysUser).filter(SysUser.id == admin_id).update({SysUser.is_admin: True})
+    old = datetime.now() - timedelta(days=100)
+    notifications = [add_notification(db, user_id, "通知", str(index), is_read=index < 2) for index in range(6)]
+    for notification in notifications[:4]:
+        notification.created_at = old
+    db.commit()
+    ids = [notification.id for notification in notifications]
+    client = make_client(Session, user_id)
+    unread = lambda: client.get("/notifications/unread-count").json()["count"]
+    assert unread() == 4
+
+    # 按id删除一条已读、一条未读，只扣减未读的一条
+    response = client.post("/notifications/bulk-delete", json={"ids": [ids[0], ids[2]]})
+    assert response.json()["count"] == 2
+    assert unread() == 3
+
+    # 只删除早于90天的已读通知，未读的旧通知保留
+    response = client.post("/notifications/bulk-delete", json={"older_than_days": 90, "only_read": True})
+    assert response.json()["count"] == 1
+    assert unread() == 3
+    assert client.post("/notifications/bulk-delete", json={}).status_code == 400
+
+    assert client.put("/notifications/read-all").json()["count"] == 3
+    assert unread() == 0
+
+    # 管理员清理超过保留期的已读通知并归档，其余通知保留
+    assert client.post("/notifications/purge", json={"older_than_days": 90}).status_code == 403
+    admin_client = make_client(Session, admin_id)
+    response = admin_client.post("/notifications/purge", json={"older_than_days": 90, "archive": True})
+    assert response.json()["count"] == 1
+    remaining = [item["id"] for item in client.get("/notifications", params={"limit": 10}).json()]
+    assert remaining == [ids[5], ids[4]]
+    assert [row[0] for row in db.query(NotificationArchive.id).all()] == [ids[3]]
+    db.close()
+
+def test_stream_resumes_from_last_event_id_and_drops_overflowed_subscriber():
+    Session = make_session_factory()
+    db = Session()
+    user_id, = add_users(db, 1)
+    ids = [add_notification(db, user_id, "通知", str(index)) for index in range(3)]
+    db.commit()
+    ids = [notification.id for notification in ids]
+    user = db.query(SysUser).filter(SysUser.id == user_id).one()
+
+    async def run():
+        # 浏览器重连时带回 Last-Event-ID，补发之后的通知
+        response = await notifications.stream_notifications(
+            last_event_id=None, last_event_id_header=str(ids[0]), db=Session(), current_user=user
+        )
+        stream = response.body_iterator
+        assert (await stream.__anext__()).startswith("retry:")
+        resumed = [await stream.__anext__(), await stream.__anext__()]
+        assert notification_hub.subscriber_count(user_id) == 1
+
+        # 已补发的通知再次推送时跳过，新通知正常推送
+        notification_hub.publish(user_id, {"id": ids[2], "content": "重复"})
+        notification_hub.publish(user_id, {"id": ids[2] + 1, "content": "新通知"})
+        live = await stream.__anext__()
+        await stream.aclose()
+        return resumed, live
+
+    resumed, live = asyncio.run(run())
+    assert [event.split("\n")[0] for event in resumed] == [f"id: {ids[1]}", f"id: {ids[2]}"]
+    assert live.startswith(f"id: {ids[2] + 1}\n")
+    assert notification_hub.subscriber_count(user_id) == 0
+    db.close()
+
+def test_overflowed_subscriber_stream_ends(monkeypatch):
+    hub = NotificationHub(max_pending=2)
+    monkeypatch.setattr(notifications, "notification_hub", hub)
+
+    async def run():
+        subscriber = hub.subscribe(1)
+        for notification_id in range(1, 5):
+            hub.publish(1, {"id": notification_id})
+        await asyncio.sleep(0)
+        assert subscriber.overflowed
+        # 溢出后事件流直接断开并取消订阅，客户端带 Last-Event-ID 重连时从数据库补发
+        stream = notifications.notification_event_stream(1, subscriber, [])
+        chunks = [chunk async for chunk in stream]
+        return chunks, hub.subscriber_count(1)
+
+    chunks, subscriber_count = asyncio.run(run())
+    assert len(chunks) == 1 and chunks[0].startswith("retry:")
+    assert subscriber_count == 0
+
+def test_broadcast_fans_out_in_batches_and_counts_unread():
+    Session = make_session_factory()
+    db = Session()
+    user_ids = add_users(db, 5)
+    admin_id, inactive_id = user_ids[0], user_ids[-1]
+    db.query(SysUser).filter(SysUser.id == admin_id).update({SysUser.is_admin: True})
+    db.query(SysUser).filter(SysUser.id == inactive_id).update({SysUser.is_active: False})
+    db.commit()
+    admin_client = make_client(Session, admin_id)
+
+    assert make_client(Session, user_ids[1]).post(
+        "/notifications/broadcast", json={"title": "维护", "content": "今晚维护"}
+    ).status_code == 403
+    assert admin_client.post(
+        "/notifications/broadcast", json={"title": "维护", "content": "今晚维护", "user_ids": []}
+    ).status_code == 400
+
+    # 发送给所有启用的用户，停用的用户不发送
+    response = admin_client.post("/notifications/broadcast", json={"title": "维护", "content": "今晚维护"})
+    assert response.status_code == 201 and response.json()["count"] == 4
+
+    # 指定用户，每批2个用户分批写入，在线用户收到推送
+    async def run():
+        subscriber = notification_hub.subscribe(user_ids[2])
+        count = broadcast_notification(db, "活动", "新品上架", user_ids=[user_ids[1], user_ids[2], user_ids[3], inactive_id], batch_size=2)
+        await asyncio.sleep(0)
+        notification_hub.unsubscribe(user_ids[2], subscriber)
+        return count, [event["content"] for event in drain(subscriber)]
+
+    assert asyncio.run(run()) == (3, ["新品上架"])
+    db.expire_all()
+    counts = dict(db.query(SysUser.id, SysUser.unread_notification_count).all())
+    assert counts == {admin_id: 1, user_ids[1]: 2, user_ids[2]: 2, user_ids[3]: 2, inactive_id: 0}
+    db.close()
+
+def test_read_all_keeps_count_of_notification_inserted_concurrently(monkeypatch):
+    Session = make_session_factory()
+    db = Session()
+    user_id, = add_users(db, 1)
+    for index in range(2):
+        add_notification(db, user_id, "通知", str(index))
+    db.commit()
+
+    # 在标记已读的UPDATE之后、写未读计数之前，另一个事务写入一条新通知并已计数
+    original_adjust = notifier.adjust_unread_count
+
+    def adjust_after_concurrent_insert(db, user_id, delta):
+        other = Session()
+        other.add(Notification(title="通知", content="并发写入", is_read=False, user_id=user_id))
+        original_adjust(other, user_id, 1)
+        other.commit()
+        other.close()
+        original_adjust(db, user_id, delta)
+
+    monkeypatch.setattr(notifier, "adjust_unread_count", adjust_after_concurrent_insert)
+    assert notifier.mark_all_read(db, user_id) == 2
+    db.commit()
+
+    db.expire_all()
+    unread_rows = db.query(Notification).filter(Notification.user_id == user_id, Notification.is_read == False).count()
+    assert unread_rows == 1
+    assert db.query(SysUser.unread_notification_count).filter(SysUser.id == user_id).scalar() == 1
+    db.close()
+
+def test_hub_published_ids_stay_bounded_without_poller():
+    hub = NotificationHub(max_published=3)
+
+    async def run():
+        subscriber = hub.subscribe(1)
+        # 没有在线连接的用户不记录
+        for notification_id in range(1, 101):
+            hub.publish(2, {"id": notification_id})
+        for notification_id in range(101, 111):
+            hub.publish(1, {"id": notification_id})
+        hub.unsubscribe(1, subscriber)
+        # 最近的推送仍然去重
+        return hub.publish(1, {"id": 110})
+
+    assert asyncio.run(run()) is False
+    assert sorted(hub._published) == [108, 109, 110] and len(hub._published_order) == 3
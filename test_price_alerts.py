@@ -0,0 +1,87 @@
+import sys
+import os
+from datetime import datetime, timedelta
+
+# 后端模块使用扁平导入（from models import ...），需要把 backend 目录加入路径
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from models import Base, Product, PriceWatch, Notification, SysUser
+from migrations import upgrade
+from alerts import ProductChange, match_watch, evaluate_product_changes
+from ingest import save_scraped_product
+from scraper import ProductData
+
+# 使用内存SQLite作为替身数据库
+def make_session():
+    test_engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(bind=test_engine)
+    upgrade(bind=test_engine)
+    return sessionmaker(bind=test_engine, autoflush=False)()
+
+def make_product(price=100.0, sales_count=1000, updated_hours_ago=24):
+    updated_at = datetime.now() - timedelta(hours=updated_hours_ago)
+    return Product(id=1, name="耳机", price=price, currency="USD", sales_count=sales_count, updated_at=updated_at)
+
+def test_price_drop_amount_and_percent_rules():
+    change = ProductChange(make_product(price=100.0), 85.0, 1000)
+    assert change.price_drop == 15.0 and round(change.price_drop_percent, 1) == 15.0
+
+    assert match_watch(PriceWatch(price_drop_amount=10), change)
+    assert not match_watch(PriceWatch(price_drop_amount=20), change)
+    assert match_watch(PriceWatch(price_drop_percent=15), change)
+    assert not match_watch(PriceWatch(price_drop_percent=20), change)
+    # 两个阈值满足其一即触发
+    assert match_watch(PriceWatch(price_drop_amount=50, price_drop_percent=10), change)
+    # 涨价不触发
+    assert not match_watch(PriceWatch(price_drop_amount=0), ProductChange(make_product(price=100.0), 120.0, 1000))
+
+def test_sales_velocity_rule_uses_minimum_observation_window():
+    # 24小时内销量增加240件，增速240件/天
+    change = ProductChange(make_product(sales_count=1000), 100.0, 1240)
+    assert round(change.sales_velocity) == 240
+    assert match_watch(PriceWatch(sales_velocity=200), change)
+    assert not match_watch(PriceWatch(sales_velocity=300), change)
+
+    # 刚抓取过又抓取时按最短观测间隔（1小时）计算，不会因间隔过短放大增速
+    change = ProductChange(make_product(sales_count=1000, updated_hours_ago=0), 100.0, 1010)
+    assert round(change.sales_velocity) == 240
+
+def test_ingest_notifies_matching_active_watches():
+    db = make_session()
+    users = [SysUser(username=f"user{i}", password="x", email=f"user{i}@example.com") for i in range(3)]
+    db.add_all(users)
+    db.add(Product(name="耳机", url="https://example.com/p", price=100.0, currency="USD", sales_count=10))
+    db.commit()
+    product = db.query(Product).one()
+    db.add_all([
+        PriceWatch(user_id=users[0].id, product_id=product.id, price_drop_percent=10),
+        PriceWatch(user_id=users[1].id, product_id=product.id, price_drop_amount=50),
+        PriceWatch(user_id=users[2].id, product_id=product.id, price_drop_percent=10, is_active=False),
+    ])
+    db.commit()
+
+    scraped = ProductData()
+    scraped.url = product.url
+    scraped.name = "耳机"
+    scraped.price = 80.0
+    scraped.currency = "USD"
+    scraped.sales_count = 10
+    scraped.platform_name = "Amazon"
+    scraped.category_name = "电子产品"
+    save_scraped_product(db, scraped)
+
+    # 只有降价幅度达到阈值的启用提醒触发，通知与未读计数一起写入
+    notifications = db.query(Notification).all()
+    assert [notification.user_id for notification in notifications] == [users[0].id]
+    assert "100.00" in notifications[0].content and "80.00" in notifications[0].content
+    db.expire_all()
+    assert [user.unread_notification_count for user in db.query(SysUser).order_by(SysUser.id)] == [1, 0, 0]
+    assert db.query(PriceWatch).filter(PriceWatch.user_id == users[0].id).one().last_triggered_at is not None
+
+    # 价格不变时不再检查提醒
+    assert evaluate_product_changes(db, [ProductChange(product, 80.0, 10)]) == []
+    db.close()
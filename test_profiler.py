@@ -0,0 +1,35 @@
+import sys
+import os
+
+# 后端模块使用扁平导入（from models import ...），需要把 backend 目录加入路径
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import profiler
+from auth import create_access_token, create_stream_token
+from models import Base, SysUser
+
+# 使用内存SQLite作为替身数据库
+def make_session_factory():
+    test_engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(bind=test_engine)
+    Session = sessionmaker(bind=test_engine, autoflush=False)
+    db = Session()
+    db.add_all([
+        SysUser(username="admin", password="x", email="admin@example.com", is_active=True, is_admin=True),
+        SysUser(username="user", password="x", email="user@example.com", is_active=True, is_admin=False),
+    ])
+    db.commit()
+    db.close()
+    return Session
+
+def test_only_admin_access_tokens_can_profile(monkeypatch):
+    monkeypatch.setattr(profiler, "SessionLocal", make_session_factory())
+    assert profiler.is_admin_token(create_access_token({"sub": "admin"}))
+    assert not profiler.is_admin_token(create_access_token({"sub": "user"}))
+    assert not profiler.is_admin_token("invalid")
+    # 事件流令牌会出现在URL中，不能用于触发性能分析
+    assert not profiler.is_admin_token(create_stream_token("admin"))
@@ -0,0 +1,162 @@
+import sys
+import os
+
+# 后端模块使用扁平导入（from models import ...），需要把 backend 目录加入路径
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.pool import StaticPool
+
+from models import Base, Product, ProductSpec, Notification, PriceWatch, ProductImage, ScrapeJob
+from migrations import upgrade, MIGRATIONS
+
+# 使用内存SQLite作为替身数据库，检查关键查询的执行计划
+def make_engine():
+    test_engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(bind=test_engine)
+    upgrade(bind=test_engine)
+    return test_engine
+
+def explain(test_engine, stmt):
+    sql = str(stmt.compile(dialect=test_engine.dialect, compile_kwargs={"literal_binds": True}))
+    with test_engine.connect() as conn:
+        rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+    return " | ".join(row[-1] for row in rows)
+
+def assert_uses_index(test_engine, stmt, index_name):
+    plan = explain(test_engine, stmt)
+    print(f'{index_name}: {plan}')
+    assert index_name in plan, f'查询未使用索引 {index_name}: {plan}'
+    assert 'USE TEMP B-TREE FOR ORDER BY' not in plan, f'查询需要额外排序: {plan}'
+
+def test_migrations_idempotent():
+    test_engine = make_engine()
+    # 再次执行时不应重复应用
+    assert upgrade(bind=test_engine) == 0
+    with test_engine.connect() as conn:
+        count = conn.execute(text("SELECT COUNT(*) FROM schema_migration")).scalar()
+    assert count == len(MIGRATIONS)
+
+def test_product_list_query_plans():
+    test_engine = make_engine()
+
+    # 默认排序：按更新时间倒序分页
+    assert_uses_index(test_engine,
+        select(Product.id).order_by(Product.updated_at.desc()).limit(10),
+        'ix_product_updated_at')
+
+    # 按销量排序
+    assert_uses_index(test_engine,
+        select(Product.id).order_by(Product.sales_count.desc()).limit(10),
+        'ix_product_sales_count')
+
+    # 分类筛选 + 按更新时间排序
+    assert_uses_index(test_engine,
+        select(Product.id).where(Product.category_id == 1).order_by(Product.updated_at.desc()).limit(10),
+        'ix_product_category_updated')
+
+    # 平台筛选 + 按更新时间排序
+    assert_uses_index(test_engine,
+        select(Product.id).where(Product.platform_id == 1).order_by(Product.updated_at.desc()).limit(10),
+        'ix_product_platform_updated')
+
+    # 分类筛选 + 价格区间 + 按价格排序
+    assert_uses_index(test_engine,
+        select(Product.id).where(Product.category_id == 1, Product.price >= 10, Product.price <= 100)
+        .order_by(Product.price.asc()).limit(10),
+        'ix_product_category_price')
+
+    # 平台筛选 + 价格区间 + 按价格排序
+    assert_uses_index(test_engine,
+        select(Product.id).where(Product.platform_id == 1, Product.price >= 10, Product.price <= 100)
+        .order_by(Product.price.asc()).limit(10),
+        'ix_product_platform_price')
+
+    # 分类筛选 + 按销量排序
+    assert_uses_index(test_engine,
+        select(Product.id).where(Product.category_id == 1).order_by(Product.sales_count.desc()).limit(10),
+        'ix_product_category_sales')
+
+    # 平台筛选 + 按销量排序
+    assert_uses_index(test_engine,
+        select(Product.id).where(Product.platform_id == 1).order_by(Product.sales_count.desc()).limit(10),
+        'ix_product_platform_sales')
+
+def test_spec_filter_query_plan():
+    test_engine = make_engine()
+
+    # 按规格筛选：子查询应命中 (spec_key, spec_value) 索引
+    spec_ids = select(ProductSpec.product_id).where(
+        ProductSpec.spec_key == 'storage', ProductSpec.spec_value == '256GB')
+    plan = explain(test_engine, select(Product.id).where(Product.id.in_(spec_ids)))
+    print(f'spec filter: {plan}')
+    assert 'ix_product_spec_key_value' in plan, plan
+
+def test_notification_query_plans():
+    test_engine = make_engine()
+
+    # 当前用户的未读通知，按时间倒序
+    assert_uses_index(test_engine,
+        select(Notification.id).where(Notification.user_id == 1, Notification.is_read == False)
+        .order_by(Notification.created_at.desc()),
+        'ix_notification_user_read_created')
+
+    # 不筛选已读状态的分页列表
+    assert_uses_index(test_engine,
+        select(Notification.id).where(Notification.user_id == 1)
+        .order_by(Notification.created_at.desc(), Notification.id.desc()).limit(21),
+        'ix_notification_user_created')
+
+    # 未读数量统计应只扫描索引
+    plan = explain(test_engine,
+        select(Notification.id).where(Notification.user_id == 1, Notification.is_read == False))
+    print(f'unread count: {plan}')
+    assert 'COVERING INDEX ix_notification_user_read_created' in plan, plan
+
+def test_scrape_ingest_query_plans():
+    test_engine = make_engine()
+
+    # 抓取入库时按URL查找已有商品
+    plan = explain(test_engine, select(Product.id).where(Product.url == 'https://example.com/item'))
+    print(f'product by url: {plan}')
+    assert 'ix_product_url' in plan, plan
+
+    # 只检查发生变化的商品上的价格提醒
+    plan = explain(test_engine,
+        select(PriceWatch.id).where(PriceWatch.product_id.in_([1, 2, 3]), PriceWatch.is_active == True))
+    print(f'price watch: {plan}')
+    assert 'ix_price_watch_product_active' in plan, plan
+
+def test_image_mirror_query_plans():
+    test_engine = make_engine()
+
+    # 取出到期的图片下载任务
+    assert_uses_index(test_engine,
+        select(ProductImage.product_id).where(ProductImage.next_attempt_at <= '2024-01-01')
+        .order_by(ProductImage.next_attempt_at).limit(50),
+        'ix_product_image_next')
+
+    # 按图片地址查找已下载过的内容哈希
+    plan = explain(test_engine,
+        select(ProductImage.content_hash).where(ProductImage.source_url.in_(['https://example.com/a.jpg'])))
+    print(f'image by url: {plan}')
+    assert 'ix_product_image_source' in plan, plan
+
+def test_scrape_job_query_plans():
+    test_engine = make_engine()
+
+    # 抓取工作进程认领到期的任务
+    assert_uses_index(test_engine,
+        select(ScrapeJob.id).where(ScrapeJob.status == 'pending', ScrapeJob.run_after <= '2024-01-01')
+        .order_by(ScrapeJob.run_after).limit(6),
+        'ix_scrape_job_status_run_after')
+
+if __name__ == '__main__':
+    test_migrations_idempotent()
+    test_product_list_query_plans()
+    test_spec_filter_query_plan()
+    test_notification_query_plans()
+    test_scrape_ingest_query_plans()
+    test_image_mirror_query_plans()
+    test_scrape_job_query_plans()
+    print('所有查询均使用了索引')
@@ -0,0 +1,71 @@
+import sys
+import os
+
+# 后端模块使用扁平导入（from models import ...），需要把 backend 目录加入路径
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from models import Base, ProductCategory, TableVersion, ReplicaRouter, RoutingSession
+
+# 用两个内存SQLite分别充当主库和只读副本，副本的数据不会自动同步，用来模拟复制延迟
+def make_engine():
+    test_engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(bind=test_engine)
+    return test_engine
+
+def bump_version(test_engine, table_name="product_category"):
+    with test_engine.begin() as conn:
+        if conn.execute(update(TableVersion).where(TableVersion.table_name == table_name)
+                        .values(version=TableVersion.version + 1)).rowcount == 0:
+            conn.execute(TableVersion.__table__.insert().values(table_name=table_name, version=1))
+
+def test_reads_go_to_replica_until_session_writes():
+    primary, replica = make_engine(), make_engine()
+    router = ReplicaRouter(primary, {"replica1": replica}, max_lag=5, check_interval=0)
+    ReadSession = sessionmaker(class_=RoutingSession, router=router, autoflush=False)
+
+    db = ReadSession()
+    assert db.query(ProductCategory).count() == 0
+    assert db.get_bind() is replica
+
+    # 写入后本会话的读写都走主库，能读到刚写入的数据
+    db.add(ProductCategory(name="电子产品"))
+    db.commit()
+    assert db.query(ProductCategory).count() == 1
+    assert db.get_bind() is primary
+    db.close()
+
+    # 新会话仍读副本
+    db = ReadSession()
+    assert db.query(ProductCategory).count() == 0
+    db.close()
+
+def test_lagging_replica_falls_back_to_primary():
+    primary, replica = make_engine(), make_engine()
+    router = ReplicaRouter(primary, {"replica1": replica}, max_lag=5, check_interval=0)
+    assert router.choose() is replica
+
+    # 副本追上了上一次快照但没有追上最新快照：延迟为距上次快照的时间，在上限内继续使用
+    bump_version(primary)
+    assert router.choose() is replica
+    assert 0 < router.lags["replica1"] < 5
+
+    # 延迟上限为0时改读主库
+    router.max_lag = 0
+    bump_version(primary)
+    assert router.choose() is primary
+
+    # 副本追上后恢复
+    bump_version(replica)
+    bump_version(replica)
+    assert router.choose() is replica
+    assert router.lags["replica1"] == 0
+
+def test_unreachable_replica_is_skipped():
+    primary, replica = make_engine(), make_engine()
+    broken = create_engine("sqlite:////nonexistent/dir/replica.db")
+    router = ReplicaRouter(primary, {"replica1": broken, "replica2": replica}, max_lag=5, check_interval=0)
+    assert [router.choose() for _ in range(3)] == [replica, replica, replica]
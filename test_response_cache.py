@@ -0,0 +1,126 @@
+import sys
+import os
+import asyncio
+import tempfile
+
+# 后端模块使用扁平导入（from models import ...），需要把 backend 目录加入路径
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from cache import LRUCache, SQLiteCache, ResponseCache
+from models import Base, Product, ProductCategory, CaptchaRecord, VERSIONED_TABLES, get_table_versions
+from migrations import upgrade
+
+def make_backends():
+    return [LRUCache(maxsize=16), SQLiteCache(os.path.join(tempfile.mkdtemp(), 'cache.db'), maxsize=16)]
+
+def test_entries_invalidated_by_table_versions():
+    for backend in make_backends():
+        cache = ResponseCache(backend)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return {'total': len(calls)}
+
+        async def run():
+            first = await cache.get_or_compute('products', [('limit', '10')], (1, 1), compute)
+            second = await cache.get_or_compute('products', [('limit', '10')], (1, 1), compute)
+            # 参数不同的请求分别缓存
+            other = await cache.get_or_compute('products', [('limit', '20')], (1, 1), compute)
+            # 任意一张依赖表的版本号变化后重新计算
+            changed = await cache.get_or_compute('products', [('limit', '10')], (2, 1), compute)
+            return first, second, other, changed
+
+        assert asyncio.run(run()) == ({'total': 1}, {'total': 1}, {'total': 2}, {'total': 3})
+
+def test_single_flight_waits_for_other_worker():
+    # 两个工作进程共用同一个SQLite缓存文件
+    path = os.path.join(tempfile.mkdtemp(), 'cache.db')
+    worker_a = ResponseCache(SQLiteCache(path))
+    worker_b = ResponseCache(SQLiteCache(path))
+    versions = (3,)
+    key = worker_a.make_key('product_facets', ())
+    lock_key = f"{key}:{worker_a.make_key('lock', versions)}"
+    calls = []
+    released = []
+
+    def compute():
+        calls.append(1)
+        return 'computed'
+
+    async def run():
+        # 工作进程A正在计算
+        assert worker_a.backend.add(lock_key, 'a', ttl=5)
+        waiting = [
+            asyncio.create_task(worker_b.get_or_compute(
+                'product_facets', (), versions, compute, before_wait=lambda: released.append(1)
+            ))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0.1)
+        worker_a.backend.set(key, (versions, 'from a'))
+        worker_a.backend.delete(lock_key)
+        return await asyncio.gather(*waiting)
+
+    assert asyncio.run(run()) == ['from a'] * 3
+    assert calls == []
+    # 每个等待的请求在等待前都归还了数据库连接
+    assert len(released) == 3
+
+def test_compute_error_is_not_cached():
+    cache = ResponseCache(LRUCache())
+
+    def fail():
+        raise ValueError('db error')
+
+    async def run():
+        try:
+            await cache.get_or_compute('categories', (), (1,), fail)
+        except ValueError:
+            pass
+        return await cache.get_or_compute('categories', (), (1,), lambda: ['ok'])
+
+    assert asyncio.run(run()) == ['ok']
+
+def test_only_versioned_tables_bump_versions():
+    test_engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(bind=test_engine)
+    upgrade(bind=test_engine)
+    db = sessionmaker(bind=test_engine, autoflush=False)()
+    # 迁移预先插入了所有版本号记录
+    assert get_table_versions(db, *VERSIONED_TABLES) == (0,) * len(VERSIONED_TABLES)
+
+    db.add(ProductCategory(name="电子产品"))
+    db.commit()
+    db.add(CaptchaRecord(captcha_key="k", captcha_value="v", expire_time=datetime.now()))
+    db.commit()
+    assert get_table_versions(db, "product_category", "captcha_record") == (1, 0)
+    db.close()
+
+def test_unchanged_specifications_do_not_rebuild_spec_rows():
+    test_engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(bind=test_engine)
+    upgrade(bind=test_engine)
+    db = sessionmaker(bind=test_engine, autoflush=False)()
+    product = Product(name="耳机", url="https://example.com/p", price=10, specifications={"颜色": "黑色"})
+    db.add(product)
+    db.commit()
+    spec_ids = [entry.id for entry in product.spec_entries]
+    versions = get_table_versions(db, "product", "product_spec")
+
+    # 重新抓取得到相同的规格参数
+    product.specifications = {"颜色": "黑色"}
+    db.commit()
+    assert [entry.id for entry in product.spec_entries] == spec_ids
+    assert get_table_versions(db, "product", "product_spec") == versions
+
+    product.specifications = {"颜色": "白色"}
+    db.commit()
+    assert [entry.spec_value for entry in product.spec_entries] == ["白色"]
+    assert get_table_versions(db, "product_spec") == (versions[1] + 1,)
+    db.close()
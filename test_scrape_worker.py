@@ -0,0 +1,168 @@
+import sys
+import os
+
+# 后端模块使用扁平导入（from models import ...），需要把 backend 目录加入路径
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import scraper
+from scraper import BrowserPool, SeleniumScraper, ProductData, scrape_product_from_url
+from models import Base, Product, ScrapeJob, CrawlSchedule
+from migrations import upgrade
+from scrape_queue import enqueue_scrape_job, claim_scrape_jobs
+from scrape_worker import ScrapeWorker
+from recrawl import RecrawlScheduler
+from ingest import save_scraped_product
+
+class FakeDriver:
+    def __init__(self):
+        self.quit_called = False
+
+    def get(self, url):
+        raise RuntimeError('页面加载失败')
+
+    def quit(self):
+        self.quit_called = True
+
+class FailingScraper(SeleniumScraper):
+    def initialize_driver(self):
+        raise AssertionError('浏览器池提供的浏览器出错时不应自行启动新浏览器')
+
+class OkScraper(SeleniumScraper):
+    def scrape_product(self, url):
+        product = ProductData()
+        product.url = url
+        return product
+
+def make_pool(driver):
+    pool = BrowserPool(size=1)
+    pool._idle.append((driver, 0))
+    pool._created = 1
+    return pool
+
+def test_failed_scrape_discards_pooled_browser(monkeypatch):
+    monkeypatch.setattr(scraper.time, 'sleep', lambda seconds: None)
+    monkeypatch.setattr(scraper.ScraperFactory, 'get_scraper', staticmethod(lambda url: FailingScraper()))
+    driver = FakeDriver()
+    pool = make_pool(driver)
+
+    assert scrape_product_from_url('https://example.com/item', browser_pool=pool) is None
+    # 出错的浏览器被关闭，不再放回池中
+    assert driver.quit_called
+    assert pool._idle == [] and pool._created == 0
+
+def test_successful_scrape_returns_browser_to_pool(monkeypatch):
+    monkeypatch.setattr(scraper.ScraperFactory, 'get_scraper', staticmethod(lambda url: OkScraper()))
+    driver = FakeDriver()
+    pool = make_pool(driver)
+
+    assert scrape_product_from_url('https://example.com/item', browser_pool=pool).url == 'https://example.com/item'
+    assert not driver.quit_called
+    assert pool._idle == [(driver, 1)]
+
+# 使用内存SQLite作为替身数据库
+def make_session_factory():
+    test_engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(bind=test_engine)
+    upgrade(bind=test_engine)
+    return sessionmaker(bind=test_engine, autoflush=False)
+
+def make_product_data(url):
+    product = ProductData()
+    product.name = '测试商品'
+    product.url = url
+    product.price = 9.9
+    product.platform_name = 'Amazon'
+    product.category_name = '电子产品'
+    return product
+
+def test_worker_completes_claimed_job():
+    Session = make_session_factory()
+    db = Session()
+    job = enqueue_scrape_job(db, 'https://example.com/a')
+    worker = ScrapeWorker(session_factory=Session, scrape=lambda url, browser_pool: make_product_data(url),
+                          browser_pool=BrowserPool(size=1))
+    assert [j.id for j in claim_scrape_jobs(db, worker.name, 1)] == [job.id]
+
+    worker.run_job(job.id, job.url)
+    db.expire_all()
+    job = db.query(ScrapeJob).filter(ScrapeJob.id == job.id).one()
+    assert job.status == 'succeeded' and job.product_id is not None
+    db.close()
+
+def test_result_dropped_after_lease_reclaimed():
+    Session = make_session_factory()
+    db = Session()
+    job = enqueue_scrape_job(db, 'https://example.com/b')
+    worker = ScrapeWorker(session_factory=Session, scrape=lambda url, browser_pool: make_product_data(url),
+                          browser_pool=BrowserPool(size=1))
+    claim_scrape_jobs(db, worker.name, 1)
+
+    # 抓取超过租约，任务被其他工作进程重新认领
+    db.query(ScrapeJob).update({ScrapeJob.lease_expires_at: datetime.now() - timedelta(seconds=1)})
+    db.commit()
+    assert len(claim_scrape_jobs(db, 'other:1', 1)) == 1
+
+    worker.run_job(job.id, job.url)
+    db.expire_all()
+    job = db.query(ScrapeJob).filter(ScrapeJob.id == job.id).one()
+    assert (job.status, job.worker, job.attempts) == ('running', 'other:1', 2)
+    assert db.query(Product).count() == 0
+    db.close()
+
+def test_failed_job_is_retried_later():
+    Session = make_session_factory()
+    db = Session()
+    job = enqueue_scrape_job(db, 'https://example.com/c')
+    worker = ScrapeWorker(session_factory=Session, scrape=lambda url, browser_pool: None,
+                          browser_pool=BrowserPool(size=1))
+    claim_scrape_jobs(db, worker.name, 1)
+
+    worker.run_job(job.id, job.url)
+    db.expire_all()
+    job = db.query(ScrapeJob).filter(ScrapeJob.id == job.id).one()
+    assert job.status == 'pending' and job.run_after > datetime.now()
+    assert claim_scrape_jobs(db, worker.name, 1) == []
+    db.close()
+
+def test_recrawl_runs_in_worker_with_shared_browser_pool():
+    Session = make_session_factory()
+    calls = []
+    pool = BrowserPool(size=1)
+    worker = ScrapeWorker(session_factory=Session, scrape=lambda url, browser_pool: calls.append((url, browser_pool)),
+                          browser_pool=pool, recrawl=True)
+    # 定时重新抓取与队列任务共用工作进程的浏览器池
+    worker.recrawl_scheduler.scrape('https://example.com/d')
+    assert calls == [('https://example.com/d', pool)]
+    assert ScrapeWorker(session_factory=Session, browser_pool=pool, recrawl=False).recrawl_scheduler is None
+
+def test_new_products_are_scheduled_without_rescanning():
+    Session = make_session_factory()
+    db = Session()
+    # 此前创建、没有调度记录的商品在调度器第一次运行时补登
+    db.add(Product(name='旧商品', url='https://example.com/old', price=1.0))
+    db.commit()
+    scheduler = RecrawlScheduler(session_factory=Session, scrape=lambda url: None, concurrency=1)
+    scheduler._in_flight = 1  # 没有空闲槽位，只执行登记
+    scheduler.tick()
+    assert db.query(CrawlSchedule).count() == 1
+
+    # 之后的调度不再扫描缺少调度记录的商品，新商品在创建时一并登记
+    scheduler.register_new_products = lambda db: pytest.fail('不应在每次调度时扫描商品表')
+    product, _, _ = save_scraped_product(db, make_product_data('https://example.com/new'))
+    scheduler.tick()
+    assert db.query(CrawlSchedule.product_id).filter(CrawlSchedule.product_id == product.id).one()
+    assert db.query(CrawlSchedule).count() == 2
+
+    db.delete(product)
+    db.commit()
+    assert db.query(CrawlSchedule).count() == 1
+    scheduler.stop(wait=False)
+    db.close()
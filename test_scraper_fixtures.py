@@ -0,0 +1,34 @@
+import sys
+import os
+
+# 后端模块使用扁平导入，需要把 backend 和录制页面所在的 benchmarks 目录加入路径
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.join(BACKEND_DIR, 'benchmarks'))
+
+import scraper
+from replay_server import ReplayServer, load_manifest, load_fixture
+
+# 使用录制的页面离线检查各爬虫的解析结果
+def test_parse_recorded_pages():
+    for fixture_name, fixture in load_manifest().items():
+        instance = getattr(scraper, fixture['scraper'])()
+        product = instance.parse_product(load_fixture(fixture['file']), fixture['url'])
+        print(f"{fixture_name}: {product.name} {product.currency}{product.price}")
+        for field, expected in fixture['expected'].items():
+            actual = getattr(product, field)
+            assert actual == expected, f'{fixture_name}.{field}: {actual!r} != {expected!r}'
+
+# 通过回放服务器走完整的获取流程（eBay 会额外请求描述iframe）
+def test_scrape_from_replay_server():
+    fixture = load_manifest()['ebay']
+    with ReplayServer() as replay:
+        product = scraper.EbayScraper().scrape_product(replay.url_for(fixture['file']))
+    assert product.name == fixture['expected']['name']
+    assert 'battery health' in product.description
+    assert product.category_name == '电子产品'
+
+if __name__ == '__main__':
+    test_parse_recorded_pages()
+    test_scrape_from_replay_server()
+    print('录制页面解析正常')